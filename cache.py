@@ -6,11 +6,15 @@ To enable automatic TTL cleanup in Firebase Console:
 2. Add TTL policy on 'cache' collection, field: 'expires_at'
 """
 import hashlib
+import json
+import uuid
 from datetime import datetime, timedelta, timezone
 from config import db
 
 CACHE_TTL_MINUTES = 30
 CACHE_ENABLED = True  # Set to True to enable caching
+# One small doc per profile, no TTL (an expired generation would revive stale entries)
+GENERATIONS_COLLECTION = "cacheGenerations"
 
 
 def _get_cache_key(profile_url: str) -> str:
@@ -18,13 +22,28 @@ def _get_cache_key(profile_url: str) -> str:
     return hashlib.md5(profile_url.strip().encode()).hexdigest()
 
 
+def content_hash(profile_data) -> str:
+    """Stable digest of a cached value, used as its ETag."""
+    encoded = json.dumps(profile_data, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=12).hexdigest()
+
+
 async def get_cached_profile(profile_url: str) -> dict | None:
     """
     Retrieve cached profile data if it exists and hasn't expired.
     Returns None if cache miss or expired.
     """
+    data, _ = await get_cached_entry(profile_url)
+    return data
+
+
+async def get_cached_entry(profile_url: str) -> tuple[dict | None, str | None]:
+    """
+    Like get_cached_profile, but also returns the entry's content hash
+    (computed at write time; entries written before it existed are hashed here).
+    """
     if not CACHE_ENABLED:
-        return None
+        return None, None
     cache_key = _get_cache_key(profile_url)
     doc = db.collection("cache").document(cache_key).get()
 
@@ -32,15 +51,17 @@ async def get_cached_profile(profile_url: str) -> dict | None:
         data = doc.to_dict()
         expires_at = data.get("expires_at")
         if expires_at and expires_at > datetime.now(timezone.utc):
-            return data.get("profile_data")
+            profile_data = data.get("profile_data")
+            return profile_data, data.get("etag") or content_hash(profile_data)
         # Expired - optionally delete (TTL policy will also handle this)
 
-    return None
+    return None, None
 
 
-async def set_cached_profile(profile_url: str, profile_data: dict) -> None:
+async def set_cached_profile(profile_url: str, profile_data: dict, ttl_minutes: int | None = None) -> None:
     """
     Store profile data in cache with TTL.
+    ttl_minutes overrides the default CACHE_TTL_MINUTES for this entry.
     """
     if not CACHE_ENABLED:
         return
@@ -48,11 +69,33 @@ async def set_cached_profile(profile_url: str, profile_data: dict) -> None:
     db.collection("cache").document(cache_key).set({
         "profile_data": profile_data,
         "profile_url": profile_url.strip(),
-        "expires_at": datetime.now(timezone.utc) + timedelta(minutes=CACHE_TTL_MINUTES),
+        "etag": content_hash(profile_data),
+        "expires_at": datetime.now(timezone.utc) + timedelta(minutes=ttl_minutes or CACHE_TTL_MINUTES),
         "created_at": datetime.now(timezone.utc)
     })
 
 
+async def cache_generation(profile_url: str) -> str:
+    """
+    Token that changes every time a profile's stored data is rewritten.
+    Put it in cache keys that can't all be invalidated by name (e.g. one
+    per sections= selection), so a write orphans them instead.
+    """
+    if not CACHE_ENABLED:
+        return "0"
+    doc = db.collection(GENERATIONS_COLLECTION).document(_get_cache_key(profile_url)).get()
+    return (doc.to_dict() or {}).get("generation", "0") if doc.exists else "0"
+
+
+async def bump_cache_generation(profile_url: str) -> None:
+    """Call after writing a profile's data: every generation-keyed entry for it goes stale."""
+    db.collection(GENERATIONS_COLLECTION).document(_get_cache_key(profile_url)).set({
+        "generation": uuid.uuid4().hex[:12],
+        "profile_url": profile_url.strip(),
+        "updated_at": datetime.now(timezone.utc),
+    })
+
+
 async def invalidate_cache(profile_url: str) -> None:
     """
     Manually invalidate cache for a profile.
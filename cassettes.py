@@ -0,0 +1,211 @@
+"""
+Record/replay cassettes for LLM calls.
+
+In record mode the OpenAI clients are wrapped so every chat completion is
+written to a gzip'd JSONL cassette: the request fingerprint (same canonical
+hash as the LLM response cache), the full response including usage, the
+total latency and, for streaming calls, each chunk with its offset from the
+start of the request.
+
+In replay mode no network call is made: responses are served from the
+cassette, sleeping the recorded latency divided by the replay speed
+(speed 0 skips the sleeps entirely). Identical requests recorded several
+times are replayed in recorded order. Unknown requests raise CassetteMiss.
+
+Enabled from config.py via:
+    LIPIN_LLM_CASSETTE=perf/cassettes/run.jsonl.gz
+    LIPIN_LLM_CASSETTE_MODE=record | replay
+    LIPIN_LLM_REPLAY_SPEED=1.0
+"""
+import asyncio
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def _fingerprint(params: dict) -> str:
+    from llm_utils import llm_cache_key
+    return llm_cache_key(params)
+
+
+class Cassette:
+    """A gzip JSONL file of recorded interactions."""
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: dict[str, list[dict]] = defaultdict(list)
+        self._cursor: dict[str, int] = defaultdict(int)
+
+    def load(self) -> "Cassette":
+        if self.path.exists():
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+        print(f"[cassette] Loaded {sum(len(v) for v in self._entries.values())} interactions from {self.path}")
+        return self
+
+    def entries(self):
+        """All recorded interactions, in no particular order."""
+        for recorded in self._entries.values():
+            yield from recorded
+
+    def append(self, entry: dict) -> None:
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Appending gzip members keeps each write durable without a flush on exit
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def next(self, key: str) -> dict:
+        with self._lock:
+            recorded = self._entries.get(key)
+            if not recorded:
+                raise CassetteMiss(f"No recorded interaction for request {key[:12]}")
+            entry = recorded[self._cursor[key] % len(recorded)]
+            self._cursor[key] += 1
+        return entry
+
+
+def _entry(key: str, params: dict, latency: float, response=None, chunks=None) -> dict:
+    return {
+        "key": key,
+        "model": params.get("model"),
+        "stream": bool(params.get("stream")),
+        "latency": round(latency, 4),
+        "response": response,
+        "chunks": chunks,
+    }
+
+
+# ──────────────────────────────────────────────
+# Recording wrappers
+# ──────────────────────────────────────────────
+
+class _RecordingAsyncCompletions:
+    def __init__(self, inner, cassette: Cassette):
+        self._inner = inner
+        self._cassette = cassette
+
+    async def create(self, **params) -> Any:
+        key = _fingerprint(params)
+        start = time.time()
+        response = await self._inner.create(**params)
+        if params.get("stream"):
+            return self._record_stream(response, key, params, start)
+        self._cassette.append(_entry(key, params, time.time() - start, response=response.model_dump(mode="json")))
+        return response
+
+    async def _record_stream(self, stream, key: str, params: dict, start: float):
+        chunks = []
+        async for chunk in stream:
+            chunks.append({"offset": round(time.time() - start, 4), "chunk": chunk.model_dump(mode="json")})
+            yield chunk
+        self._cassette.append(_entry(key, params, time.time() - start, chunks=chunks))
+
+
+class _RecordingSyncCompletions:
+    def __init__(self, inner, cassette: Cassette):
+        self._inner = inner
+        self._cassette = cassette
+
+    def create(self, **params) -> Any:
+        key = _fingerprint(params)
+        start = time.time()
+        response = self._inner.create(**params)
+        if params.get("stream"):
+            chunks = []
+            for chunk in response:
+                chunks.append({"offset": round(time.time() - start, 4), "chunk": chunk.model_dump(mode="json")})
+            self._cassette.append(_entry(key, params, time.time() - start, chunks=chunks))
+            return iter([ChatCompletionChunk.model_validate(c["chunk"]) for c in chunks])
+        self._cassette.append(_entry(key, params, time.time() - start, response=response.model_dump(mode="json")))
+        return response
+
+
+# ──────────────────────────────────────────────
+# Replay clients
+# ──────────────────────────────────────────────
+
+class _ReplayAsyncCompletions:
+    def __init__(self, cassette: Cassette, speed: float):
+        self._cassette = cassette
+        self._speed = speed
+
+    def _delay(self, seconds: float) -> float:
+        return seconds / self._speed if self._speed > 0 else 0.0
+
+    async def create(self, **params) -> Any:
+        entry = self._cassette.next(_fingerprint(params))
+        if entry["chunks"] is not None:
+            return self._replay_stream(entry)
+        await asyncio.sleep(self._delay(entry["latency"]))
+        return ChatCompletion.model_validate(entry["response"])
+
+    async def _replay_stream(self, entry: dict):
+        elapsed = 0.0
+        for item in entry["chunks"]:
+            await asyncio.sleep(self._delay(item["offset"] - elapsed))
+            elapsed = item["offset"]
+            yield ChatCompletionChunk.model_validate(item["chunk"])
+
+
+class _ReplaySyncCompletions(_ReplayAsyncCompletions):
+    def create(self, **params) -> Any:
+        entry = self._cassette.next(_fingerprint(params))
+        time.sleep(self._delay(entry["latency"]))
+        if entry["chunks"] is not None:
+            return iter([ChatCompletionChunk.model_validate(c["chunk"]) for c in entry["chunks"]])
+        return ChatCompletion.model_validate(entry["response"])
+
+
+class _Chat:
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class _ClientProxy:
+    """Client stand-in exposing chat.completions, forwarding anything else to the wrapped client."""
+    def __init__(self, completions, inner=None):
+        self.chat = _Chat(completions)
+        self._inner = inner
+
+    def __getattr__(self, name):
+        if self._inner is None:
+            raise AttributeError(f"{name} is not available in cassette replay mode")
+        return getattr(self._inner, name)
+
+
+def wrap_clients(client, async_client, path: str, mode: str, speed: float = 1.0):
+    """
+    Wrap the sync and async OpenAI clients for record or replay.
+
+    Returns:
+        (client, async_client) to use in place of the originals.
+    """
+    cassette = Cassette(path)
+    if mode == "record":
+        print(f"[cassette] Recording LLM calls to {path}")
+        return (
+            _ClientProxy(_RecordingSyncCompletions(client.chat.completions, cassette), client),
+            _ClientProxy(_RecordingAsyncCompletions(async_client.chat.completions, cassette), async_client),
+        )
+    if mode == "replay":
+        cassette.load()
+        return (
+            _ClientProxy(_ReplaySyncCompletions(cassette, speed)),
+            _ClientProxy(_ReplayAsyncCompletions(cassette, speed)),
+        )
+    raise ValueError(f"Unknown cassette mode: {mode}")
@@ -7,19 +7,48 @@ from firebase_admin import credentials, firestore
 
 load_dotenv()
 
-# OpenAI
-client = OpenAI()  # Sync client for backwards compatibility
-async_client = AsyncOpenAI()  # Async client for parallel LLM calls
+# "live" uses OpenAI + Firebase; "fake" swaps in the in-process stand-ins
+# from fake_backends.py for local benchmarking (see perf/loadgen.py).
+# LIPIN_LLM_BACKEND overrides the LLM side only, e.g. fake Firestore + live OpenAI.
+BACKEND = os.getenv("LIPIN_BACKEND", "live")
+LLM_BACKEND = os.getenv("LIPIN_LLM_BACKEND", BACKEND)
 
-# Firebase - supports both file path (local) and JSON string (production)
-firebase_config = os.getenv("FIREBASE_API", "firebase.json")
+if LLM_BACKEND == "fake":
+    from fake_backends import FakeAsyncOpenAI, FakeOpenAI, FakeLLM
+    fake_llm = FakeLLM()
+    client = FakeOpenAI(fake_llm)
+    async_client = FakeAsyncOpenAI(fake_llm)
+else:
+    # OpenAI
+    client = OpenAI()  # Sync client for backwards compatibility
+    async_client = AsyncOpenAI()  # Async client for parallel LLM calls
 
-if firebase_config.startswith("{"):
-    # JSON string from environment variable
-    fireCred = credentials.Certificate(json.loads(firebase_config))
+if BACKEND == "fake":
+    from fake_backends import FakeFirestore
+    db = FakeFirestore()
 else:
-    # File path
-    fireCred = credentials.Certificate(firebase_config)
+    # Firebase - supports both file path (local) and JSON string (production)
+    firebase_config = os.getenv("FIREBASE_API", "firebase.json")
+
+    if firebase_config.startswith("{"):
+        # JSON string from environment variable
+        fireCred = credentials.Certificate(json.loads(firebase_config))
+    else:
+        # File path
+        fireCred = credentials.Certificate(firebase_config)
+
+    firebase_admin.initialize_app(fireCred)
+    db = firestore.client()
 
-firebase_admin.initialize_app(fireCred)
-db = firestore.client()
+# Optional LLM record/replay (see cassettes.py). Combine replay with
+# LIPIN_BACKEND=fake to run fully offline.
+LLM_CASSETTE = os.getenv("LIPIN_LLM_CASSETTE")
+if LLM_CASSETTE:
+    from cassettes import wrap_clients
+    client, async_client = wrap_clients(
+        client,
+        async_client,
+        LLM_CASSETTE,
+        os.getenv("LIPIN_LLM_CASSETTE_MODE", "replay"),
+        float(os.getenv("LIPIN_LLM_REPLAY_SPEED", "1.0")),
+    )
@@ -0,0 +1,120 @@
+"""
+Token-aware context packing for LLM prompts.
+
+Fills a prompt up to a per-endpoint token budget by field priority instead of
+slicing inputs at arbitrary character offsets. Token counts are cached per
+field value, so repeated profiles cost a dict lookup rather than a re-encode.
+"""
+import json
+from functools import lru_cache
+from typing import Any
+
+# Per-endpoint token budgets for packed profile/resume context
+CONTEXT_BUDGETS = {
+    "score_profile": 1200,
+    "score_profile_section": 400,
+    "profileBuilder": 1500,
+    "profileAnalysis": 2000,
+}
+
+# Rough chars-per-token ratio used when the tokenizer is unavailable
+_CHARS_PER_TOKEN = 4
+# A list item cut to fewer tokens than this is noise, unless it would be the only one
+MIN_PARTIAL_ITEM_TOKENS = 16
+
+_encoder = None
+_encoder_loaded = False
+
+
+def _get_encoder():
+    """Load the o200k tokenizer once; fall back to estimates if it can't load."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"[context_packer] Tokenizer unavailable, estimating token counts: {e}")
+            _encoder = None
+    return _encoder
+
+
+def _to_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Token count of a string (cached per distinct value)."""
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoder.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens."""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoder = _get_encoder()
+    if encoder is None:
+        return text[:max_tokens * _CHARS_PER_TOKEN]
+    return encoder.decode(encoder.encode(text)[:max_tokens])
+
+
+def pack_fields(fields: list[tuple], budget: int) -> dict:
+    """
+    Fit fields into a token budget in priority order.
+
+    Args:
+        fields: (name, value) or (name, value, cap) tuples, highest priority
+                first. Strings are truncated at a token boundary; lists keep
+                whole items from the front until the budget runs out, and
+                the first item that doesn't fit is truncated (as text) into
+                what's left, so an oversized first item never leaves the
+                field empty. cap limits a single field so it can't starve
+                the ones after it.
+        budget: Total token budget across all fields.
+
+    Returns:
+        Dict of name -> packed value (same type as the input value).
+    """
+    remaining = budget
+    packed = {}
+    for field in fields:
+        name, value = field[0], field[1]
+        cap = field[2] if len(field) > 2 else None
+        allowance = remaining if cap is None else min(cap, remaining)
+
+        if isinstance(value, list):
+            items = []
+            used = 0
+            for item in value:
+                text = _to_text(item)
+                item_tokens = count_tokens(text)
+                if used + item_tokens > allowance:
+                    left = allowance - used
+                    if left > 0 and (not items or left >= MIN_PARTIAL_ITEM_TOKENS):
+                        partial = truncate_to_tokens(text, left)
+                        items.append(partial)
+                        used += count_tokens(partial)
+                    break
+                items.append(item)
+                used += item_tokens
+            packed[name] = items
+        else:
+            text = _to_text(value)
+            packed[name] = truncate_to_tokens(text, allowance)
+            used = count_tokens(packed[name])
+
+        remaining -= used
+    return packed
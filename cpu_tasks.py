@@ -0,0 +1,114 @@
+"""
+CPU-bound functions executed in process_pool workers.
+
+Workers are spawned fresh and import only this module, so it must stay free
+of config/Firebase/OpenAI imports; heavy libraries are imported inside the
+functions that need them. Arguments and results cross the process boundary
+by pickle, so keep both to bytes, strings and plain containers.
+"""
+import base64
+import io
+
+
+def pdf_text(pdf_bytes: bytes, max_pages: int, max_chars: int) -> dict:
+    """Text of the first max_pages pages, stopping early once past max_chars."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    page_count = len(reader.pages)
+    parts, chars, pages_read = [], 0, 0
+    for index in range(min(page_count, max_pages)):
+        text = reader.pages[index].extract_text() or ""
+        parts.append(text)
+        chars += len(text)
+        pages_read += 1
+        if chars > max_chars:
+            break
+    return {"text": "\n".join(parts).strip(), "page_count": page_count, "pages_read": pages_read}
+
+
+def ocr_image(img_bytes: bytes, preprocess: bool = False) -> str:
+    """
+    Tesseract text of an encoded image. preprocess cleans up UI screenshots
+    first with OpenCV: grayscale, 2x upscale of small images, Otsu binarization.
+    """
+    import pytesseract
+
+    if not preprocess:
+        from PIL import Image
+        return pytesseract.image_to_string(Image.open(io.BytesIO(img_bytes)))
+
+    import cv2
+    import numpy as np
+
+    image = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("not a decodable image")
+    if image.shape[1] < 1600:
+        image = cv2.resize(image, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # psm 6: one uniform block of text, which suits the SSI dashboard panel
+    return pytesseract.image_to_string(image, config="--psm 6")
+
+
+def normalize_image(img_bytes: bytes, sizes: dict) -> dict:
+    """
+    Re-encode an uploaded image as WebP at each {name: max side} in sizes.
+
+    EXIF orientation is applied and all metadata dropped. Photos (JPEG
+    sources) are encoded lossy; screenshots lossless, which keeps text sharp
+    for OCR and is far smaller than PNG for flat UI colours (kept at native
+    size when downscaling would make the file bigger). Also returns a
+    64-bit difference hash (dhash) for spotting near-duplicate uploads.
+    """
+    import hashlib
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = 40_000_000  # decompression-bomb guard, well above any screenshot
+    image = Image.open(io.BytesIO(img_bytes))
+    source_format = image.format
+    if source_format == "JPEG":
+        image.draft("RGB", (max(sizes.values()),) * 2)  # decode at reduced scale when far larger
+    image = ImageOps.exif_transpose(image)
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+
+    gray = image.convert("L").resize((9, 8), Image.LANCZOS)
+    pixels = list(gray.getdata())
+    bits = [pixels[row * 9 + col] > pixels[row * 9 + col + 1] for row in range(8) for col in range(8)]
+    dhash = f"{int(''.join('1' if b else '0' for b in bits), 2):016x}"
+
+    def encode(img) -> bytes:
+        buffer = io.BytesIO()
+        if source_format == "JPEG":
+            img.save(buffer, "WEBP", quality=85, method=4)
+        else:
+            img.save(buffer, "WEBP", lossless=True, quality=50, method=4)
+        return buffer.getvalue()
+
+    variants = {}
+    full_size = None
+    for name, max_side in sizes.items():
+        variant = image.copy()
+        variant.thumbnail((max_side, max_side), Image.LANCZOS)
+        data = encode(variant)
+        if source_format != "JPEG" and variant.size != image.size and len(data) > len(img_bytes):
+            # Resampling adds anti-aliased colours that lossless coding handles badly;
+            # a flat screenshot is often far smaller at its native size
+            full_size = full_size or encode(image)
+            if len(full_size) < len(data):
+                variant, data = image, full_size
+        variants[name] = {
+            "base64": b64encode(data),
+            "mime_type": "image/webp",
+            "width": variant.width,
+            "height": variant.height,
+            "size_bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+    return {"width": image.width, "height": image.height, "source_format": source_format, "dhash": dhash,
+            "variants": variants}
+
+
+def b64encode(content: bytes) -> str:
+    return base64.b64encode(content).decode("utf-8")
@@ -0,0 +1,397 @@
+"""
+In-process stand-ins for Firestore and the OpenAI clients.
+
+Enabled with LIPIN_BACKEND=fake (see config.py) so routes can be exercised
+and benchmarked without the Firebase project or an OpenAI key. The fakes
+only implement the API surface this codebase uses.
+
+FakeFirestore: collection/document/subcollection references, get, set,
+update, delete, add, stream and limit. Optional per-operation latency.
+
+FakeAsyncOpenAI / FakeOpenAI: chat.completions.create returning real
+ChatCompletion objects (streaming supported). Latency is modelled as
+base latency + prompt tokens / prefill rate + completion tokens / decode
+rate, with jitter. Errors and timeouts are injected at configurable rates.
+Responses come from a responder callable(params) -> str. Like the real API,
+responses report the snapshot behind an alias (SNAPSHOT_MODELS), not the
+requested name.
+
+Settings read from the environment (all optional):
+    FAKE_LLM_BASE_LATENCY_MS   (default 300)
+    FAKE_LLM_PREFILL_TPS       (default 5000 tokens/s)
+    FAKE_LLM_DECODE_TPS        (default 80 tokens/s)
+    FAKE_LLM_JITTER            (default 0.2, +/- fraction)
+    FAKE_LLM_ERROR_RATE        (default 0.0)
+    FAKE_LLM_TIMEOUT_RATE      (default 0.0)
+    FAKE_FIRESTORE_LATENCY_MS  (default 0)
+"""
+import asyncio
+import copy
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+import httpx
+import openai
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from context_packer import count_tokens
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# ──────────────────────────────────────────────
+# Firestore
+# ──────────────────────────────────────────────
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict | None:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    def __init__(self, store, collection_path: tuple, doc_id: str):
+        self._store = store
+        self._collection_path = collection_path
+        self.id = doc_id
+
+    @property
+    def path(self) -> tuple:
+        return self._collection_path + (self.id,)
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._store, self.path + (name,))
+
+    def get(self) -> FakeDocumentSnapshot:
+        self._store._delay()
+        with self._store._lock:
+            data = self._store._docs.get(self._collection_path, {}).get(self.id)
+        return FakeDocumentSnapshot(self, data)
+
+    def set(self, data: dict, merge: bool = False) -> None:
+        self._store._delay()
+        with self._store._lock:
+            docs = self._store._docs.setdefault(self._collection_path, {})
+            if merge and self.id in docs:
+                docs[self.id].update(copy.deepcopy(data))
+            else:
+                docs[self.id] = copy.deepcopy(data)
+
+    def update(self, data: dict) -> None:
+        self._store._delay()
+        with self._store._lock:
+            docs = self._store._docs.get(self._collection_path, {})
+            if self.id not in docs:
+                raise KeyError(f"No document to update: {'/'.join(self.path)}")
+            docs[self.id].update(copy.deepcopy(data))
+
+    def delete(self) -> None:
+        self._store._delay()
+        with self._store._lock:
+            self._store._docs.get(self._collection_path, {}).pop(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, collection: "FakeCollectionReference", limit: int | None = None):
+        self._collection = collection
+        self._limit = limit
+
+    def limit(self, count: int) -> "FakeQuery":
+        return FakeQuery(self._collection, count)
+
+    def stream(self):
+        store = self._collection._store
+        store._delay()
+        with store._lock:
+            items = list(store._docs.get(self._collection.path, {}).items())
+        if self._limit is not None:
+            items = items[:self._limit]
+        for doc_id, data in items:
+            ref = FakeDocumentReference(store, self._collection.path, doc_id)
+            yield FakeDocumentSnapshot(ref, data)
+
+    def get(self) -> list:
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, store, path: tuple):
+        self._store = store
+        self.path = path
+        super().__init__(self)
+
+    @property
+    def id(self) -> str:
+        return self.path[-1]
+
+    def document(self, doc_id: str | None = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._store, self.path, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: dict) -> tuple:
+        ref = self.document()
+        ref.set(data)
+        return datetime.now(timezone.utc), ref
+
+
+class FakeFirestore:
+    """Thread-safe in-memory Firestore client."""
+    def __init__(self, latency_ms: float | None = None):
+        self.latency_ms = _env_float("FAKE_FIRESTORE_LATENCY_MS", 0) if latency_ms is None else latency_ms
+        self._docs: dict[tuple, dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _delay(self) -> None:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, (name,))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._docs.clear()
+
+
+# ──────────────────────────────────────────────
+# OpenAI
+# ──────────────────────────────────────────────
+
+def default_responder(params: dict) -> str:
+    """Minimal valid output: empty JSON object for JSON modes, text otherwise."""
+    response_format = params.get("response_format") or {}
+    if response_format.get("type") in ("json_object", "json_schema"):
+        return "{}"
+    return "This is a simulated response from the fake LLM backend."
+
+
+def _prompt_text(messages: list[dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(p.get("text", "") for p in content if p.get("type") == "text")
+    return "\n".join(parts)
+
+
+# What the API reports in response.model for each alias
+SNAPSHOT_MODELS = {
+    "gpt-3.5-turbo": "gpt-3.5-turbo-0125",
+    "gpt-4o-mini": "gpt-4o-mini-2024-07-18",
+    "gpt-4.1-nano": "gpt-4.1-nano-2025-04-14",
+}
+
+
+def _reported_model(params: dict) -> str:
+    model = params.get("model", "fake")
+    return SNAPSHOT_MODELS.get(model, model)
+
+
+class FakeLLM:
+    """Shared latency/token/error model behind the sync and async clients."""
+    def __init__(
+        self,
+        responder: Callable[[dict], str] | None = None,
+        base_latency_ms: float | None = None,
+        prefill_tps: float | None = None,
+        decode_tps: float | None = None,
+        jitter: float | None = None,
+        error_rate: float | None = None,
+        timeout_rate: float | None = None,
+        seed: int | None = None,
+        model_base_latency_ms: dict[str, float] | None = None,
+    ):
+        self.responder = responder or default_responder
+        self.base_latency_ms = _env_float("FAKE_LLM_BASE_LATENCY_MS", 300) if base_latency_ms is None else base_latency_ms
+        self.prefill_tps = _env_float("FAKE_LLM_PREFILL_TPS", 5000) if prefill_tps is None else prefill_tps
+        self.decode_tps = _env_float("FAKE_LLM_DECODE_TPS", 80) if decode_tps is None else decode_tps
+        self.jitter = _env_float("FAKE_LLM_JITTER", 0.2) if jitter is None else jitter
+        self.error_rate = _env_float("FAKE_LLM_ERROR_RATE", 0.0) if error_rate is None else error_rate
+        self.timeout_rate = _env_float("FAKE_LLM_TIMEOUT_RATE", 0.0) if timeout_rate is None else timeout_rate
+        # Per-model base latency overrides, e.g. to exercise model routing
+        self.model_base_latency_ms = model_base_latency_ms or {}
+        self._random = random.Random(seed)
+        self._seen_prefixes: set[str] = set()
+        self.calls = 0
+
+    def plan(self, params: dict) -> dict:
+        """Decide the outcome, content, usage and timings of one call."""
+        self.calls += 1
+        roll = self._random.random()
+        request = httpx.Request("POST", "https://fake-llm.local/v1/chat/completions")
+        if roll < self.timeout_rate:
+            return {"error": openai.APITimeoutError(request=request), "delay": params.get("timeout") or 30}
+        if roll < self.timeout_rate + self.error_rate:
+            return {"error": openai.APIConnectionError(request=request), "delay": self.base_latency_ms / 1000}
+
+        messages = params.get("messages", [])
+        n = params.get("n") or 1
+        contents = []
+        for _ in range(n):
+            content = self.responder(params)
+            max_tokens = params.get("max_tokens") or params.get("max_completion_tokens")
+            if max_tokens and count_tokens(content) > max_tokens:
+                content = content[:max_tokens * 4]
+            contents.append(content)
+
+        prompt_tokens = count_tokens(_prompt_text(messages))
+        completion_tokens = sum(count_tokens(c) for c in contents)
+
+        # Provider-style prefix caching: >= 1024 token prompts reuse the system prefix
+        cached_tokens = 0
+        system = next((m.get("content") for m in messages if m.get("role") == "system"), None)
+        if isinstance(system, str) and prompt_tokens >= 1024:
+            if system in self._seen_prefixes:
+                cached_tokens = min(prompt_tokens, count_tokens(system)) // 128 * 128
+            self._seen_prefixes.add(system)
+
+        scale = 1 + self._random.uniform(-self.jitter, self.jitter)
+        base_latency_ms = self.model_base_latency_ms.get(params.get("model"), self.base_latency_ms)
+        prefill = (base_latency_ms / 1000 + (prompt_tokens - cached_tokens) / self.prefill_tps) * scale
+        # n choices are decoded side by side, so latency follows the longest one
+        decode = max(count_tokens(c) for c in contents) / self.decode_tps * scale
+        return {
+            "contents": contents,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+            "ttft": prefill,
+            "decode": decode,
+        }
+
+    @staticmethod
+    def completion(params: dict, plan: dict) -> ChatCompletion:
+        return ChatCompletion.model_validate({
+            "id": f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": _reported_model(params),
+            "choices": [
+                {
+                    "index": i,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+                for i, content in enumerate(plan["contents"])
+            ],
+            "usage": plan["usage"],
+        })
+
+    @staticmethod
+    def chunks(params: dict, plan: dict, pieces: int = 8) -> list[ChatCompletionChunk]:
+        chunk_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+        content = plan["contents"][0]
+        size = max(1, -(-len(content) // pieces))
+        base = {"id": chunk_id, "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": _reported_model(params)}
+        result = [
+            ChatCompletionChunk.model_validate({**base, "choices": [
+                {"index": 0, "delta": {"content": content[i:i + size]}, "finish_reason": None}
+            ]})
+            for i in range(0, len(content), size)
+        ]
+        result.append(ChatCompletionChunk.model_validate({**base, "choices": [
+            {"index": 0, "delta": {}, "finish_reason": "stop"}
+        ]}))
+        if (params.get("stream_options") or {}).get("include_usage"):
+            result.append(ChatCompletionChunk.model_validate({**base, "choices": [], "usage": plan["usage"]}))
+        return result
+
+
+class _AsyncCompletions:
+    def __init__(self, llm: FakeLLM):
+        self._llm = llm
+
+    async def create(self, **params) -> Any:
+        plan = self._llm.plan(params)
+        if "error" in plan:
+            await asyncio.sleep(plan["delay"])
+            raise plan["error"]
+        if params.get("stream"):
+            return self._stream(params, plan)
+        await asyncio.sleep(plan["ttft"] + plan["decode"])
+        return self._llm.completion(params, plan)
+
+    async def _stream(self, params: dict, plan: dict):
+        await asyncio.sleep(plan["ttft"])
+        chunks = self._llm.chunks(params, plan)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(plan["decode"] / len(chunks))
+
+
+class _SyncCompletions:
+    def __init__(self, llm: FakeLLM):
+        self._llm = llm
+
+    def create(self, **params) -> Any:
+        plan = self._llm.plan(params)
+        if "error" in plan:
+            time.sleep(plan["delay"])
+            raise plan["error"]
+        time.sleep(plan["ttft"] + plan["decode"])
+        if params.get("stream"):
+            return iter(self._llm.chunks(params, plan))
+        return self._llm.completion(params, plan)
+
+
+class _Chat:
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class FakeAsyncOpenAI:
+    """Drop-in for AsyncOpenAI's chat.completions surface."""
+    def __init__(self, llm: FakeLLM | None = None):
+        self.llm = llm or FakeLLM()
+        self.chat = _Chat(_AsyncCompletions(self.llm))
+
+
+class FakeOpenAI:
+    """Drop-in for OpenAI's chat.completions surface."""
+    def __init__(self, llm: FakeLLM | None = None):
+        self.llm = llm or FakeLLM()
+        self.chat = _Chat(_SyncCompletions(self.llm))
+
+
+def json_responder(routes: list[tuple[str, Any]], fallback: Callable[[dict], str] = default_responder):
+    """
+    Build a responder that picks canned output by a marker in the prompt.
+
+    Args:
+        routes: (marker, output) pairs checked in order. output is a dict
+                (serialized as JSON), a string, or a callable(params) -> str.
+        fallback: Responder used when no marker matches.
+    """
+    def responder(params: dict) -> str:
+        text = _prompt_text(params.get("messages", []))
+        for marker, output in routes:
+            if marker in text:
+                if callable(output):
+                    return output(params)
+                return output if isinstance(output, str) else json.dumps(output)
+        return fallback(params)
+    return responder
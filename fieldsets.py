@@ -0,0 +1,62 @@
+"""
+Sparse fieldsets for the large dashboard responses.
+
+`sections=` picks which sections of a response to return (and, on a cache
+miss, which to generate); `fields=` picks which keys to keep inside each
+section, e.g. fields=score,observations drops the raw "current" copies of
+the scraped profile. Both are comma-separated query parameters; omitting
+them returns everything, as before.
+"""
+import hashlib
+
+from fastapi import HTTPException
+
+
+def parse_sections(value: str | None, allowed: list[str]) -> list[str] | None:
+    """
+    Canonical section names (case-insensitive match, in `allowed` order).
+    None means all sections; unknown names are a 400.
+    """
+    if not value or not value.strip():
+        return None
+    lookup = {name.lower(): name for name in allowed}
+    requested = [part.strip().lower() for part in value.split(",") if part.strip()]
+    unknown = [part for part in requested if part not in lookup]
+    if unknown:
+        raise HTTPException(400, f"Unknown sections: {', '.join(unknown)}. Expected any of: {', '.join(allowed)}")
+    chosen = {lookup[part] for part in requested}
+    selected = [name for name in allowed if name in chosen]
+    return None if len(selected) == len(allowed) else selected
+
+
+def parse_fields(value: str | None) -> list[str] | None:
+    """Keys to keep inside each section; None means all."""
+    if not value:
+        return None
+    fields = sorted({part.strip() for part in value.split(",") if part.strip()})
+    return fields or None
+
+
+def select_fields(section, fields: list[str] | None, keep: tuple = ()):
+    """A section dict narrowed to `fields` (plus the `keep` identity keys)."""
+    if fields is None or not isinstance(section, dict):
+        return section
+    return {key: value for key, value in section.items() if key in fields or key in keep}
+
+
+def selection_key(sections: list[str] | None, fields: list[str] | None = None) -> str:
+    """Stable description of a selection for cache keys; '' when nothing is narrowed."""
+    parts = []
+    if sections:
+        parts.append("sections=" + ",".join(sections))
+    if fields:
+        parts.append("fields=" + ",".join(fields))
+    return ";".join(parts)
+
+
+def selection_etag(etag: str | None, sections: list[str] | None, fields: list[str] | None) -> str | None:
+    """ETag of a narrowed view of a cached entry (distinct from the full entry's)."""
+    key = selection_key(sections, fields)
+    if etag is None or not key:
+        return etag
+    return f"{etag}_{hashlib.blake2b(key.encode(), digest_size=4).hexdigest()}"
@@ -0,0 +1,243 @@
+"""
+Fast JSON rendering and response compression.
+
+FastJSONResponse is the app's default response class: it serializes with
+orjson when installed (stdlib json otherwise, compact separators either way).
+
+CompressionMiddleware negotiates br/gzip from Accept-Encoding and compresses
+single-message JSON/text bodies of at least MIN_COMPRESS_BYTES. Streaming
+bodies (NDJSON, SSE) and responses that already carry a Content-Encoding pass
+through untouched. The negotiated encoding and the request's If-None-Match
+are published in contextvars so handlers can pick a precompressed body, or
+answer 304, themselves.
+
+cached_json_response() is for cache hits: the same cached payload is served
+many times, so its compressed bytes are kept in a small in-process LRU keyed
+by a digest of the serialized body and never recompressed. Keying by content
+means a rewritten cache entry simply gets a new digest. Given the entry's
+content hash (cache.get_cached_entry) it also sets a strong ETag and answers
+a matching If-None-Match with 304 before serializing anything.
+"""
+import asyncio
+import contextvars
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # ~gzip -6 speed with noticeably smaller output on JSON
+THREAD_COMPRESS_BYTES = 256 * 1024  # compress bigger bodies off the event loop
+ENCODED_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Part of every ETag; bump when the response envelope around cached data changes
+RESPONSE_VERSION = 1
+# Per-user data that can change at any time: browsers may store it, but must revalidate
+CACHED_RESPONSE_CACHE_CONTROL = "private, no-cache"
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+STREAMING_TYPES = ("application/x-ndjson", "text/event-stream")
+
+# Set per request by CompressionMiddleware: negotiated encoding (None = identity), If-None-Match
+_accepted_encoding: contextvars.ContextVar = contextvars.ContextVar("accepted_encoding", default=None)
+_if_none_match: contextvars.ContextVar = contextvars.ContextVar("if_none_match", default=None)
+
+# (body digest, encoding) -> compressed bytes
+_encoded: "OrderedDict[tuple[bytes, str], bytes]" = OrderedDict()
+_encoded_bytes = 0
+
+
+def dumps(content) -> bytes:
+    """Serialize to compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content, default=jsonable_encoder,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=jsonable_encoder, ensure_ascii=False,
+                      allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """br if accepted (and available), then gzip, else None; honours q=0."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+async def _compress(body: bytes, encoding: str) -> bytes:
+    if len(body) >= THREAD_COMPRESS_BYTES:
+        return await asyncio.to_thread(compress, body, encoding)
+    return compress(body, encoding)
+
+
+def _compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(STREAMING_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _encoded_body(body: bytes, encoding: str) -> bytes:
+    """Compressed body from the LRU, compressing and storing it on a miss."""
+    global _encoded_bytes
+    key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+    encoded = _encoded.get(key)
+    if encoded is not None:
+        _encoded.move_to_end(key)
+        return encoded
+    encoded = compress(body, encoding)
+    _encoded[key] = encoded
+    _encoded_bytes += len(encoded)
+    while _encoded_bytes > ENCODED_CACHE_MAX_BYTES and _encoded:
+        _, evicted = _encoded.popitem(last=False)
+        _encoded_bytes -= len(evicted)
+    return encoded
+
+
+def _etag_matches(if_none_match: str | None, base: str) -> bool:
+    """Weak comparison (RFC 9110), ignoring the per-encoding suffix."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag.removeprefix("W/").strip('"')
+        if tag == base or tag.rsplit("-", 1)[0] == base:
+            return True
+    return False
+
+
+def cached_json_response(content, etag: str | None = None, status_code: int = 200) -> Response:
+    """
+    JSON response for a cache hit, using the precompressed body when the
+    client accepts compression.
+
+    etag is the cache entry's content hash. With it the response carries a
+    strong ETag (one per encoding, since each is a different representation)
+    and a matching If-None-Match gets an empty 304.
+    """
+    encoding = _accepted_encoding.get()
+    headers = {}
+    if etag is not None:
+        base = f"{etag}.{RESPONSE_VERSION}"
+        headers = {
+            "ETag": f'"{base}-{encoding}"' if encoding else f'"{base}"',
+            "Cache-Control": CACHED_RESPONSE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(_if_none_match.get(), base):
+            return Response(status_code=304, headers=headers)
+
+    body = dumps(content)
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+    headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    return Response(_encoded_body(body, encoding), status_code=status_code,
+                    media_type="application/json", headers=headers)
+
+
+class CompressionMiddleware:
+    """Pure ASGI br/gzip compression for buffered (single-message) bodies."""
+
+    def __init__(self, app, minimum_size: int = MIN_COMPRESS_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        encoding = choose_encoding(headers.get("accept-encoding"))
+        token = _accepted_encoding.set(encoding)
+        match_token = _if_none_match.set(headers.get("if-none-match"))
+        try:
+            if encoding is None:
+                await self.app(scope, receive, send)
+            else:
+                await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+        finally:
+            _accepted_encoding.reset(token)
+            _if_none_match.reset(match_token)
+
+
+class _CompressingSend:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        start, self.start = self.start, None
+        self.passthrough = True
+        body = message.get("body", b"")
+        headers = MutableHeaders(scope=start)
+        if (
+            message.get("more_body", False)
+            or "content-encoding" in headers
+            or len(body) < self.minimum_size
+            or not _compressible(headers.get("content-type", ""))
+        ):
+            await self.send(start)
+            await self.send(message)
+            return
+
+        body = await _compress(body, self.encoding)
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(body))
+        headers.add_vary_header("Accept-Encoding")
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": body})
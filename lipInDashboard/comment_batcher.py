@@ -0,0 +1,178 @@
+"""
+Server-side micro-batching for /AIcomments (opt-in, LIPIN_COMMENT_BATCHING=1).
+
+At peak, comment requests from different users arrive within milliseconds
+of each other. Instead of one LLM call each, requests that miss the
+response cache are held for up to BATCH_WINDOW_MS (or until BATCH_MAX_ITEMS
+are waiting) and sent as one GroupedComments call, which answers every
+request as a JSON line. The call is streamed and each line is handed back
+to the caller waiting on that index as soon as it is complete, then stored
+in the LLM cache under a key of its own (batch_item_params: the grouped
+prompt and model, never the single-call key, whose prompt and model differ),
+so repeats are still cache hits.
+
+This trades some per-request latency (a caller waits for the lines ahead
+of it) for far fewer requests against the OpenAI rate limit.
+
+Requests the grouped answer skips or mangles, and every request in a group
+whose call fails, fall back to the normal single call.
+"""
+import asyncio
+import json
+import os
+from llm_utils import answered_by, lookup_cached_completion, single_llm_call, store_cached_completion, text_completion
+from model_routing import primary_model
+from .prompts import Comments, GroupedComments
+
+BATCHING_ENABLED = os.getenv("LIPIN_COMMENT_BATCHING", "0") == "1"
+BATCH_WINDOW_MS = int(os.getenv("LIPIN_COMMENT_BATCH_WINDOW_MS", "30"))
+BATCH_MAX_ITEMS = int(os.getenv("LIPIN_COMMENT_BATCH_MAX", "6"))
+
+COMMENT_MAX_TOKENS = 80
+COMMENT_TEMPERATURE = 0.3
+GROUP_TOKENS_PER_ITEM = 110  # comment plus the JSON line around it
+
+
+def parse_comment_line(line: str) -> tuple[int, str] | None:
+    """(index, comment) from one {"index": n, "comment": "..."} output line, else None."""
+    line = line.strip().strip(",")
+    if not line.startswith("{"):
+        return None
+    try:
+        item = json.loads(line)
+        index = int(item["index"])
+        comment = str(item["comment"]).strip()
+    except (ValueError, KeyError, TypeError):
+        return None
+    return (index, comment) if comment else None
+
+
+def comment_params(prompt, persona, tone, post, language) -> dict:
+    """The exact parameters /AIcomments sends for a single comment (and caches under)."""
+    return {
+        "model": primary_model("AIcomments"),
+        "messages": Comments(prompt, persona, tone, post, language).generate_messages(),
+        "max_tokens": COMMENT_MAX_TOKENS,
+        "temperature": COMMENT_TEMPERATURE,
+    }
+
+
+def batch_item_params(prompt, persona, tone, post, language) -> dict:
+    """
+    Cache key parameters for one comment answered inside a grouped call.
+    Only ever hashed, never sent: the grouped prompt and model as a group of one.
+    """
+    return {
+        "model": primary_model("AIcommentsBatch"),
+        "messages": GroupedComments([(0, prompt, persona, tone, post, language)]).generate_messages(),
+        "max_tokens": GROUP_TOKENS_PER_ITEM,
+        "temperature": COMMENT_TEMPERATURE,
+        "batch_item": True,
+    }
+
+
+class CommentBatcher:
+    """Collects concurrent comment requests and answers them with grouped LLM calls."""
+
+    def __init__(self, enabled: bool = BATCHING_ENABLED, window_ms: int = BATCH_WINDOW_MS,
+                 max_items: int = BATCH_MAX_ITEMS):
+        self.enabled = enabled
+        self.window = window_ms / 1000
+        self.max_items = max_items
+        self._pending: list[tuple[tuple, dict, dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, prompt, persona, tone, post, language) -> str:
+        """Comment text for one request, answered from the cache or the next group."""
+        params = comment_params(prompt, persona, tone, post, language)
+        batch_params = batch_item_params(prompt, persona, tone, post, language)
+        for key_params, endpoint in ((params, "AIcomments"), (batch_params, "AIcommentsBatch")):
+            cached = await lookup_cached_completion(key_params, endpoint)
+            if cached is not None:
+                return cached.choices[0].message.content.strip()
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((prompt, persona, tone, post, language), params, batch_params, future))
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        group, self._pending = self._pending, []
+        if group:
+            task = asyncio.create_task(self._run(group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: list) -> None:
+        answered = set()
+        stores = []
+
+        def deliver(line: str, model: str) -> None:
+            parsed = parse_comment_line(line)
+            if parsed is None or not 0 <= parsed[0] < len(group) or parsed[0] in answered:
+                return
+            index, comment = parsed
+            answered.add(index)
+            _, _, batch_params, future = group[index]
+            if not future.done():
+                future.set_result(comment)
+            completion = text_completion(model, comment)
+            # A degraded or fallback model's answer doesn't belong under the batch model's key
+            if answered_by(completion, batch_params["model"]):
+                stores.append(store_cached_completion(batch_params, completion, "AIcommentsBatch"))
+
+        if len(group) > 1:
+            await self._grouped_call(group, deliver)
+            print(f"[comment_batcher] {len(group)} requests in one call, {len(answered)} answered")
+
+        async def single(params, future):
+            try:
+                response = await single_llm_call(endpoint="AIcomments", **params)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            if not future.done():
+                future.set_result(response.choices[0].message.content.strip())
+
+        await asyncio.gather(*stores, *[
+            single(params, future) for index, (_, params, _, future) in enumerate(group)
+            if index not in answered and not future.done()
+        ])
+
+    async def _grouped_call(self, group: list, deliver) -> None:
+        """Stream one GroupedComments call, handing each complete output line (and the answering model) to deliver()."""
+        items = [(index, *item) for index, (item, _, _, _) in enumerate(group)]
+        buffer = ""
+        model = ""
+        try:
+            stream = await single_llm_call(
+                messages=GroupedComments(items).generate_messages(),
+                max_tokens=GROUP_TOKENS_PER_ITEM * len(items),
+                temperature=COMMENT_TEMPERATURE,
+                endpoint="AIcommentsBatch",
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for event in stream:
+                model = event.model or model
+                if not event.choices:
+                    continue
+                buffer += event.choices[0].delta.content or ""
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    deliver(line, model)
+            deliver(buffer, model)
+        except Exception as e:
+            print(f"[comment_batcher] Grouped call failed, falling back to single calls: {e}")
+
+
+comment_batcher = CommentBatcher()
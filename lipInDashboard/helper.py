@@ -1,18 +1,25 @@
 import json
 import re
+
+UPLOAD_MAX_BYTES = 800 * 1024
+
+
 class File_to_Base64:
     async def file_to_base64(self, file):
         from fastapi import HTTPException
-        import base64
+        import cpu_tasks
         content = await file.read()
-        if len(content) > 800 * 1024:
+        if len(content) > UPLOAD_MAX_BYTES:
             raise HTTPException(400, f"File too large: {file.filename}")
         
         # Reset file position for potential reuse
         await file.seek(0)
+
+        # Inline: a few ms even at the size limit, less than the hop to the process pool costs
+        encoded = cpu_tasks.b64encode(content)
     
         return {
-        "base64": base64.b64encode(content).decode('utf-8'),
+        "base64": encoded,
         "filename": file.filename,
         "mime_type": file.content_type,
         "size_bytes": len(content)
@@ -21,95 +28,160 @@ class File_to_Base64:
         self.count += amount
         print(f"Count is now: {self.count}")
 
+# Characters the extractor stops at outside and inside strings; the rest is copied through.
+_JSON_STRUCTURE = re.compile(r'["{}\[\],]')
+_JSON_STRING_END = re.compile(r'["\\]')
+_CLOSERS = {"{": "}", "[": "]"}
+_MAX_TRUNCATION_CUTS = 8
+
+
+def extract_json(text: str):
+    """
+    Parse the JSON value in an LLM response, repairing common defects.
+
+    Valid JSON, and JSON wrapped in markdown fences or prose, is parsed
+    directly. Otherwise the outermost value is scanned once, string- and
+    bracket-aware, dropping trailing commas and closing output cut off at
+    max_tokens. Raw newlines/tabs inside strings are accepted throughout.
+
+    Returns the parsed object; raises ValueError if nothing can be recovered.
+    """
+    if not text:
+        raise ValueError("empty response")
+    start = _first_container(text, 0)
+    if start == -1:
+        raise ValueError(f"no JSON value found in: {text[:100]!r}")
+    end = text.rfind(_CLOSERS[text[start]])
+    if end > start:
+        try:
+            return json.loads(text[start:end + 1], strict=False)
+        except json.JSONDecodeError:
+            pass
+
+    while start != -1:
+        try:
+            return _scan_and_repair(text, start)
+        except ValueError:
+            start = _first_container(text, start + 1)
+    raise ValueError(f"no JSON value found in: {text[:100]!r}")
+
+
+def _first_container(text: str, pos: int) -> int:
+    brace, bracket = text.find("{", pos), text.find("[", pos)
+    if brace == -1 or bracket == -1:
+        return max(brace, bracket)
+    return min(brace, bracket)
+
+
+def _scan_and_repair(text: str, start: int):
+    out = []  # repaired pieces
+    stack = []  # open containers
+    cuts = []  # (len(out), open containers) at each comma, to back off to on truncation
+    in_string = False
+    pos = start
+    length = len(text)
+    while pos < length:
+        match = (_JSON_STRING_END if in_string else _JSON_STRUCTURE).search(text, pos)
+        if match is None:
+            break
+        i = match.start()
+        ch = text[i]
+        if i > pos:
+            out.append(text[pos:i])
+        pos = i + 1
+        if in_string:
+            if ch == "\\":
+                out.append(text[i:i + 2])
+                pos = i + 2
+            else:
+                out.append(ch)
+                in_string = False
+        elif ch == '"':
+            out.append(ch)
+            in_string = True
+        elif ch == "{" or ch == "[":
+            out.append(ch)
+            stack.append(ch)
+        elif ch == ",":
+            if stack:
+                cuts.append((len(out), list(stack)))
+            out.append(ch)
+        else:
+            if not stack or _CLOSERS[stack[-1]] != ch:
+                continue  # stray closer
+            _drop_trailing_comma(out)
+            out.append(ch)
+            stack.pop()
+            if not stack:
+                return json.loads("".join(out), strict=False)
+
+    if pos < length:
+        out.append(text[pos:])
+    if not stack:
+        raise ValueError("unterminated JSON value")
+
+    # Truncated (e.g. max_tokens): close what is open, else back off to an earlier comma
+    tail = "".join(out)
+    if in_string:
+        tail = tail.rstrip("\\") + '"'
+    candidates = [tail.rstrip().rstrip(",") + _close(stack)]
+    for cut, open_stack in reversed(cuts[-_MAX_TRUNCATION_CUTS:]):
+        candidates.append("".join(out[:cut]) + _close(open_stack))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate, strict=False)
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("truncated JSON could not be repaired")
+
+
+def _drop_trailing_comma(out: list) -> None:
+    for k in range(len(out) - 1, -1, -1):
+        piece = out[k].rstrip()
+        if piece:
+            if piece.endswith(","):
+                out[k] = piece[:-1]
+            return
+        out[k] = ""
+
+
+def _close(stack: list) -> str:
+    return "".join(_CLOSERS[c] for c in reversed(stack))
+
+
 class Clean_JSON:
     def __init__(self, raw_response):
         self.raw_response = raw_response
 
-    def clean_json_response(self):
-        """Clean and extract JSON from AI response"""
-        if not self.raw_response:
-            return '{}'
-
-        response = self.raw_response.strip()
-
-        # Remove markdown code blocks - handle various formats
-        # Remove ```json ... ``` blocks
-        response = re.sub(r'```json\s*\n?', '', response)
-        response = re.sub(r'```\s*$', '', response)
-        response = re.sub(r'^```\s*', '', response, flags=re.MULTILINE)
-        response = re.sub(r'\s*```$', '', response, flags=re.MULTILINE)
-
-        # Remove any leading/trailing whitespace
-        response = response.strip()
-
-        # Find JSON content between first { and last }
-        start = response.find('{')
-        end = response.rfind('}')
-
-        if start != -1 and end != -1 and end > start:
-            response = response[start:end+1]
-        elif response.startswith('['):
-            # Handle JSON arrays
-            end = response.rfind(']')
-            if end != -1:
-                response = response[:end+1]
-        else:
-            # No valid JSON found
-            print(f"Warning: No valid JSON structure found in response: {response[:100]}...")
-            return '{}'
+    def parse(self):
+        """Parsed JSON from the AI response; raises ValueError if none is recoverable."""
+        return extract_json((self.raw_response or "").strip())
 
-        # Try parsing the JSON
+    def clean_json_response(self):
+        """Clean and extract JSON from AI response (as a JSON string, '{}' on failure)"""
         try:
-            parsed = json.loads(response)
-            return json.dumps(parsed)
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            print(f"Attempting to fix response...")
-
-            # Try various fixes
-            fixed_response = response
-
-            # Fix unescaped newlines within strings
-            fixed_response = fixed_response.replace('\r\n', '\\n').replace('\r', '\\n')
-
-            # Fix single quotes to double quotes (common AI mistake)
-            # Only do this outside of string values - simple approach
-            try:
-                parsed = json.loads(fixed_response)
-                return json.dumps(parsed)
-            except json.JSONDecodeError:
-                pass
-
-            # Try replacing newlines with spaces
-            fixed_response = response.replace('\n', ' ').replace('\r', ' ')
-            try:
-                parsed = json.loads(fixed_response)
-                return json.dumps(parsed)
-            except json.JSONDecodeError:
-                pass
-
-            # Last resort - return empty object
-            print(f"Failed to parse JSON. Raw response: {response[:200]}...")
+            return json.dumps(self.parse())
+        except ValueError as e:
+            print(f"Failed to parse JSON: {e}")
             return '{}'
 
 class Image_Processor:
     def __init__(self, base64_img ):
         self.base64_img = base64_img
-    def convert_img_to_str(self):
+    def _image_bytes(self):
         import base64
-        from io import BytesIO
-        from PIL import Image
-        import pytesseract
+        # Decode the base64 string (a data URI)
+        return base64.b64decode(self.base64_img.split(",")[1])
 
-        # Decode the base64 string
-        img_data = base64.b64decode(self.base64_img.split(",")[1])
-        
-        # Convert bytes data to a PIL Image
-        image = Image.open(BytesIO(img_data))
-
-        text = pytesseract.image_to_string(image)
-
-        return text
+    def convert_img_to_str(self):
+        import cpu_tasks
+        return cpu_tasks.ocr_image(self._image_bytes())
+
+    async def convert_img_to_str_async(self, timeout=30, preprocess=False):
+        """convert_img_to_str run in the process pool, off the event loop."""
+        import cpu_tasks
+        from process_pool import run_cpu
+        return await run_cpu("ocr", cpu_tasks.ocr_image, self._image_bytes(), preprocess, timeout=timeout)
 
 class Simple_File_Handler:
     """Simplified file processing for attachments"""
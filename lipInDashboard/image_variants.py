@@ -0,0 +1,114 @@
+"""
+Image normalization for uploaded screenshots, done once at upload time.
+
+/personalInfo used to store images exactly as uploaded. Each image is now
+decoded in the process pool and re-encoded as WebP (EXIF orientation
+applied, metadata stripped):
+
+- the stored copy ("base64") is capped at STORED_MAX_SIDE, enough for OCR
+  (a lossless screenshot stays at native size if downscaling would grow it)
+- variants["vision"] is capped at VISION_MAX_SIDE, what a low-detail vision
+  call sees anyway, so vision requests never ship the full-size image
+
+Repeated uploads in the same list are dropped: SSI screenshots only when
+the normalized image is identical (their scores differ in a few pixels),
+profile images also when near-identical by difference hash (same image
+resaved in another format). Anything that isn't a decodable image is
+stored as before.
+"""
+import base64
+import hashlib
+
+import cpu_tasks
+from process_pool import CPUPoolBusy, run_cpu
+from .helper import File_to_Base64, UPLOAD_MAX_BYTES
+
+STORED_MAX_SIDE = 2048
+VISION_MAX_SIDE = 512
+IMAGE_TIMEOUT_SECONDS = 15
+# dhash bits that may differ between two uploads of the same image (perceptual dedupe)
+DUPLICATE_MAX_DISTANCE = 4
+
+
+async def image_upload(file) -> dict:
+    """
+    Upload entry for an image: the normalized copy in the File_to_Base64
+    format, plus dimensions, dhash, image_sha256 and the "vision" variant.
+    Falls back to the raw File_to_Base64 entry when normalization fails.
+    """
+    from fastapi import HTTPException
+    content = await file.read()
+    if len(content) > UPLOAD_MAX_BYTES:
+        raise HTTPException(400, f"File too large: {file.filename}")
+    await file.seek(0)
+
+    if (file.content_type or "").startswith("image/"):
+        try:
+            normalized = await run_cpu(
+                "image", cpu_tasks.normalize_image, content,
+                {"stored": STORED_MAX_SIDE, "vision": VISION_MAX_SIDE},
+                timeout=IMAGE_TIMEOUT_SECONDS,
+            )
+        except CPUPoolBusy as e:
+            print(f"[image_variants] Storing {file.filename} as uploaded, pool busy: {e}")
+        except Exception as e:
+            print(f"[image_variants] Storing {file.filename} as uploaded, not normalized: {e}")
+        else:
+            stored = normalized["variants"]["stored"]
+            print(f"[image_variants] {file.filename}: {len(content)} -> {stored['size_bytes']} bytes "
+                  f"({stored['width']}x{stored['height']})")
+            return {
+                "base64": stored["base64"],
+                "filename": file.filename,
+                "mime_type": stored["mime_type"],
+                "size_bytes": stored["size_bytes"],
+                "width": stored["width"],
+                "height": stored["height"],
+                "image_sha256": stored["sha256"],
+                "dhash": normalized["dhash"],
+                "original_mime_type": file.content_type,
+                "original_size_bytes": len(content),
+                "variants": {"vision": normalized["variants"]["vision"]},
+            }
+
+    return await File_to_Base64().file_to_base64(file)
+
+
+def dedupe_images(entries: list[dict], perceptual: bool = False) -> list[dict]:
+    """
+    entries without later duplicates of an earlier image: identical stored
+    content, or with perceptual=True also a near-identical dhash. Only use
+    perceptual for images whose meaning isn't in small details; two SSI
+    panels with different scores can be a few dhash bits apart.
+    """
+    kept, digests, hashes = [], set(), []
+    for entry in entries:
+        digest = image_sha256(entry) if entry.get("base64") else None
+        if digest in digests:
+            print(f"[image_variants] Dropping {entry.get('filename')}: same image as an earlier upload")
+            continue
+        dhash = entry.get("dhash") if perceptual else None
+        if dhash:
+            value = int(dhash, 16)
+            if any(bin(value ^ seen).count("1") <= DUPLICATE_MAX_DISTANCE for seen in hashes):
+                print(f"[image_variants] Dropping {entry.get('filename')}: near-duplicate of an earlier upload")
+                continue
+            hashes.append(value)
+        if digest:
+            digests.add(digest)
+        kept.append(entry)
+    return kept
+
+
+def vision_data_uri(file_data: dict) -> str:
+    """Data URI to send to a vision model: the small variant when there is one."""
+    source = (file_data.get("variants") or {}).get("vision") or file_data
+    mime_type = source.get("mime_type") or source.get("content_type") or "image/png"
+    return f"data:{mime_type};base64,{source['base64']}"
+
+
+def image_sha256(file_data: dict) -> str:
+    """Content hash of the stored image (computed at upload for normalized entries)."""
+    if file_data.get("image_sha256"):
+        return file_data["image_sha256"]
+    return hashlib.sha256(base64.b64decode(file_data["base64"])).hexdigest()
@@ -0,0 +1,110 @@
+"""
+Resume text extraction, done once per file.
+
+/personalInfo extracts the text of each uploaded resume as it arrives and
+stores it on the file entry, so /profileAnalysis never parses a PDF. The
+text is also kept in the "resumeText" collection keyed by the file's
+SHA-256: re-uploading the same file, or analysing a profile saved before
+upload-time extraction existed, reuses it instead of parsing again.
+
+Only the first RESUME_MAX_PAGES pages are read, and reading stops as soon as
+the text is past what the analysis prompt can hold (RESUME_MAX_TOKENS).
+"""
+import asyncio
+import base64
+import hashlib
+from datetime import datetime, timezone
+
+import cpu_tasks
+from config import db
+from context_packer import CONTEXT_BUDGETS, truncate_to_tokens
+from process_pool import CPUTaskError, run_cpu
+
+RESUME_MAX_PAGES = 5
+# Nothing beyond the analysis prompt's whole context budget can ever be used
+RESUME_MAX_TOKENS = CONTEXT_BUDGETS["profileAnalysis"]
+# Upper bound on characters per token; past this many chars the cap is surely reached
+_MAX_CHARS_PER_TOKEN = 6
+PDF_TIMEOUT_SECONDS = 20
+
+
+async def extract_pdf_text(pdf_bytes: bytes) -> dict:
+    """Text of the first pages of a PDF (parsed in the process pool), capped at RESUME_MAX_TOKENS."""
+    extracted = await run_cpu(
+        "pdf_text", cpu_tasks.pdf_text, pdf_bytes, RESUME_MAX_PAGES, RESUME_MAX_TOKENS * _MAX_CHARS_PER_TOKEN,
+        timeout=PDF_TIMEOUT_SECONDS,
+    )
+    text = extracted["text"]
+    capped = truncate_to_tokens(text, RESUME_MAX_TOKENS)
+    extracted["text"] = capped
+    extracted["truncated"] = extracted["pages_read"] < extracted["page_count"] or capped != text
+    return extracted
+
+
+def _load(sha256: str) -> dict | None:
+    doc = db.collection("resumeText").document(sha256).get()
+    return doc.to_dict() if doc.exists else None
+
+
+def _store(sha256: str, entry: dict) -> None:
+    db.collection("resumeText").document(sha256).set(entry)
+
+
+async def extract_resume(file_data: dict) -> dict:
+    """
+    The upload entry (as from File_to_Base64) with its text attached:
+    text_sha256 plus either "text" and page info, or "text_error".
+    The PDF is only parsed when its hash hasn't been seen before.
+    """
+    pdf_bytes = base64.b64decode(file_data["base64"])
+    sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+    try:
+        entry = await asyncio.to_thread(_load, sha256)
+    except Exception as e:
+        print(f"[resume_text] Lookup failed for {sha256[:12]}: {e}")
+        entry = None
+
+    if entry is None:
+        start = datetime.now(timezone.utc)
+        try:
+            entry = await extract_pdf_text(pdf_bytes)
+        except CPUTaskError as e:
+            # Pool busy, timed out or restarted under us: leave the text off so the next analysis
+            # retries. text_error is only for PDFs that fail to parse.
+            print(f"[resume_text] Deferred extraction of {file_data.get('filename')}: {e}")
+            return {**file_data, "text_sha256": sha256}
+        except Exception as e:
+            print(f"[resume_text] Extraction failed for {file_data.get('filename')}: {e}")
+            return {**file_data, "text_sha256": sha256, "text_error": str(e)}
+        entry["extracted_at"] = datetime.now(timezone.utc)
+        elapsed = (entry["extracted_at"] - start).total_seconds()
+        print(f"[resume_text] Extracted {entry['pages_read']}/{entry['page_count']} pages "
+              f"of {file_data.get('filename')} in {elapsed:.2f}s")
+        try:
+            await asyncio.to_thread(_store, sha256, entry)
+        except Exception as e:
+            print(f"[resume_text] Could not store text for {sha256[:12]}: {e}")
+
+    return {
+        **file_data,
+        "text_sha256": sha256,
+        "text": entry["text"],
+        "page_count": entry["page_count"],
+        "pages_read": entry["pages_read"],
+        "text_truncated": entry["truncated"],
+    }
+
+
+def resume_attachment(file_data: dict) -> dict:
+    """The attachment NicheRecommendation expects, from an extracted upload entry."""
+    if "text_error" in file_data:
+        return {
+            "filename": file_data.get("filename", "unknown"),
+            "error": f"PDF extraction failed: {file_data['text_error']}",
+            "type": "error",
+        }
+    return {
+        "filename": file_data.get("filename", "resume.pdf"),
+        "content": file_data.get("text", ""),
+        "type": "pdf_text_extracted",
+    }
@@ -1,25 +1,32 @@
 from fastapi import APIRouter, HTTPException, status, File, UploadFile, Form, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import json
-import base64
-import io
 import time
 import asyncio
-from PyPDF2 import PdfReader
-from config import db, client, async_client
-from cache import get_cached_profile, set_cached_profile
+from config import db
+from cache import bump_cache_generation, cache_generation, get_cached_entry, get_cached_profile, set_cached_profile
+from fieldsets import parse_fields, parse_sections, select_fields, selection_etag, selection_key
+from http_responses import cached_json_response
 from llm_utils import single_llm_call
+from context_packer import pack_fields, CONTEXT_BUDGETS, count_tokens, truncate_to_tokens
+from structured_output import StructuredOutputError, parse_json_response
 from .prompts import (
-    Comments,
-    SSIRecommendations,
-    SSIImageProcessing,
+    BatchComments,
     NicheRecommendation,
     NicheSpecificRecommendation,
     PostGenPrompt,
     ProfileBuilderPrompt,
 )
-from .helper import Image_Processor, Clean_JSON, File_to_Base64, Simple_File_Handler
+from .comment_batcher import comment_batcher, comment_params, parse_comment_line
+from .helper import File_to_Base64, Simple_File_Handler
+from .image_variants import dedupe_images, image_upload
+from .resume_text import extract_resume, resume_attachment
+from .ssi import component_scores, ssi_for_profile
+from .sessions import create_session, load_session, build_messages, append_turn, replace_last_reply
+from .variants import MAX_VARIANTS, generate_variants, pool_key
+from precompute import schedule_precompute, join_inflight, load_user_docs, unpin_docs, warm_up
 
 router = APIRouter(tags=["Dashboard"])
 
@@ -33,6 +40,8 @@ class CommentsBody(BaseModel):
     tone: str | None = None
     persona: str | None = None
     language: str | None = None
+    variants: int = 1
+    regenerate: bool = False
 
 class GeneratePostInput(BaseModel):
     profile_url: str
@@ -49,16 +58,26 @@ class nicheRecommend(BaseModel):
     profile_url: str
     niche: str
 
+class CommentsBatchBody(BaseModel):
+    posts: List[str]
+    prompt: str | None = None
+    tone: str | None = None
+    persona: str | None = None
+    language: str | None = None
+
 class PostBody(BaseModel):
     userReq: str
+    variants: int = 1
+    regenerate: bool = False
 
 class GoogleSignInRequest(BaseModel):
     profileURL: str
 
 class AskAIChat(BaseModel):
     message: str
-    history: List[str] = []
+    history: List[str] = []  # legacy: full transcript, superseded by session_id
     profile_url: Optional[str] = None
+    session_id: Optional[str] = None
 
 class GoogleSignInResponse(BaseModel):
     message: str
@@ -67,6 +86,94 @@ class SelectedNicheRequest(BaseModel):
     profile_url: str
     niche: str
 
+# ──────────────────────────────────────────────
+# Static system prompts (no interpolation, so the provider can cache them)
+# ──────────────────────────────────────────────
+
+AI_POSTS_SYSTEM_PROMPT = """You are a helpful assistant that generates engaging LinkedIn Posts.
+                You are a LinkedIn content-creation assistant. You specialize in crafting polished, professional LinkedIn posts that resonate with a business audience.
+                Your task is to analyze the user's requirements and genrate high-quality Linkdin posts descriptionss based on those requirements.
+
+                Your description must be suitable for LinkedIn, adhering to professional standards and best practices for engagement.
+                It should be clear, concise, and tailored to a business audience.
+                Language should be formal yet approachable, avoiding slang or overly casual expressions.
+
+                Format:
+                • The output should be structured with short paragraphs for easy readability.
+                • Use bullet points or numbered lists where appropriate to enhance clarity.
+                • Ensure the tone is professional, insightful, and value-driven.
+                • If the user requests a specific style or format, ensure that the output aligns with those specifications. Give user's instructions high priority in your response.
+                • Do NOT repeat the userReq verbatim—elevate and clarify it.
+                • No hashtags unless explicitly requested.
+                • No emojis unless explicitly requested.
+                • Only provide the post description as output; do not include any additional commentary or explanations.
+                This output will be used directly as LinkedIn post content, so it must be engaging and well-crafted. These posts are intended to foster professional connections and discussions on LinkedIn.
+                It will be viewed by a diverse audience of professionals and students so maintain a tone that is inclusive and respectful.
+
+                Ouptut:
+                Provie the LinkedIn post descriptions based on the user requirements in the next message.
+                Write only the final post descriptions (no explanations, no titles, no quotes).
+                """
+
+ASK_AI_SYSTEM_PROMPT = """
+        Role: You are a LinkedIn brand Content Creator.
+        Task: Assist users based on their request to improve their LinkedIn presence. The background information of the user is provided at the end to help you provide better responses.
+
+        Guidelines:
+        1. Use the background information to tailor your responses to the user's professional profile and aspirations.
+        2. Ensure that your responses align with LinkedIn's professional standards and best practices.
+        3. Provide actionable advice that the user can implement to enhance their LinkedIn presence.
+        4. Take the user background information into account while responding to the user's requests.
+        5. Act as if you have user's personality, preferences, and style in mind while responding.
+        """
+
+DEFAULT_COMMENT_PROMPT = "Professional, positive, conversational comment"
+DEFAULT_COMMENT_TONE = "Professional, positive, conversational tone"
+DEFAULT_COMMENT_PERSONA = "Mid level professional with a focus on collaboration and innovation"
+DEFAULT_LANGUAGE = 'Use American English with plain, conversational language. Short sentences, common vocabulary, American spelling (color, organize), friendly and easy to understand.'
+
+# /AIcomments/batch limits
+BATCH_MAX_POSTS = 50
+BATCH_CHUNK_POSTS = 8  # posts per LLM call
+BATCH_CHUNK_TOKENS = 1800  # post text per LLM call
+BATCH_POST_TOKENS = 400  # cap for a single post
+BATCH_CONCURRENCY = 3  # chunk calls in flight per request
+BATCH_TOKENS_PER_COMMENT = 110
+
+def _check_variants(variants: int) -> None:
+    if not 1 <= variants <= MAX_VARIANTS:
+        raise HTTPException(400, f"variants must be between 1 and {MAX_VARIANTS}")
+
+# ──────────────────────────────────────────────
+# Conversation helpers
+# ──────────────────────────────────────────────
+
+async def _resolve_session(session_id, history, endpoint, profile_url=None):
+    """
+    Load the caller's session, or start one for new conversations (stored
+    only once its first exchange is appended).
+    Returns None for legacy clients that still send the full history.
+    """
+    if session_id:
+        session = await load_session(session_id, endpoint)
+        if session is None:
+            raise HTTPException(404, "Conversation session not found")
+        return session
+    if history:
+        return None
+    return await create_session(endpoint, profile_url)
+
+
+def _history_messages(system_content, history, new_message):
+    messages = [{"role": "system", "content": system_content}]
+    for i, msg in enumerate(history):
+        if i % 2 == 0:
+            messages.append({"role": "user", "content": msg})
+        else:
+            messages.append({"role": "assistant", "content": msg})
+    messages.append({"role": "user", "content": new_message})
+    return messages
+
 # ──────────────────────────────────────────────
 # Routes
 # ──────────────────────────────────────────────
@@ -78,8 +185,12 @@ async def generate_post(
     tone: Optional[str] = Form(None),
     language: Optional[str] = Form(None),
     history: List[str] = Form([]),
-    attachments: Optional[List[UploadFile]] = File(None)
+    attachments: Optional[List[UploadFile]] = File(None),
+    session_id: Optional[str] = Form(None),
+    variants: int = Form(1),
+    regenerate: bool = Form(False)
 ):
+    _check_variants(variants)
     tone = tone if tone else "Professional, positive, conversational tone"
     language = language if language else 'Use American English with plain, conversational language. Short sentences, common vocabulary, American spelling (color, organize), friendly and easy to understand.'
 
@@ -114,66 +225,103 @@ async def generate_post(
 
     genPostSystem = PostGenPrompt(processed_attachments, tone, language)
     try:
-        messages = [{"role": "system", "content": genPostSystem.generate_prompt()}]
-        for i, msg in enumerate(history):
-            if i % 2 == 0:
-                messages.append({"role": "user", "content": msg})
-            else:
-                messages.append({"role": "assistant", "content": msg})
-        messages.append({"role": "user", "content": prompt})
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=1000,
-            n=1,
-            stop=None,
-            temperature=0.7,
-        )
-        aiResponse = response.choices[0].message.content.strip()
+        session = await _resolve_session(session_id, history, "postGenerator", profile_url)
+        # Regenerating the last answer: drop that exchange and overwrite it afterwards
+        turns = session.get("turns", []) if session is not None else []
+        replacing = regenerate and len(turns) >= 2 and turns[-2]["role"] == "user" and turns[-2]["content"] == prompt
+        if session is not None:
+            context = {**session, "turns": turns[:-2]} if replacing else session
+            messages = build_messages(context, genPostSystem.generate_prompt(), prompt)
+        else:
+            # Legacy clients replay the full history on every turn
+            messages = _history_messages(genPostSystem.generate_prompt(), history, prompt)
+        params = {"messages": messages, "max_tokens": 1000, "temperature": 0.7}
+        if variants > 1 or regenerate:
+            key = pool_key("postGenerator", session["id"] if session else profile_url, prompt, tone, language,
+                           [a.get("filename") for a in processed_attachments])
+            candidates = await generate_variants(params, "postGenerator", variants, key, regenerate, cache=False)
+        else:
+            response = await single_llm_call(endpoint="postGenerator", cache=False, **params)
+            candidates = [response.choices[0].message.content.strip()]
+        aiResponse = candidates[0]
         print(aiResponse)
-        return {"response": aiResponse}
+        if session is not None:
+            if replacing:
+                await replace_last_reply(session, aiResponse)
+            else:
+                await append_turn(session, prompt, aiResponse)
+        result = {"response": aiResponse, "session_id": session["id"] if session else None}
+        if variants > 1:
+            result["variants"] = candidates
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sparse_builder(data: dict, sections: list | None, fields: list | None) -> dict:
+    """Profile builder data narrowed to the requested sections and per-section fields."""
+    if not sections and not fields:
+        return data
+    return {
+        key: select_fields(value, fields)
+        for key, value in data.items()
+        if not sections or key in sections or key not in ProfileBuilderPrompt.SECTIONS
+    }
+
+
 @router.get("/profileBuilder")
-async def get_profile_builder(profile_url: str = Query(...), niche: str = Query(None)):
+async def get_profile_builder(
+    profile_url: str = Query(...),
+    niche: str = Query(None),
+    sections: str = Query(None),
+    fields: str = Query(None),
+):
+    """
+    sections=headline,about returns (and on a cache miss generates) only those
+    sections; fields=suggestions keeps only those keys inside each section.
+    """
     start_time = time.time()
     print(f"[profileBuilder] Request started for: {profile_url}, niche: {niche}")
 
     try:
+        selected_sections = parse_sections(sections, ProfileBuilderPrompt.SECTIONS)
+        selected_fields = parse_fields(fields)
+
         # Check cache first
         cache_start = time.time()
         cache_key = f"profile_builder:{profile_url.strip()}:{niche or 'general'}"
-        cached_data = await get_cached_profile(cache_key)
+        cached_data, etag = await get_cached_entry(cache_key)
         cache_time = time.time() - cache_start
         print(f"[profileBuilder] Cache check took: {cache_time:.3f}s")
 
+        # A post-write precompute may already be building the general version
+        if not cached_data and not niche and await join_inflight(profile_url, "build"):
+            cached_data, etag = await get_cached_entry(cache_key)
+
+        # Without the full result, a previous request may have generated just these sections
+        # (keyed on the data generation: a new write orphans every earlier subset)
+        subset_key = None
+        if selected_sections and not cached_data:
+            generation = await cache_generation(profile_url)
+            subset_key = f"{cache_key}:g{generation}:{selection_key(selected_sections)}"
+        if not cached_data and subset_key:
+            cached_data, etag = await get_cached_entry(subset_key)
+
         if cached_data:
             total_time = time.time() - start_time
             print(f"[profileBuilder] Cache HIT - Total time: {total_time:.3f}s")
-            return {"success": True, "message": "Data retrieved from cache", "data": cached_data}
-
-        # Run Firestore calls in thread pool to avoid blocking event loop
-        def fetch_profile_info():
-            data_ref = (db.collection("users").document(profile_url.strip())
-                .collection("profileInfo")
-                .stream())
-            return [doc.to_dict() for doc in data_ref]
-
-        def fetch_personal_info():
-            doc_ref = (
-                db.collection("users")
-                .document(profile_url.strip())
-                .collection("personalInfo")
-                .stream()
+            data = _sparse_builder(cached_data, selected_sections, selected_fields)
+            return cached_json_response(
+                {"success": True, "message": "Data retrieved from cache", "data": data},
+                selection_etag(etag, selected_sections, selected_fields),
             )
-            return [d.to_dict() for d in doc_ref]
 
-        # Fetch both in parallel using threads
+        # Fetch both in parallel (Firestore in threads, or from the sign-in pin)
         profile_data, documents = await asyncio.gather(
-            asyncio.to_thread(fetch_profile_info),
-            asyncio.to_thread(fetch_personal_info)
+            load_user_docs(profile_url, "profileInfo"),
+            load_user_docs(profile_url, "personalInfo"),
         )
 
         if not profile_data:
@@ -207,45 +355,38 @@ async def get_profile_builder(profile_url: str = Query(...), niche: str = Query(
                 Niche = niche
             profileSysIns = ProfileBuilderPrompt()
 
-            ssi_files = doc.get("ssiScoreFiles")
-            cleaned_response = {}
-            if ssi_files:
-                for idx, img in enumerate(ssi_files):
-                    try:
-                        content_type = img.get("content_type", "image/jpeg")
-                        image_type = content_type.split("/")[-1] if "/" in content_type else "jpeg"
-
-                        if image_type not in ["jpeg", "jpg", "png", "gif", "webp"]:
-                            image_type = "jpeg"
-
-                        base64_data = img.get("base64", "")
-                        if not base64_data:
-                            continue
-
-                        data_uri = f"data:image/{image_type};base64,{base64_data}"
-                    except Exception as e:
-                        print(f"Error processing SSI image {idx}: {e}")
-                        continue
             try:
+                # Fit inputs to the token budget: headline > about > recent experience
+                packed = pack_fields([
+                    ("headline", headline or "", 80),
+                    ("about", about or "", 500),
+                    ("experience", currentExp or []),
+                    ("skills", skills, 150),
+                ], CONTEXT_BUDGETS["profileBuilder"])
+
+                if selected_sections:
+                    section_request = f"Generate the profile builder JSON with only these sections: {', '.join(selected_sections)}."
+                else:
+                    section_request = "Generate the complete profile builder JSON with all sections: headline, about, experience, skills, education, and recommendation_request_template."
+
                 # Build user prompt with profile data
                 full_prompt = f"""Generate optimized LinkedIn profile content based on this data:
 
 PURPOSE: {purpose if purpose else 'N/A'}
 CAREER GOALS: {career if career else 'N/A'}
-CURRENT HEADLINE: {headline if headline else 'N/A'}
-CURRENT ABOUT: {about if about else 'N/A'}
-SKILLS: {', '.join(skills) if skills else 'None'}
+CURRENT HEADLINE: {packed['headline'] or 'N/A'}
+CURRENT ABOUT: {packed['about'] or 'N/A'}
+SKILLS: {', '.join(packed['skills']) if packed['skills'] else 'None'}
 TOPICS OF INTEREST: {', '.join(topics) if topics else 'None'}
-CURRENT EXPERIENCE: {json.dumps(currentExp[:3]) if currentExp else 'None'}
+CURRENT EXPERIENCE: {json.dumps(packed['experience']) if packed['experience'] else 'None'}
 TARGET NICHE: {Niche or 'General'}
 
-Generate the complete profile builder JSON with all sections: headline, about, experience, skills, education, and recommendation_request_template.
-Include "current" field with the user's actual data and "suggestions" array with improvements."""
+{section_request}
+Include a "suggestions" array with improvements for each section."""
 
                 # Use async LLM call
                 llm_start = time.time()
-                response = await async_client.chat.completions.create(
-                    model="gpt-4o-mini",
+                response = await single_llm_call(
                     messages=[
                         profileSysIns.generate_prompt(),
                         {
@@ -253,22 +394,20 @@ Include "current" field with the user's actual data and "suggestions" array with
                             "content": full_prompt
                         }
                     ],
-                    timeout=120,
                     max_tokens=6000,
                     temperature=0.2,
-                    response_format={"type": "json_object"}
+                    response_format=ProfileBuilderPrompt.response_format(selected_sections),
+                    endpoint="profileBuilder"
                 )
                 llm_time = time.time() - llm_start
                 print(f"[profileBuilder] LLM call took: {llm_time:.3f}s")
 
-                raw_content = response.choices[0].message.content
+                raw_content = response.choices[0].message.content or ""
                 print(f"Raw OpenAI response length: {len(raw_content)}")
-                print(f"Raw OpenAI response preview: {raw_content[:500]}...")
 
                 try:
-                    # With response_format=json_object, OpenAI guarantees valid JSON
-                    parsed_response = json.loads(raw_content)
-                    print(f"Parsed response keys: {list(parsed_response.keys())}")
+                    # Schema-constrained output; parsed once
+                    parsed_response = parse_json_response(response, "profileBuilder")
 
                     # The prompt returns with a "data" wrapper, extract it
                     if "data" in parsed_response:
@@ -277,9 +416,9 @@ Include "current" field with the user's actual data and "suggestions" array with
                         parsed_profile_builder = parsed_response
 
                     print(f"Final profile builder keys: {list(parsed_profile_builder.keys())}")
-                except json.JSONDecodeError as e:
+                except StructuredOutputError as e:
                     print(f"Error parsing profile builder JSON: {e}")
-                    print(f"Raw response: {raw_content}")
+                    print(f"Raw response: {raw_content[:500]}")
                     # Return a default structure instead of failing
                     parsed_profile_builder = {
                         "headline": {"current": headline or "", "suggestions": []},
@@ -288,6 +427,7 @@ Include "current" field with the user's actual data and "suggestions" array with
                         "skills": {"current": skills or [], "skillsToPrioritize": []},
                         "error": "Failed to generate AI recommendations. Please try again."
                     }
+                parsed_profile_builder = _sparse_builder(parsed_profile_builder, selected_sections, None)
 
                 # Post-processing: Inject actual user data from Firebase into "current" fields
                 # This ensures the response contains real user data, not LLM-generated content
@@ -331,13 +471,12 @@ Include "current" field with the user's actual data and "suggestions" array with
             raise HTTPException(500, "Failed to generate profile builder data")
 
         # Only cache if data is valid (has headline or about or experience)
-        has_valid_data = (
-            parsed_profile_builder.get("headline") or
-            parsed_profile_builder.get("about") or
-            parsed_profile_builder.get("experience")
+        has_valid_data = any(
+            parsed_profile_builder.get(name)
+            for name in selected_sections or ["headline", "about", "experience"]
         )
         if has_valid_data:
-            await set_cached_profile(cache_key, parsed_profile_builder)
+            await set_cached_profile(subset_key or cache_key, parsed_profile_builder)
             print(f"[profileBuilder] Data cached successfully")
         else:
             print(f"[profileBuilder] WARNING: Not caching - empty or invalid data")
@@ -345,7 +484,8 @@ Include "current" field with the user's actual data and "suggestions" array with
         total_time = time.time() - start_time
         print(f"[profileBuilder] Total request time: {total_time:.3f}s (LLM: {llm_time:.3f}s)")
 
-        return {"success": True, "message": "Profile data fetched successfully", "data": parsed_profile_builder}
+        data = _sparse_builder(parsed_profile_builder, None, selected_fields)
+        return {"success": True, "message": "Profile data fetched successfully", "data": data}
 
     except HTTPException:
         raise
@@ -363,22 +503,15 @@ async def get_personal_info(profile_url: str = Query(...)):
             raise HTTPException(400, "Profile URL cannot be empty")
 
         # Check cache first
-        cached_data = await get_cached_profile(f"analysis:{profile_url.strip()}")
+        cached_data, etag = await get_cached_entry(f"analysis:{profile_url.strip()}")
+        if not cached_data and await join_inflight(profile_url, "niche_analysis"):
+            cached_data, etag = await get_cached_entry(f"analysis:{profile_url.strip()}")
         if cached_data:
             print(f"[profileAnalysis] Cache hit - {time.time() - start_time:.2f}s")
-            return {"success": True, "message": "Data retrieved from cache", "data": cached_data}
-
-        # Run Firestore call in thread pool to avoid blocking
-        def fetch_personal_info():
-            doc_ref = (
-                db.collection("users")
-                .document(profile_url.strip())
-                .collection("personalInfo")
-                .stream()
-            )
-            return [d.to_dict() for d in doc_ref]
+            return cached_json_response({"success": True, "message": "Data retrieved from cache", "data": cached_data}, etag)
 
-        documents = await asyncio.to_thread(fetch_personal_info)
+        # Firestore read runs in a thread (or comes from the sign-in pin)
+        documents = await load_user_docs(profile_url, "personalInfo")
         print(f"[profileAnalysis] Firestore fetch took: {time.time() - start_time:.2f}s")
 
         # Check if any documents were found
@@ -409,33 +542,15 @@ async def get_personal_info(profile_url: str = Query(...)):
                     skills.append(skill)
             career = doc.get("careerVision")
 
-            ssi_files = doc.get("ssiScoreFiles")
             resume = doc.get("resumeFiles")
             processed_resume = []
             if resume:
                 for file_data in resume:
                     if isinstance(file_data, dict) and "base64" in file_data:
-                        try:
-                            pdf_bytes = base64.b64decode(file_data["base64"])
-                            pdf_file = io.BytesIO(pdf_bytes)
-
-                            pdf_reader = PdfReader(pdf_file)
-                            text_content = ""
-                            for page in pdf_reader.pages:
-                                text_content += page.extract_text() + "\n"
-
-                            processed_resume.append({
-                                "filename": file_data.get("filename", "resume.pdf"),
-                                "content": text_content.strip(),
-                                "type": "pdf_text_extracted"
-                            })
-                        except Exception as e:
-                            print(f"Error extracting PDF text: {e}")
-                            processed_resume.append({
-                                "filename": file_data.get("filename", "unknown"),
-                                "error": f"PDF extraction failed: {str(e)}",
-                                "type": "error"
-                            })
+                        if "text" not in file_data and "text_error" not in file_data:
+                            # Saved before upload-time extraction; parsed at most once per file
+                            file_data = await extract_resume(file_data)
+                        processed_resume.append(resume_attachment(file_data))
                     elif isinstance(file_data, dict) and "content" in file_data and "base64" not in file_data:
                         processed_resume.append(file_data)
                     elif isinstance(file_data, str) and not file_data.startswith("data:"):
@@ -453,27 +568,24 @@ async def get_personal_info(profile_url: str = Query(...)):
             llm_start = time.time()
             niche_analysis = await single_llm_call(
                 messages=messages_to_send,
-                model="gpt-4o-mini",
                 max_tokens=1000,  # Compact output format needs less tokens
                 temperature=0.2,  # Lower temp for faster, more consistent output
-                response_format={"type": "json_object"}
+                response_format=NicheRecommendation.RESPONSE_FORMAT,
+                endpoint="profileAnalysis"
             )
             print(f"[profileAnalysis] LLM call took: {time.time() - llm_start:.2f}s")
 
-            niche_recomendation_cleaner = Clean_JSON(niche_analysis.choices[0].message.content)
-            cleaned_niche_analysis = niche_recomendation_cleaner.clean_json_response()
-
             try:
-                parsed_nicheRecom_data = json.loads(cleaned_niche_analysis)
+                parsed_nicheRecom_data = parse_json_response(niche_analysis, "profileAnalysis")
                 combined_result = {
                     "niche_recommendations": parsed_nicheRecom_data
                 }
-            except json.JSONDecodeError as e:
+            except StructuredOutputError as e:
                 return {
                     "success": False,
                     "message": "Failed to parse niche recommendation data",
                     "error": str(e),
-                    "raw_response": cleaned_niche_analysis
+                    "raw_response": niche_analysis.choices[0].message.content
                 }
 
         # Only cache if data is valid (has niche_recommendations)
@@ -508,6 +620,8 @@ async def add_selected_niche(body: SelectedNicheRequest):
         user_doc_ref.document(doc_id).update({
             "niche": niche
         })
+        unpin_docs(profile_url)
+        await bump_cache_generation(profile_url)
 
         return {
             "success": True,
@@ -538,25 +652,28 @@ async def create_personal_info(
 ):
     try:
         file_cvt = File_to_Base64()
+        # Images are stored downscaled and recompressed, with a small copy for vision calls
         ssiScore_list = []
         if ssiScore is not None:
             for file in ssiScore:
                 if hasattr(file, 'filename') and file.filename:
                     print(f"Processing file: {file}")
-                    converted_file = await file_cvt.file_to_base64(file)
-                    ssiScore_list.append(converted_file)
+                    ssiScore_list.append(await image_upload(file))
+        ssiScore_list = dedupe_images(ssiScore_list)
 
         profileFile_list = []
         if profileFile is not None:
             for file in profileFile:
                 if hasattr(file, 'filename') and file.filename:
-                    profileFile_list.append(await file_cvt.file_to_base64(file))
+                    profileFile_list.append(await image_upload(file))
+        profileFile_list = dedupe_images(profileFile_list, perceptual=True)
 
         resume_list = []
         if resume is not None:
             for file in resume:
                 if hasattr(file, 'filename') and file.filename:
-                    resume_list.append(await file_cvt.file_to_base64(file))
+                    # Extract the text now so /profileAnalysis never parses the PDF
+                    resume_list.append(await extract_resume(await file_cvt.file_to_base64(file)))
 
         data = {
             "email": email,
@@ -575,6 +692,9 @@ async def create_personal_info(
         }
 
         _, doc_ref = db.collection("users").document(url).collection('personalInfo').add(data)
+        await bump_cache_generation(url)
+        # Warm builder/analysis (and score, if already scraped) before the dashboard loads
+        schedule_precompute(url, "personalInfo")
 
         return {
             "success": True,
@@ -599,6 +719,8 @@ async def google_sign_in(request: GoogleSignInRequest):
 
         user_exists = len(docs) > 0
         if user_exists:
+            # Opt-in: the dashboard is about to load, warm its caches now
+            warm_up(request.profileURL)
             return GoogleSignInResponse(message="existing_user")
         else:
             return GoogleSignInResponse(message="new_user")
@@ -613,85 +735,200 @@ async def google_sign_in(request: GoogleSignInRequest):
 @router.post("/AIcomments")
 async def get_ai_comments(body: CommentsBody):
     post = body.post
-    prompt = body.prompt if body.prompt else "Professional, positive, conversational comment"
-    tone = body.tone if body.tone else "Professional, positive, conversational tone"
-    persona = body.persona if body.persona else "Mid level professional with a focus on collaboration and innovation"
-    language = body.language if body.language else 'Use American English with plain, conversational language. Short sentences, common vocabulary, American spelling (color, organize), friendly and easy to understand.'
-    commnets_input = Comments(prompt, persona, tone, post, language)
+    prompt = body.prompt if body.prompt else DEFAULT_COMMENT_PROMPT
+    tone = body.tone if body.tone else DEFAULT_COMMENT_TONE
+    persona = body.persona if body.persona else DEFAULT_COMMENT_PERSONA
+    language = body.language if body.language else DEFAULT_LANGUAGE
+    _check_variants(body.variants)
     try:
-        response = await async_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an AI that writes authentic, high-quality LinkedIn comments that sound like they were written by a real professional—not generic or promotional."},
-                {
-                    "role": "user",
-                    "content": commnets_input.generate_prompt()
-                }
-            ],
-            max_tokens=80,
-            temperature=0.3,
-        )
-        comment = response.choices[0].message.content.strip()
+        if body.variants > 1 or body.regenerate:
+            params = comment_params(prompt, persona, tone, post, language)
+            key = pool_key("AIcomments", prompt, persona, tone, post, language)
+            candidates = await generate_variants(params, "AIcomments", body.variants, key, body.regenerate)
+            result = {"comment": candidates[0]}
+            if body.variants > 1:
+                result["variants"] = candidates
+            return result
+        if comment_batcher.enabled:
+            comment = await comment_batcher.submit(prompt, persona, tone, post, language)
+        else:
+            response = await single_llm_call(
+                endpoint="AIcomments",
+                **comment_params(prompt, persona, tone, post, language),
+            )
+            comment = response.choices[0].message.content.strip()
         return {"comment": comment}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/AIposts")
-def get_ai_postsContent(body: PostBody):
-    userReq = body.userReq
+def _chunk_posts(posts):
+    """Group (index, text) pairs into chunks that fit the per-call post budget."""
+    chunks, current, used = [], [], 0
+    for index, text in posts:
+        tokens = count_tokens(text)
+        if current and (len(current) >= BATCH_CHUNK_POSTS or used + tokens > BATCH_CHUNK_TOKENS):
+            chunks.append(current)
+            current, used = [], 0
+        current.append((index, text))
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _stream_comment_chunk(chunk, prompt, persona, tone, language, queue, semaphore):
+    """
+    Stream one batch call, pushing each comment line to the queue as it completes.
+    The batch call and each per-post fallback call take a slot from semaphore.
+    """
+    expected = {index for index, _ in chunk}
+    batch_prompt = BatchComments(prompt, persona, tone, chunk, language)
+    buffer = ""
+
+    def emit(line):
+        parsed = parse_comment_line(line)
+        if parsed is None:
+            return
+        index, comment = parsed
+        if index in expected:
+            expected.discard(index)
+            queue.put_nowait({"index": index, "comment": comment})
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that generates engaging LinkedIn Posts."},
-                {"role": "user", "content": f"""
-                You are a LinkedIn content-creation assistant. You specialize in crafting polished, professional LinkedIn posts that resonate with a business audience.
-                Your task is to analyze the following user's requirements and genrate high-quality Linkdin posts descriptionss based on those requirements.
+        async with semaphore:
+            stream = await single_llm_call(
+                messages=batch_prompt.generate_messages(),
+                max_tokens=BATCH_TOKENS_PER_COMMENT * len(chunk),
+                temperature=0.3,
+                endpoint="AIcommentsBatch",
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for event in stream:
+                if not event.choices:
+                    continue
+                buffer += event.choices[0].delta.content or ""
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    emit(line)
+            emit(buffer)
+    except Exception as e:
+        print(f"[AIcomments/batch] Chunk call failed, falling back per post: {e}")
 
-                Your description must be suitable for LinkedIn, adhering to professional standards and best practices for engagement.
-                It should be clear, concise, and tailored to a business audience.
-                Language should be formal yet approachable, avoiding slang or overly casual expressions.
+    # Anything the batch call dropped goes through the single-comment path
+    posts = dict(chunk)
+    async def single(index):
+        try:
+            async with semaphore:
+                response = await single_llm_call(
+                    endpoint="AIcomments",
+                    **comment_params(prompt, persona, tone, posts[index], language),
+                )
+            queue.put_nowait({"index": index, "comment": response.choices[0].message.content.strip()})
+        except Exception as e:
+            queue.put_nowait({"index": index, "error": str(e)})
+    await asyncio.gather(*[single(index) for index in sorted(expected)])
+
+
+@router.post("/AIcomments/batch")
+async def get_ai_comments_batch(body: CommentsBatchBody):
+    """
+    Comments for many feed posts sharing one persona/tone/language.
+
+    Posts are packed into a few JSON-lines LLM calls and each comment is
+    streamed back as soon as it is complete, as NDJSON lines of
+    {"index": i, "comment": "..."} (or {"index": i, "error": "..."}),
+    in completion order. A final {"done": true, "count": n} line ends the stream.
+    """
+    if not body.posts:
+        raise HTTPException(400, "posts cannot be empty")
+    if len(body.posts) > BATCH_MAX_POSTS:
+        raise HTTPException(400, f"At most {BATCH_MAX_POSTS} posts per batch")
+
+    prompt = body.prompt if body.prompt else DEFAULT_COMMENT_PROMPT
+    tone = body.tone if body.tone else DEFAULT_COMMENT_TONE
+    persona = body.persona if body.persona else DEFAULT_COMMENT_PERSONA
+    language = body.language if body.language else DEFAULT_LANGUAGE
+
+    posts = [(i, truncate_to_tokens(post, BATCH_POST_TOKENS)) for i, post in enumerate(body.posts)]
+    chunks = _chunk_posts(posts)
+    print(f"[AIcomments/batch] {len(posts)} posts in {len(chunks)} calls")
+
+    async def generate():
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)  # shared by chunk and fallback calls
+        tasks = [
+            asyncio.create_task(_stream_comment_chunk(chunk, prompt, persona, tone, language, queue, semaphore))
+            for chunk in chunks
+        ]
+        finished = asyncio.gather(*tasks)
+        sent = 0
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, finished}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break  # every chunk finished
+                yield json.dumps(getter.result()) + "\n"
+                sent += 1
+            while not queue.empty():
+                yield json.dumps(queue.get_nowait()) + "\n"
+                sent += 1
+            yield json.dumps({"done": True, "count": sent}) + "\n"
+        finally:
+            # Client gone or stream done: stop the calls and collect every outcome
+            finished.cancel()
+            for task in tasks:
+                task.cancel()
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, Exception):
+                    print(f"[AIcomments/batch] Chunk failed: {result}")
+            if finished.done() and not finished.cancelled():
+                finished.exception()  # mark retrieved; logged above
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
-                Format:
-                • The output should be structured with short paragraphs for easy readability.
-                • Use bullet points or numbered lists where appropriate to enhance clarity.
-                • Ensure the tone is professional, insightful, and value-driven.
-                • If the user requests a specific style or format, ensure that the output aligns with those specifications. Give user's instructions high priority in your response.
-                • Do NOT repeat the userReq verbatim—elevate and clarify it.
-                • No hashtags unless explicitly requested.
-                • No emojis unless explicitly requested.
-                • Only provide the post description as output; do not include any additional commentary or explanations.
-                This output will be used directly as LinkedIn post content, so it must be engaging and well-crafted. These posts are intended to foster professional connections and discussions on LinkedIn.
-                It will be viewed by a diverse audience of professionals and students so maintain a tone that is inclusive and respectful.
 
+@router.post("/AIposts")
+async def get_ai_postsContent(body: PostBody):
+    userReq = body.userReq
+    _check_variants(body.variants)
+    try:
+        params = {
+            "messages": [
+                {"role": "system", "content": AI_POSTS_SYSTEM_PROMPT},
+                {"role": "user", "content": f"""
                  Input Data (User Requirements):
                  {userReq}
-
-                Ouptut:
-                Provie the LinkedIn post descriptions based on the above user requirements.
-                Write only the final post descriptions (no explanations, no titles, no quotes).
                 """}
             ],
-            max_tokens=1000,
-            n=1,
-            stop=None,
-            temperature=0.7,
-        )
-        posts = response.choices[0].message.content.strip()
+            "max_tokens": 1000,
+            "temperature": 0.7,
+        }
+        if body.variants > 1 or body.regenerate:
+            candidates = await generate_variants(params, "AIposts", body.variants, pool_key("AIposts", userReq), body.regenerate)
+        else:
+            response = await single_llm_call(endpoint="AIposts", **params)
+            candidates = [response.choices[0].message.content.strip()]
+        posts = candidates[0]
         print(posts)
-        return {"posts": posts}
+        result = {"posts": posts}
+        if body.variants > 1:
+            result["variants"] = candidates
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/askAIChats")
-def ask_ai_chats(body: AskAIChat):
+async def ask_ai_chats(body: AskAIChat):
     userMsg = body.message
     history = body.history
     profile_url = body.profile_url
     print('user message:', userMsg)
-    print('conversation history:', history)
+    print('session_id:', body.session_id)
     print('profile_url:', profile_url)
 
     headline = ""
@@ -703,16 +940,16 @@ def ask_ai_chats(body: AskAIChat):
     career = ""
     if profile_url:
         try:
-            documents = []
-            doc_ref = (
-                db.collection("users")
-                .document(profile_url.strip())
-                .collection("personalInfo")
-                .stream()
-            )
+            def fetch_personal_info():
+                doc_ref = (
+                    db.collection("users")
+                    .document(profile_url.strip())
+                    .collection("personalInfo")
+                    .stream()
+                )
+                return [d.to_dict() for d in doc_ref]
 
-            for d in doc_ref:
-                documents.append(d.to_dict())
+            documents = await asyncio.to_thread(fetch_personal_info)
 
             for doc in documents:
                 headline = doc.get("headline", "")
@@ -731,10 +968,7 @@ def ask_ai_chats(body: AskAIChat):
         except Exception as e:
             print(f"Error fetching user data: {e}")
     try:
-        system_content = f"""
-        Role: You are a LinkedIn brand Content Creator.
-        Task: Assist users based on their request to improve their LinkedIn presence. Below is the background information of the user to help you provide better responses.
-
+        system_content = ASK_AI_SYSTEM_PROMPT + f"""
         Background Information of user:
         LinkedIn Headline: {headline}
         Current Experience: {currentExp}
@@ -743,36 +977,29 @@ def ask_ai_chats(body: AskAIChat):
         User's topics of interest: {', '.join(topics)}
         User's skills: {', '.join(skills)}
         User's career vision: {career}
-
-        Guidelines:
-        1. Use the background information to tailor your responses to the user's professional profile and aspirations.
-        2. Ensure that your responses align with LinkedIn's professional standards and best practices.
-        3. Provide actionable advice that the user can implement to enhance their LinkedIn presence.
-        4. Take the user background information into account while responding to the user's requests.
-        5. Act as if you have user's personality, preferences, and style in mind while responding.
         """
 
-        messages = [{"role": "system", "content": system_content}]
-
-        for i, msg in enumerate(history):
-            if i % 2 == 0:
-                messages.append({"role": "user", "content": msg})
-            else:
-                messages.append({"role": "assistant", "content": msg})
-
-        messages.append({"role": "user", "content": userMsg})
+        session = await _resolve_session(body.session_id, history, "askAIChats", profile_url)
+        if session is not None:
+            messages = build_messages(session, system_content, userMsg)
+        else:
+            # Legacy clients replay the full history on every turn
+            messages = _history_messages(system_content, history, userMsg)
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await single_llm_call(
             messages=messages,
             max_tokens=1000,
-            n=1,
-            stop=None,
             temperature=0.7,
+            endpoint="askAIChats",
+            cache=False,
         )
         aiResponse = response.choices[0].message.content.strip()
         print(aiResponse)
-        return {"response": aiResponse}
+        if session is not None:
+            await append_turn(session, userMsg, aiResponse)
+        return {"response": aiResponse, "session_id": session["id"] if session else None}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -785,7 +1012,7 @@ async def get_niche_recommendations(body: nicheRecommend):
         cached_data = await get_cached_profile(cache_key)
         if cached_data:
             print(f"Cache hit for niche recommendations: {body.profile_url}")
-            return {"success": True, "message": "Data retrieved from cache", "data": cached_data}
+            return cached_json_response({"success": True, "message": "Data retrieved from cache", "data": cached_data})
 
         documents = []
         doc_ref = (
@@ -798,7 +1025,9 @@ async def get_niche_recommendations(body: nicheRecommend):
         for d in doc_ref:
             documents.append(d.to_dict())
 
+        ssi_files = []
         for doc in documents:
+            ssi_files = doc.get("ssiScoreFiles") or ssi_files
             headline = doc.get("headline", "")
             currentExp = doc.get("currentExp", "")
             pastExp = doc.get("pastExperience", "")
@@ -815,27 +1044,38 @@ async def get_niche_recommendations(body: nicheRecommend):
                 for skill in skills_files:
                     skills.append(skill)
 
-        niche_analysis_prompt = NicheSpecificRecommendation(career, headline, about, currentExp, skills, topics, pastExp, body.niche)
+        # Current component scores from the uploaded SSI screenshots (OCR first, vision only if unsure)
+        ssi_scores = component_scores(await ssi_for_profile(body.profile_url, ssi_files)) if ssi_files else {}
+
+        niche_analysis_prompt = NicheSpecificRecommendation(career, headline, about, currentExp, skills, topics, pastExp, body.niche, ssi_scores=ssi_scores)
 
         # Use async LLM call
         niche_analysis = await single_llm_call(
             messages=niche_analysis_prompt.generate_ssi_recommendations(),
-            model="gpt-4o-mini",
-            max_tokens=800
+            max_tokens=800,
+            response_format=NicheSpecificRecommendation.SSI_RESPONSE_FORMAT,
+            endpoint="nicheRecommendations"
         )
-        niche_recomendation_cleaner = Clean_JSON(niche_analysis.choices[0].message.content)
-        cleaned_niche_analysis = niche_recomendation_cleaner.clean_json_response()
         try:
-            recommendations_data = json.loads(cleaned_niche_analysis)
-        except json.JSONDecodeError as e:
+            recommendations_data = parse_json_response(niche_analysis, "nicheRecommendations")
+        except StructuredOutputError as e:
+            raw = niche_analysis.choices[0].message.content
             print(f"Error parsing niche recommendations: {e}")
-            print(f"Raw niche recommendations response: {cleaned_niche_analysis}")
+            print(f"Raw niche recommendations response: {raw}")
             return {
                 "success": False,
                 "message": "Failed to parse niche recommendations",
                 "error": str(e),
-                "raw_niche_recommendations_response": cleaned_niche_analysis
+                "raw_niche_recommendations_response": raw
             }
+        # The schema wraps the component list in an object; clients get the list
+        if isinstance(recommendations_data, dict) and "components" in recommendations_data:
+            recommendations_data = recommendations_data["components"]
+        if ssi_scores and isinstance(recommendations_data, list):
+            lookup = {name.lower(): score for name, score in ssi_scores.items()}
+            for item in recommendations_data:
+                if isinstance(item, dict) and str(item.get("component", "")).strip().lower() in lookup:
+                    item["current_score"] = lookup[str(item["component"]).strip().lower()]
 
         # Cache the result
         await set_cached_profile(cache_key, recommendations_data)
@@ -0,0 +1,174 @@
+"""
+Server-held conversation sessions for /askAIChats and /postGenerator.
+
+The client sends only the new message plus a session_id. The last
+CHAT_WINDOW_MESSAGES messages are replayed verbatim; older turns are folded
+into a compact running summary in the background, so prompt size stays flat
+no matter how long the conversation runs.
+
+A session is only stored once its first exchange is appended, so requests
+that never complete (and clients that never send the id back, beyond their
+first turn) don't leave empty documents behind. Every write pushes
+expires_at SESSION_TTL_DAYS ahead. To have Firestore delete idle sessions:
+1. Go to Firestore -> Indexes -> TTL Policies
+2. Add TTL policy on 'chat_sessions' collection, field: 'expires_at'
+"""
+import asyncio
+import time
+import uuid
+import weakref
+from datetime import datetime, timedelta, timezone
+from config import db
+from llm_utils import single_llm_call
+from .prompts import ConversationSummaryPrompt
+
+SESSIONS_COLLECTION = "chat_sessions"
+CHAT_WINDOW_MESSAGES = 6  # 3 user/assistant exchanges kept verbatim
+COMPACT_AFTER_MESSAGES = 10  # compact once this many unsummarized messages pile up
+SESSION_TTL_DAYS = 30  # idle sessions expire this long after their last write
+
+# In-flight compaction jobs and per-session write locks, keyed by session id
+_compactions: dict[str, asyncio.Task] = {}
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _lock(session_id: str) -> asyncio.Lock:
+    lock = _locks.get(session_id)
+    if lock is None:
+        lock = _locks[session_id] = asyncio.Lock()
+    return lock
+
+
+def _session_ref(session_id: str):
+    return db.collection(SESSIONS_COLLECTION).document(session_id)
+
+
+def _expires_at() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=SESSION_TTL_DAYS)
+
+
+async def create_session(endpoint: str, profile_url: str | None = None) -> dict:
+    """Start a new empty session for an endpoint (stored by its first append_turn)."""
+    return {
+        "id": uuid.uuid4().hex,
+        "endpoint": endpoint,
+        "profile_url": profile_url,
+        "summary": "",
+        "turns": [],
+        "created_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc),
+        "unsaved": True,
+    }
+
+
+async def load_session(session_id: str, endpoint: str) -> dict | None:
+    """Fetch a session; returns None if missing, expired or owned by another endpoint."""
+    doc = await asyncio.to_thread(_session_ref(session_id).get)
+    if not doc.exists:
+        return None
+    session = doc.to_dict()
+    if session.get("endpoint") != endpoint:
+        return None
+    expires_at = session.get("expires_at")
+    if expires_at and expires_at <= datetime.now(timezone.utc):
+        return None  # TTL deletion can lag by up to a day
+    return session
+
+
+def build_messages(session: dict, system_content: str, new_message: str) -> list[dict]:
+    """System prompt, running memory, recent window, then the new message."""
+    messages = [{"role": "system", "content": system_content}]
+    if session.get("summary"):
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{session['summary']}"
+        })
+    for turn in session.get("turns", [])[-CHAT_WINDOW_MESSAGES:]:
+        messages.append({"role": turn["role"], "content": turn["content"]})
+    messages.append({"role": "user", "content": new_message})
+    return messages
+
+
+async def append_turn(session: dict, user_message: str, assistant_message: str) -> None:
+    """Persist one exchange and schedule compaction if the backlog is too long."""
+    ref = _session_ref(session["id"])
+    now = time.time()
+    async with _lock(session["id"]):
+        exchange = [
+            {"role": "user", "content": user_message, "ts": now},
+            {"role": "assistant", "content": assistant_message, "ts": now},
+        ]
+        if session.pop("unsaved", False):
+            # First exchange of a new session: this is where it gets stored
+            turns = session.get("turns", []) + exchange
+            await asyncio.to_thread(ref.set, {
+                **session,
+                "turns": turns,
+                "updated_at": datetime.now(timezone.utc),
+                "expires_at": _expires_at(),
+            })
+        else:
+            latest = (await asyncio.to_thread(ref.get)).to_dict() or session
+            turns = latest.get("turns", []) + exchange
+            await asyncio.to_thread(ref.update, {
+                "turns": turns,
+                "updated_at": datetime.now(timezone.utc),
+                "expires_at": _expires_at(),
+            })
+
+    if len(turns) >= COMPACT_AFTER_MESSAGES and session["id"] not in _compactions:
+        _compactions[session["id"]] = asyncio.create_task(_compact(session["id"]))
+
+
+async def replace_last_reply(session: dict, assistant_message: str) -> None:
+    """Overwrite the latest assistant turn, e.g. after the user regenerated it."""
+    ref = _session_ref(session["id"])
+    async with _lock(session["id"]):
+        latest = (await asyncio.to_thread(ref.get)).to_dict() or session
+        turns = latest.get("turns", [])
+        if not turns or turns[-1]["role"] != "assistant":
+            return
+        turns[-1] = {**turns[-1], "content": assistant_message, "ts": time.time()}
+        await asyncio.to_thread(ref.update, {
+            "turns": turns,
+            "updated_at": datetime.now(timezone.utc),
+            "expires_at": _expires_at(),
+        })
+
+
+async def _compact(session_id: str) -> None:
+    """Fold everything older than the verbatim window into the summary."""
+    try:
+        ref = _session_ref(session_id)
+        doc = await asyncio.to_thread(ref.get)
+        if not doc.exists:
+            return
+        session = doc.to_dict()
+        turns = session.get("turns", [])
+        if len(turns) <= CHAT_WINDOW_MESSAGES:
+            return
+        overflow = turns[:-CHAT_WINDOW_MESSAGES]
+
+        prompt = ConversationSummaryPrompt(session.get("summary", ""), overflow)
+        response = await single_llm_call(
+            messages=prompt.generate_prompt(),
+            max_tokens=300,
+            temperature=0.2,
+            endpoint="chat_summary",
+        )
+        summary = response.choices[0].message.content.strip()
+
+        # Re-read so turns appended while we were summarizing are kept
+        async with _lock(session_id):
+            latest = (await asyncio.to_thread(ref.get)).to_dict() or {}
+            remaining = latest.get("turns", [])[len(overflow):]
+            await asyncio.to_thread(ref.update, {
+                "summary": summary,
+                "turns": remaining,
+                "updated_at": datetime.now(timezone.utc),
+            })
+        print(f"[sessions] Compacted {len(overflow)} messages for session {session_id}")
+    except Exception as e:
+        print(f"[sessions] Compaction failed for {session_id}: {e}")
+    finally:
+        _compactions.pop(session_id, None)
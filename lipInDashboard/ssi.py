@@ -0,0 +1,203 @@
+"""
+SSI (Social Selling Index) scores read from the screenshots uploaded to
+/personalInfo, in tiers:
+
+1. local: OpenCV cleanup + tesseract through Image_Processor (in the process
+   pool), parsed by parse_ssi_text()
+2. vision: one low-detail call with SSIImageProcessing, only when the local
+   read is below SSI_MIN_CONFIDENCE (or tesseract isn't available)
+
+Confidence comes from the numbers themselves: all four components present
+and in range, and their sum matching the overall score when that was read.
+Results are cached per image SHA-256 ("ssi_image:<hash>"), so each distinct
+screenshot is read once; the precompute "ssi" stage reads a profile's
+screenshots after upload and caches the best reading as "ssi:<profile>".
+"""
+import asyncio
+import re
+
+from cache import get_cached_profile, set_cached_profile
+from llm_utils import single_llm_call
+from process_pool import CPUPoolBusy
+from structured_output import StructuredOutputError, parse_json_response
+from .helper import Image_Processor
+from .image_variants import image_sha256, vision_data_uri
+from .prompts import SSIImageProcessing
+
+# (key in the SSIImageProcessing schema, label as printed on the SSI page)
+SSI_COMPONENTS = [
+    ("Establish_your_professional_brand", "Establish your professional brand"),
+    ("Find_the_right_people", "Find the right people"),
+    ("Engage_with_insights", "Engage with insights"),
+    ("Build_strong_relationships", "Build strong relationships"),
+]
+SSI_COMPONENT_MAX = 25
+SSI_MIN_CONFIDENCE = 0.8
+SSI_CACHE_TTL_MINUTES = 30 * 24 * 60  # keyed by image content, so it never goes stale
+OCR_TIMEOUT_SECONDS = 30
+
+_NUMBER = r"(\d{1,3}(?:[.,]\d{1,2})?)"
+_TOTAL_PATTERNS = [
+    re.compile(_NUMBER + r"\s*(?:/|out\s+of)\s*100"),
+    re.compile(r"social\s+selling\s+index\D{0,30}?" + _NUMBER),
+]
+_RANK_PATTERN = r"{}\s+ssi\s+rank\W{{0,5}}((?:top\s*)?\d{{1,3}}\s*%)"
+_INDUSTRY_AVERAGE = re.compile(r"average\s+ssi\s+of\s+" + _NUMBER)
+
+# Screenshot reads in progress, by image hash (so concurrent readers share one)
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def _to_number(text: str | None) -> float | None:
+    if text is None:
+        return None
+    try:
+        return float(text.replace(",", "."))
+    except ValueError:
+        return None
+
+
+def ssi_confidence(components: dict, total) -> float:
+    """How far a reading can be trusted, from internal consistency alone."""
+    valid = [v for v in components.values() if isinstance(v, (int, float)) and 0 <= v <= SSI_COMPONENT_MAX]
+    if len(valid) < len(SSI_COMPONENTS):
+        return 0.2 * len(valid)
+    if not isinstance(total, (int, float)) or not total:
+        return 0.8
+    return 1.0 if abs(sum(valid) - total) <= 1.5 else 0.5
+
+
+def parse_ssi_text(text: str) -> tuple[dict, float]:
+    """SSI reading (in the SSIImageProcessing format) and its confidence, from OCR text."""
+    flat = " ".join((text or "").lower().split())
+    components = {}
+    for key, label in SSI_COMPONENTS:
+        words = r"\s+".join(label.lower().split())
+        match = re.search(words + r"\D{0,25}?" + _NUMBER, flat)
+        components[key] = _to_number(match.group(1)) if match else None
+
+    total = None
+    for pattern in _TOTAL_PATTERNS:
+        match = pattern.search(flat)
+        if match:
+            total = _to_number(match.group(1))
+            break
+
+    def rank(scope: str) -> str:
+        match = re.search(_RANK_PATTERN.format(scope), flat)
+        return match.group(1).replace(" ", "").replace("top", "Top ") if match else "N/A"
+
+    average = _INDUSTRY_AVERAGE.search(flat)
+    reading = {
+        "SSI_Score": total,
+        "Industry_Rank": rank("industry"),
+        "Network_Rank": rank("network"),
+        "Components": components,
+        "Comparative_Data": {
+            "Industry_Average_SSI": average.group(1) if average else "N/A",
+            "Change_Status": "N/A",
+        },
+    }
+    return reading, ssi_confidence(components, total)
+
+
+async def _read_locally(data_uri: str) -> tuple[dict | None, float]:
+    try:
+        text = await Image_Processor(data_uri).convert_img_to_str_async(timeout=OCR_TIMEOUT_SECONDS, preprocess=True)
+    except CPUPoolBusy as e:
+        print(f"[ssi] Skipping local OCR, pool busy: {e}")
+        return None, 0.0
+    except Exception as e:
+        print(f"[ssi] Local OCR failed: {e}")
+        return None, 0.0
+    return parse_ssi_text(text)
+
+
+async def _read_with_vision(data_uri: str) -> dict | None:
+    try:
+        response = await single_llm_call(
+            messages=[SSIImageProcessing(data_uri, detail="low").generate_prompt()],
+            max_tokens=300,
+            temperature=0,
+            response_format=SSIImageProcessing.RESPONSE_FORMAT,
+            endpoint="ssiExtraction",
+            cache=False,  # cached below by image hash; the request key would hash the whole image
+        )
+        return parse_json_response(response, "ssiExtraction")
+    except StructuredOutputError as e:
+        print(f"[ssi] Vision reading unusable: {e}")
+    except Exception as e:
+        print(f"[ssi] Vision call failed: {e}")
+    return None
+
+
+async def _read_uncached(sha256: str, file_data: dict) -> dict | None:
+    mime_type = file_data.get("mime_type") or file_data.get("content_type") or "image/png"
+    data_uri = f"data:{mime_type};base64,{file_data['base64']}"
+
+    reading, confidence = await _read_locally(data_uri)
+    source = "ocr"
+    if confidence < SSI_MIN_CONFIDENCE:
+        print(f"[ssi] {sha256[:12]}: local confidence {confidence:.1f}, asking the vision model")
+        vision = await _read_with_vision(vision_data_uri(file_data))
+        if vision is not None:
+            vision_confidence = ssi_confidence(vision.get("Components") or {}, vision.get("SSI_Score"))
+            if vision_confidence >= confidence:
+                reading, confidence, source = vision, vision_confidence, "vision"
+        elif reading is None:
+            return None
+        else:
+            # Neither tier is sure; don't cache, so a later read can retry the vision call
+            return {**reading, "source": source, "confidence": confidence, "image_sha256": sha256}
+
+    if reading is None:
+        return None
+    reading = {**reading, "source": source, "confidence": confidence, "image_sha256": sha256}
+    await set_cached_profile(f"ssi_image:{sha256}", reading, ttl_minutes=SSI_CACHE_TTL_MINUTES)
+    print(f"[ssi] {sha256[:12]}: read by {source} (confidence {confidence:.1f})")
+    return reading
+
+
+async def read_ssi(file_data: dict) -> dict | None:
+    """SSI reading of one uploaded screenshot (as stored by File_to_Base64), or None."""
+    if not isinstance(file_data, dict) or not file_data.get("base64"):
+        return None
+    sha256 = image_sha256(file_data)
+    cached = await get_cached_profile(f"ssi_image:{sha256}")
+    if cached:
+        return cached
+    task = _inflight.get(sha256)
+    if task is None:
+        task = _inflight[sha256] = asyncio.create_task(_read_uncached(sha256, file_data))
+        task.add_done_callback(lambda _: _inflight.pop(sha256, None))
+    return await asyncio.shield(task)
+
+
+async def profile_ssi(ssi_files: list | None) -> dict | None:
+    """Best reading across a profile's screenshots (the latest among the most confident)."""
+    readings = await asyncio.gather(*[read_ssi(f) for f in ssi_files or []])
+    readings = [(r.get("confidence", 0), index, r) for index, r in enumerate(readings) if r]
+    if not readings:
+        return None
+    return max(readings, key=lambda item: item[:2])[2]
+
+
+async def ssi_for_profile(profile_id: str, ssi_files: list | None) -> dict | None:
+    """A profile's SSI reading: precomputed entry, the running precompute stage, or read now."""
+    from precompute import STAGE_CACHE_KEYS, join_inflight
+
+    key = STAGE_CACHE_KEYS["ssi"](profile_id.strip())
+    cached = await get_cached_profile(key)
+    if not cached and await join_inflight(profile_id, "ssi"):
+        cached = await get_cached_profile(key)
+    return cached or await profile_ssi(ssi_files)
+
+
+def component_scores(reading: dict | None) -> dict:
+    """{component label: score} for the components a reading has."""
+    components = (reading or {}).get("Components") or {}
+    return {
+        label: components[key]
+        for key, label in SSI_COMPONENTS
+        if isinstance(components.get(key), (int, float))
+    }
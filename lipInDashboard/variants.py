@@ -0,0 +1,106 @@
+"""
+Multi-variant generation for /postGenerator, /AIposts and /AIcomments.
+
+variants=N asks the model for N candidates in one completion (the `n`
+parameter), so the prompt is sent and billed once instead of once per
+regeneration. Each call also generates VARIANT_SPARES extra candidates and
+keeps them in a short-lived pool in the cache collection; a later
+regenerate=true for the same request is served from that pool instantly,
+and only goes back to the model once the pool is empty. Spares are popped
+under a per-key lock, so concurrent regenerates never get the same one.
+"""
+import asyncio
+import hashlib
+import json
+import weakref
+from cache import get_cached_profile, set_cached_profile
+from llm_utils import single_llm_call
+
+MAX_VARIANTS = 5
+
+# Extra candidates generated per call and pooled for "regenerate"
+VARIANT_SPARES = {
+    "AIcomments": 2,
+    "AIposts": 1,
+    "postGenerator": 1,
+}
+POOL_TTL_MINUTES = 30
+
+# Per-pool locks around the read-pop-write in _take_pooled, keyed by pool key
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _lock(key: str) -> asyncio.Lock:
+    lock = _locks.get(key)
+    if lock is None:
+        lock = _locks[key] = asyncio.Lock()
+    return lock
+
+
+def pool_key(endpoint: str, *parts) -> str:
+    """Cache key of the spare pool for one logical request."""
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f"variants:{endpoint}:{digest}"
+
+
+async def _take_pooled(key: str, count: int) -> list[str]:
+    async with _lock(key):
+        try:
+            pool = await get_cached_profile(key)
+        except Exception as e:
+            print(f"[variants] Pool lookup failed: {e}")
+            return []
+        spares = (pool or {}).get("variants", [])
+        if not spares:
+            return []
+        taken, rest = spares[:count], spares[count:]
+        await _store_pool(key, rest)
+        return taken
+
+
+async def _store_pool(key: str, spares: list[str]) -> None:
+    try:
+        await set_cached_profile(key, {"variants": spares}, ttl_minutes=POOL_TTL_MINUTES)
+    except Exception as e:
+        print(f"[variants] Pool store failed: {e}")
+
+
+async def generate_variants(
+    params: dict,
+    endpoint: str,
+    count: int,
+    key: str,
+    regenerate: bool = False,
+    cache: bool = True,
+) -> list[str]:
+    """
+    Up to count distinct candidates for one request.
+
+    Args:
+        params: single_llm_call arguments (messages, max_tokens, temperature, ...).
+        endpoint: Route name; picks the model route and spare count.
+        count: Candidates to return (1..MAX_VARIANTS).
+        key: Spare pool key from pool_key().
+        regenerate: Serve from the spare pool first and never from the response cache.
+        cache: Allow the LLM response cache for first-time requests.
+    """
+    pooled = await _take_pooled(key, count) if regenerate else []
+    if len(pooled) >= count:
+        print(f"[variants] {endpoint}: {count} served from pool")
+        return pooled
+
+    n = count - len(pooled) + VARIANT_SPARES.get(endpoint, 0)
+    response = await single_llm_call(
+        endpoint=endpoint,
+        cache=cache and not regenerate,
+        **({**params, "n": n} if n > 1 else params),
+    )
+    candidates = []
+    for choice in response.choices:
+        text = (choice.message.content or "").strip()
+        if text and text not in candidates and text not in pooled:
+            candidates.append(text)
+
+    results = pooled + candidates[:count - len(pooled)]
+    await _store_pool(key, candidates[count - len(pooled):])
+    return results
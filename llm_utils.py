@@ -1,18 +1,183 @@
 """
 Utility functions for parallel LLM calls using AsyncOpenAI.
+
+Responses are cached by a canonical hash of the request parameters, so an
+identical prompt is served from the cache tier instead of being regenerated.
+Pass cache=False to opt a single call out.
 """
 import asyncio
+import hashlib
+import json
+import re
+import time
 from typing import Any
+from openai.types.chat import ChatCompletion
 from config import async_client
+from cache import get_cached_profile, set_cached_profile
+from telemetry import gauge_add, record_llm_call, usage_tokens
+from model_routing import primary_model, routed_create
+
+LLM_CACHE_ENABLED = True
+
+# Per-endpoint TTLs for cached LLM responses (minutes)
+LLM_CACHE_TTL_MINUTES = {
+    "AIcomments": 24 * 60,
+    "AIcommentsBatch": 24 * 60,
+    "AIposts": 6 * 60,
+    "nicheRecommendations": 7 * 24 * 60,
+    "profileAnalysis": 7 * 24 * 60,
+    "profileBuilder": 24 * 60,
+    "score_profile": 24 * 60,
+}
+DEFAULT_LLM_CACHE_TTL_MINUTES = 60
+
+# Transport-only parameters that never change the generated output
+_NON_CONTENT_PARAMS = {"timeout", "extra_headers", "extra_query", "extra_body"}
+
+
+async def _instrumented_stream(stream, endpoint: str | None, model: str, start: float):
+    """Pass stream chunks through, recording time to first token and totals."""
+    ttft = None
+    usage = None
+    outcome = "error"
+    try:
+        async for chunk in stream:
+            if ttft is None:
+                ttft = time.time() - start
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            yield chunk
+        outcome = "ok"
+    finally:
+        prompt_tokens, completion_tokens, cached_tokens = usage_tokens(usage)
+        record_llm_call(endpoint, model, time.time() - start, outcome,
+                        prompt_tokens, completion_tokens, cached_tokens, ttft=ttft)
+
+
+async def _create(params: dict, endpoint: str | None) -> Any:
+    """Call the model and record tokens, latency and outcome in telemetry."""
+    model = params.get("model", "unknown")
+    start = time.time()
+    gauge_add("lipin_llm_calls_in_flight", (("endpoint", endpoint or "default"),), 1)
+    try:
+        response = await async_client.chat.completions.create(**params)
+    except Exception as e:
+        outcome = "timeout" if "timeout" in type(e).__name__.lower() else "error"
+        record_llm_call(endpoint, model, time.time() - start, outcome)
+        raise
+    finally:
+        gauge_add("lipin_llm_calls_in_flight", (("endpoint", endpoint or "default"),), -1)
+
+    if params.get("stream"):
+        return _instrumented_stream(response, endpoint, model, start)
+    prompt_tokens, completion_tokens, cached_tokens = usage_tokens(getattr(response, "usage", None))
+    record_llm_call(endpoint, model, time.time() - start, "ok",
+                    prompt_tokens, completion_tokens, cached_tokens)
+    return response
+
+
+def llm_cache_key(params: dict) -> str:
+    """Canonical content hash of a chat completion request."""
+    content = {k: v for k, v in params.items() if k not in _NON_CONTENT_PARAMS}
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def cached_completion(params: dict, endpoint: str | None = None, cache: bool = True) -> Any:
+    """
+    Run a chat completion, serving identical requests from the cache.
+
+    Args:
+        params: OpenAI API parameters (model, messages, max_tokens, ...).
+        endpoint: Route name, used to pick the cache TTL.
+        cache: Set to False to always call the model.
+
+    Returns:
+        OpenAI ChatCompletion response.
+    """
+    if not (cache and LLM_CACHE_ENABLED) or params.get("stream"):
+        return await routed_create(_create, params, endpoint)
+
+    cached = await lookup_cached_completion(params, endpoint)
+    if cached is not None:
+        return cached
+
+    # Remember which model each response was requested from (routing may
+    # degrade, fall back or hedge), rather than parsing response.model
+    sent_model = {}
+
+    async def create(attempt: dict, endpoint: str | None):
+        response = await _create(attempt, endpoint)
+        sent_model[id(response)] = attempt.get("model")
+        return response
+
+    response = await routed_create(create, params, endpoint)
+    # Keyed on the requested model, so a degraded, fallback or hedge answer isn't stored
+    if sent_model.get(id(response)) == params.get("model"):
+        await store_cached_completion(params, response, endpoint)
+    else:
+        print(f"[llm_cache] Not storing {endpoint or 'default'}: answered by {sent_model.get(id(response))}, "
+              f"not {params.get('model')}")
+    return response
+
+
+def answered_by(response, model: str | None) -> bool:
+    """
+    True if a response or stream chunk came from model, for output that didn't
+    go through cached_completion. The API reports snapshot names: dated
+    (gpt-4o-mini-2024-07-18) or, for older aliases, numbered (gpt-3.5-turbo-0125).
+    """
+    answered = getattr(response, "model", None)
+    return bool(model and answered) and re.fullmatch(
+        re.escape(model) + r"(-\d{4}(-\d{2}-\d{2})?)?", answered) is not None
+
+
+async def lookup_cached_completion(params: dict, endpoint: str | None = None) -> ChatCompletion | None:
+    """Cached response for these exact parameters, or None."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    try:
+        cached = await get_cached_profile(f"llm:{llm_cache_key(params)}")
+        if cached:
+            print(f"[llm_cache] HIT {endpoint or 'default'}")
+            record_llm_call(endpoint, params.get("model", "unknown"), 0.0, "cache_hit")
+            return ChatCompletion.model_validate(cached)
+    except Exception as e:
+        print(f"[llm_cache] Lookup failed: {e}")
+    return None
+
+
+async def store_cached_completion(params: dict, response: ChatCompletion, endpoint: str | None = None) -> None:
+    """Cache a response under these parameters; truncated or filtered answers are skipped."""
+    if not LLM_CACHE_ENABLED or not all(choice.finish_reason == "stop" for choice in response.choices):
+        return
+    ttl = LLM_CACHE_TTL_MINUTES.get(endpoint, DEFAULT_LLM_CACHE_TTL_MINUTES)
+    try:
+        await set_cached_profile(f"llm:{llm_cache_key(params)}", response.model_dump(mode="json"), ttl_minutes=ttl)
+    except Exception as e:
+        print(f"[llm_cache] Store failed: {e}")
+
+
+def text_completion(model: str, text: str) -> ChatCompletion:
+    """A minimal ChatCompletion wrapping text produced outside a direct call (e.g. demuxed from a batch)."""
+    return ChatCompletion.model_validate({
+        "id": f"local-{hashlib.md5(text.encode()).hexdigest()[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+    })
 
 
-async def parallel_llm_calls(tasks: list[dict]) -> list:
+async def parallel_llm_calls(tasks: list[dict], endpoint: str | None = None, cache: bool = True) -> list:
     """
     Execute multiple LLM calls in parallel using asyncio.gather.
 
     Args:
         tasks: List of dicts with OpenAI API parameters.
                Each dict should contain: model, messages, max_tokens, etc.
+        endpoint: Route name, used to pick the cache TTL.
+        cache: Set to False to bypass the response cache.
 
     Returns:
         List of OpenAI ChatCompletion responses in the same order as tasks.
@@ -25,16 +190,18 @@ async def parallel_llm_calls(tasks: list[dict]) -> list:
         results = await parallel_llm_calls(tasks)
     """
     async def make_call(task: dict) -> Any:
-        return await async_client.chat.completions.create(**task)
+        return await cached_completion(task, endpoint=endpoint, cache=cache)
 
     return await asyncio.gather(*[make_call(t) for t in tasks])
 
 
 async def single_llm_call(
     messages: list[dict],
-    model: str = "gpt-4o-mini",
+    model: str | None = None,
     max_tokens: int = 800,
     temperature: float = 0.7,
+    endpoint: str | None = None,
+    cache: bool = True,
     **kwargs
 ) -> Any:
     """
@@ -42,18 +209,22 @@ async def single_llm_call(
 
     Args:
         messages: List of message dicts with role and content.
-        model: OpenAI model to use.
+        model: OpenAI model to use; defaults to the endpoint's primary model
+               from model_routing.MODEL_ROUTES.
         max_tokens: Maximum tokens in response.
         temperature: Sampling temperature.
+        endpoint: Route name, used to pick the cache TTL.
+        cache: Set to False to bypass the response cache.
         **kwargs: Additional OpenAI API parameters.
 
     Returns:
         OpenAI ChatCompletion response.
     """
-    return await async_client.chat.completions.create(
-        model=model,
-        messages=messages,
-        max_tokens=max_tokens,
-        temperature=temperature,
+    params = {
+        "model": model or primary_model(endpoint),
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
         **kwargs
-    )
+    }
+    return await cached_completion(params, endpoint=endpoint, cache=cache)
@@ -5,15 +5,19 @@ import os
 # top-level modules (config, prompts, helper, etc.)
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import config  # noqa: F401 — triggers Firebase + OpenAI init
 _ = config  # ensure import is not pruned
 
 from lipInDashboard.routes import router as dashboard_router
 from profileAnalyst.routes import router as profile_router
+from http_responses import CompressionMiddleware, FastJSONResponse
+from telemetry import gauge_add, prompt_cache_summary, record_http_request, render_prometheus
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 origins = [
     "http://localhost:3000",
@@ -37,6 +41,27 @@ app.add_middleware(
     allow_origin_regex=r"^chrome-extension://.*$",
 )
 
+# br/gzip for large buffered responses; streaming endpoints pass through
+app.add_middleware(CompressionMiddleware)
+
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record latency per route template (not raw path, to keep label cardinality low)."""
+    start = time.time()
+    gauge_add("lipin_http_requests_in_flight", (), 1)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        gauge_add("lipin_http_requests_in_flight", (), -1)
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        record_http_request(route_path, request.method, status, time.time() - start)
+
 # Mount routers
 app.include_router(dashboard_router)
 app.include_router(profile_router)
@@ -47,6 +72,17 @@ async def welcome():
     return {"message": "Welcome to the LipIn BackEnd API!"}
 
 
+@app.get("/prompt-cache-stats")
+async def prompt_cache_stats():
+    return {"success": True, "data": prompt_cache_summary()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint for LLM and HTTP telemetry."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.delete("/clear-cache")
 async def clear_cache():
     from cache import clear_all_cache
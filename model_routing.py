@@ -0,0 +1,189 @@
+"""
+Per-endpoint model routing with latency-SLO fallback and hedging.
+
+MODEL_ROUTES maps each endpoint to a primary model, fallback models, a
+latency SLO and a request timeout. routed_create() wraps a single model
+call with these steps:
+
+1. Degrade: while the endpoint has degrade_in_flight or more LLM calls in
+   flight, or its primary p95 over the last few minutes is well past the
+   SLO, start on the cheaper/faster degraded model instead of the primary.
+   The p95 window is what lets an endpoint recover: with no new primary
+   samples, the slow ones age out and traffic returns to the primary.
+2. Hedge: if the first attempt hasn't answered within slo_p95_seconds, send
+   the same request to the first fallback and take whichever answers first.
+   The loser is cancelled.
+3. Fall back: on a connection error, timeout, rate limit or 5xx, retry on the
+   next model in the chain.
+
+Latency numbers come from the telemetry histograms, so decisions follow
+what the endpoint is actually seeing in production.
+"""
+import asyncio
+import openai
+from telemetry import gauge_value, llm_latency_quantile, record_routing_event
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+MODEL_ROUTES = {
+    "AIcomments": {
+        "primary": "gpt-3.5-turbo", "fallbacks": ["gpt-4o-mini"], "degraded": "gpt-4o-mini",
+        "slo_p95_seconds": 3, "timeout": 15, "degrade_in_flight": 30,
+    },
+    "AIcommentsBatch": {
+        "primary": "gpt-4o-mini", "fallbacks": ["gpt-3.5-turbo"], "degraded": "gpt-3.5-turbo",
+        "slo_p95_seconds": 8, "timeout": 45, "degrade_in_flight": 10,
+    },
+    "AIposts": {
+        "primary": "gpt-3.5-turbo", "fallbacks": ["gpt-4o-mini"], "degraded": "gpt-4o-mini",
+        "slo_p95_seconds": 8, "timeout": 30, "degrade_in_flight": 20,
+    },
+    "askAIChats": {
+        "primary": "gpt-3.5-turbo", "fallbacks": ["gpt-4o-mini"], "degraded": "gpt-4o-mini",
+        "slo_p95_seconds": 8, "timeout": 30, "degrade_in_flight": 20,
+    },
+    "postGenerator": {
+        "primary": "gpt-4o-mini", "fallbacks": ["gpt-4.1-nano"], "degraded": "gpt-4.1-nano",
+        "slo_p95_seconds": 10, "timeout": 45, "degrade_in_flight": 20,
+    },
+    "score_profile": {
+        "primary": "gpt-4o-mini", "fallbacks": ["gpt-4.1-nano"], "degraded": "gpt-4.1-nano",
+        "slo_p95_seconds": 8, "timeout": 60, "degrade_in_flight": 20,
+    },
+    "profileBuilder": {
+        "primary": "gpt-4o-mini", "fallbacks": ["gpt-4.1-nano"], "degraded": "gpt-4.1-nano",
+        "slo_p95_seconds": 30, "timeout": 120, "degrade_in_flight": 10,
+    },
+    "profileAnalysis": {
+        "primary": "gpt-4o-mini", "fallbacks": ["gpt-4.1-nano"], "degraded": "gpt-4.1-nano",
+        "slo_p95_seconds": 15, "timeout": 60, "degrade_in_flight": 10,
+    },
+    "nicheRecommendations": {
+        "primary": "gpt-4o-mini", "fallbacks": ["gpt-4.1-nano"], "degraded": "gpt-4.1-nano",
+        "slo_p95_seconds": 12, "timeout": 60, "degrade_in_flight": 10,
+    },
+    "ssiExtraction": {
+        # Vision fallback for SSI screenshots tesseract couldn't read; rare and not latency-critical
+        "primary": "gpt-4o-mini", "fallbacks": [], "degraded": None,
+        "slo_p95_seconds": 10, "timeout": 30, "degrade_in_flight": 5,
+    },
+    "chat_summary": {
+        "primary": "gpt-4o-mini", "fallbacks": [], "degraded": "gpt-4.1-nano",
+        "slo_p95_seconds": 10, "timeout": 30, "degrade_in_flight": 5,
+    },
+}
+
+HEDGING_ENABLED = True
+SLO_BREACH_FACTOR = 2.0  # start on the degraded model once primary p95 exceeds 2x the SLO
+SLO_MIN_SAMPLES = 20  # calls in the telemetry latency window needed before p95 is trusted
+
+# Errors worth retrying on another model; 4xx request errors are not
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+def get_route(endpoint: str | None) -> dict | None:
+    return MODEL_ROUTES.get(endpoint) if endpoint else None
+
+
+def primary_model(endpoint: str | None) -> str:
+    route = get_route(endpoint)
+    return route["primary"] if route else DEFAULT_MODEL
+
+
+def choose_model(endpoint: str, route: dict, requested: str) -> str:
+    """Requested model, or the degraded one under queue pressure or an SLO breach."""
+    degraded = route.get("degraded")
+    if not degraded or degraded == requested:
+        return requested
+    in_flight = gauge_value("lipin_llm_calls_in_flight", (("endpoint", endpoint),))
+    if in_flight >= route["degrade_in_flight"]:
+        record_routing_event(endpoint, "degraded_pressure")
+        return degraded
+    p95 = llm_latency_quantile(endpoint, requested, 0.95, min_count=SLO_MIN_SAMPLES)
+    if p95 is not None and p95 > route["slo_p95_seconds"] * SLO_BREACH_FACTOR:
+        record_routing_event(endpoint, "degraded_slo")
+        return degraded
+    return requested
+
+
+async def _hedged(create, params: dict, endpoint: str, hedge_model: str, hedge_after: float, state: dict):
+    """
+    Run params; if slower than hedge_after, race a copy on hedge_model.
+    Sets state["hedged"] once the copy is started.
+    """
+    primary = asyncio.create_task(create(params, endpoint))
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        record_routing_event(endpoint, "hedge")
+        state["hedged"] = True
+        hedge = asyncio.create_task(create({**params, "model": hedge_model}, endpoint))
+        tasks.add(hedge)
+        pending = set(tasks)
+        first_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        record_routing_event(endpoint, "hedge_won")
+                    return task.result()
+                first_error = first_error or task.exception()
+        raise first_error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def routed_create(create, params: dict, endpoint: str | None):
+    """
+    Run one chat completion through the endpoint's routing policy.
+
+    Args:
+        create: Coroutine function (params, endpoint) that calls the model.
+        params: OpenAI parameters; params["model"] is the requested model.
+        endpoint: Route name used to look up MODEL_ROUTES.
+    """
+    route = get_route(endpoint)
+    if route is None:
+        return await create(params, endpoint)
+
+    params = {**params}
+    params.setdefault("timeout", route["timeout"])
+    model = choose_model(endpoint, route, params["model"])
+    chain = [model] + [m for m in route["fallbacks"] if m != model]
+
+    # Streams can't be raced or retried once bytes have been sent
+    if params.get("stream"):
+        return await create({**params, "model": model}, endpoint)
+
+    last_error = None
+    hedge = {"hedged": False}
+    i = 0
+    while i < len(chain):
+        candidate = chain[i]
+        attempt = {**params, "model": candidate}
+        try:
+            if i == 0 and HEDGING_ENABLED and len(chain) > 1:
+                return await _hedged(create, attempt, endpoint, chain[1], route["slo_p95_seconds"], hedge)
+            return await create(attempt, endpoint)
+        except RETRYABLE_ERRORS as e:
+            last_error = e
+            if i == 0 and hedge["hedged"]:
+                # chain[1] already ran (and failed) as the hedge
+                candidate = f"{candidate} and hedge {chain[1]}"
+                i += 1
+            i += 1
+            if i < len(chain):
+                record_routing_event(endpoint, "fallback")
+                print(f"[model_routing] {endpoint}: {candidate} failed ({type(e).__name__}), trying {chain[i]}")
+    raise last_error
@@ -0,0 +1,183 @@
+"""
+Synthetic profiles, onboarding data and canned LLM outputs for perf runs.
+
+Everything is generated deterministically from an index so runs are
+comparable; profile_url(i) is the key the routes look documents up by.
+"""
+import json
+import re
+import time
+from fake_backends import json_responder
+
+ROLES = [
+    ("Senior Data Engineer", "Northwind Analytics", ["Python", "Spark", "Airflow", "dbt", "Snowflake", "Kafka"]),
+    ("Product Manager", "Contoso Health", ["Roadmapping", "SQL", "Amplitude", "Jira", "A/B Testing"]),
+    ("Frontend Engineer", "Fabrikam", ["React", "TypeScript", "Next.js", "GraphQL", "Jest", "Figma"]),
+    ("Marketing Lead", "Tailspin Toys", ["HubSpot", "SEO", "Google Analytics", "Copywriting", "Salesforce"]),
+]
+
+LOREM = (
+    "Led a cross-functional team to ship a platform used by thousands of customers, "
+    "cutting latency by 40% and saving $1.2M a year in infrastructure costs. "
+)
+
+
+def profile_url(i: int) -> str:
+    return f"https://www.linkedin.com/in/perf-user-{i}"
+
+
+def scraped_profile(i: int) -> dict:
+    """A profileInfo document shaped like scraper.scrape_profile output."""
+    role, company, skills = ROLES[i % len(ROLES)]
+    return {
+        "profile_url": profile_url(i),
+        "basic_info": {
+            "name": f"Perf User {i}",
+            "headline": f"{role} at {company} | Building reliable products",
+            "location": "Austin, Texas, United States",
+            "connections": str(150 + 37 * i % 600),
+            "profile_picture_url": "https://media.licdn.com/dms/image/perf.jpg" if i % 3 else "",
+            "banner_url": "https://media.licdn.com/dms/image/banner.jpg" if i % 2 else "",
+        },
+        "about": LOREM * (2 + i % 5),
+        "experience": [
+            {
+                "title": role if j == 0 else f"{role.split()[-1]} {j}",
+                "company": company if j == 0 else f"Company {j}",
+                "duration": f"{2024 - 2 * j} - Present" if j == 0 else f"{2022 - 2 * j} - {2024 - 2 * j}",
+                "description": LOREM * 2,
+            }
+            for j in range(1 + i % 4)
+        ],
+        "education": [{"school": "State University", "degree": "B.S. Computer Science"}],
+        "skills": skills,
+        "certifications": [],
+        "recent_posts": [
+            {"text": f"Post {k} about lessons learned shipping data products.", "reactions": str(10 * k), "comments": str(k)}
+            for k in range(i % 6)
+        ],
+    }
+
+
+def personal_info(i: int) -> dict:
+    """A personalInfo document shaped like the /personalInfo form."""
+    role, company, skills = ROLES[i % len(ROLES)]
+    return {
+        "email": f"perf{i}@example.com",
+        "name": f"Perf User {i}",
+        "userDescription": LOREM * 2,
+        "purpose": ["Grow my network", "Find a new role"],
+        "careerVision": f"Principal {role}",
+        "headline": f"{role} at {company}",
+        "ssiScoreFiles": [],
+        "profileFileAnalytics": [],
+        "resumeFiles": [{"filename": "resume.pdf", "content": LOREM * 10, "type": "pdf_text_extracted"}],
+        "currentExp": f"{role} at {company}",
+        "topicsFiles": ["Data", "Leadership"],
+        "skillsFiles": skills,
+        "myValue": ["Reliability"],
+    }
+
+
+def seed(db, count: int) -> list[str]:
+    """Write count profiles (profileInfo + personalInfo) and return their URLs."""
+    urls = []
+    for i in range(count):
+        user = db.collection("users").document(profile_url(i))
+        user.collection("profileInfo").add(scraped_profile(i))
+        user.collection("personalInfo").add(personal_info(i))
+        urls.append(profile_url(i))
+    return urls
+
+
+# ──────────────────────────────────────────────
+# Canned LLM outputs, matched by a marker in the prompt
+# ──────────────────────────────────────────────
+
+_OBSERVATIONS = {
+    "analysis": ["Clear and specific.", "Mentions measurable impact."],
+    "improvements": ["Add one more quantified result."],
+}
+
+SECTION_SCORE = {"score": 12, "observations": _OBSERVATIONS}
+
+COMBINED_SCORES = {
+    "section_scores": [
+        {"section_name": name, "score": round(max_score * 0.7), "max_score": max_score, "observations": _OBSERVATIONS}
+        for name, max_score in (("Headline", 15), ("About", 20), ("Experience", 25), ("Recommendations", 5))
+    ],
+    "quick_wins": ["Add a call to action to your About section.", "Quantify your latest role."],
+}
+
+_SUGGESTION = {"id": 1, "recommendation": "Senior Data Engineer | Scalable pipelines | Python, Spark", "confidenceScore": 85, "bestFor": "Recruiters"}
+
+PROFILE_BUILDER = {
+    "data": {
+        "headline": {"current": "", "suggestions": [_SUGGESTION, {**_SUGGESTION, "id": 2}, {**_SUGGESTION, "id": 3}]},
+        "about": {"current": "", "suggestions": [{**_SUGGESTION, "recommendation": LOREM * 4}]},
+        "experience": {"current": [], "positions": [{
+            "role": "Senior Data Engineer", "company": "Northwind Analytics", "current": "",
+            "keywords": ["ETL", "Spark", "Airflow"],
+            "suggestions": [{"id": 1, "companyOverview": "Analytics company.", "profileHeadline": "Data platform lead",
+                             "bulletPoints": [LOREM] * 4, "confidenceScore": 80, "bestFor": "Hiring managers"}],
+        }]},
+        "skills": {"current": [], "skillsToPrioritize": ["Python", "Spark", "Airflow", "dbt", "Snowflake"]},
+        "education": {"current": [], "suggestions": []},
+        "recommendation_request_template": {"current": "", "suggestions": [{"id": 1, "name": "Standard", "template": LOREM}]},
+    }
+}
+
+NICHES = {
+    "niches": [
+        {"nicheTitle": f"Niche {k}", "confidenceScore": 90 - 5 * k, "oneLinePitch": "Data platforms that scale",
+         "targetAudience": "Engineering leaders", "timelineMonths": 6, "evolutionPath": "Head of Data",
+         "justification": "Five years building pipelines."}
+        for k in range(5)
+    ]
+}
+
+RECOMMENDED_NICHES = {
+    "recommendedNiches": [
+        {"rank": k + 1, "niche": f"Niche {k}", "confidenceScore": 85 - 5 * k, "oneLinePitch": "Data platforms that scale",
+         "targetAudience": "Engineering leaders", "keyStrengths": ["Python", "Spark", "Mentoring"],
+         "priorityGap": "Public speaking", "timelineMonths": 6 + 2 * k}
+        for k in range(5)
+    ]
+}
+
+SSI_RECOMMENDATIONS = {"components": [
+    {"component": component, "niche_focus": "Data Engineering",
+     "recommendations": ["Share one pipeline lesson a week.", "Comment on three niche posts a day."]}
+    for component in ("Establish your professional brand", "Find the right people",
+                      "Engage with insights", "Build strong relationships")
+]}
+
+COMMENT = "Great point on shipping incrementally. We saw the same thing when we split our pipeline into smaller releases."
+
+
+
+def batch_comments(params: dict) -> str:
+    """One JSON line per post/request line in a batched comments prompt."""
+    indices = re.findall(r'^\s*\{"index": (\d+),', params["messages"][-1]["content"], re.MULTILINE)
+    return "\n".join(json.dumps({"index": int(i), "comment": COMMENT}) for i in indices)
+
+
+responder = json_responder([
+    ("## The Posts I'm Commenting On", batch_comments),
+    ("## Requests (one JSON object per line)", batch_comments),
+    ('Score ONLY the "', SECTION_SCORE),
+    ("section_scores", COMBINED_SCORES),
+    ("recommendation_request_template", PROFILE_BUILDER),
+    ('{"niches"', NICHES),
+    ('"recommendedNiches"', RECOMMENDED_NICHES),
+    ('"component"', SSI_RECOMMENDATIONS),
+], fallback=lambda params: COMMENT)
+
+
+def fake_scrape_profile(delay: float):
+    """Stand-in for scraper.scrape_profile that sleeps instead of driving a browser."""
+    def scrape_profile(profile_url: str, headless: bool = True) -> dict:
+        time.sleep(delay)
+        i = abs(hash(profile_url)) % 1000
+        return {**scraped_profile(i), "profile_url": profile_url}
+    return scrape_profile
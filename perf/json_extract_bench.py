@@ -0,0 +1,222 @@
+"""
+Benchmark of the tolerant JSON extractor against the old Clean_JSON.
+
+The corpus is the canned LLM outputs from perf/fixtures.py, each rendered
+with the defects seen in real responses (markdown fences, surrounding
+prose, trailing commas, raw newlines inside strings, truncation at
+max_tokens, and combinations). Pass --cassette to add the message
+contents of a recorded cassette as-is.
+
+For each implementation it reports time per call and the recovery rate:
+"exact" means the original object came back, "partial" means a truncated
+response still yielded a non-empty prefix of it.
+
+Usage (from the repo root):
+    python -m perf.json_extract_bench
+    python -m perf.json_extract_bench --cassette perf/cassettes/run.jsonl.gz --repeat 200
+"""
+import argparse
+import json
+import re
+import sys
+import time
+
+from lipInDashboard.helper import extract_json
+from perf import fixtures
+
+
+def legacy_clean_json(raw_response):
+    """Clean_JSON.clean_json_response as it was before the single-pass extractor."""
+    if not raw_response:
+        return '{}'
+    response = raw_response.strip()
+    response = re.sub(r'```json\s*\n?', '', response)
+    response = re.sub(r'```\s*$', '', response)
+    response = re.sub(r'^```\s*', '', response, flags=re.MULTILINE)
+    response = re.sub(r'\s*```$', '', response, flags=re.MULTILINE)
+    response = response.strip()
+    start = response.find('{')
+    end = response.rfind('}')
+    if start != -1 and end != -1 and end > start:
+        response = response[start:end+1]
+    elif response.startswith('['):
+        end = response.rfind(']')
+        if end != -1:
+            response = response[:end+1]
+    else:
+        return '{}'
+    try:
+        return json.dumps(json.loads(response))
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.dumps(json.loads(response.replace('\r\n', '\\n').replace('\r', '\\n')))
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.dumps(json.loads(response.replace('\n', ' ').replace('\r', ' ')))
+    except json.JSONDecodeError:
+        pass
+    return '{}'
+
+
+def legacy_parse(text):
+    # The routes always followed Clean_JSON with another json.loads
+    parsed = json.loads(legacy_clean_json(text))
+    if parsed == {}:
+        raise ValueError("empty")
+    return parsed
+
+
+def new_parse(text):
+    return extract_json(text.strip())
+
+
+CANNED = {
+    "section_score": fixtures.SECTION_SCORE,
+    "combined_scores": fixtures.COMBINED_SCORES,
+    "profile_builder": fixtures.PROFILE_BUILDER,
+    "niches": fixtures.NICHES,
+    "recommended_niches": fixtures.RECOMMENDED_NICHES,
+    "ssi_components": fixtures.SSI_RECOMMENDATIONS["components"],
+}
+
+
+def _trailing_commas(text: str) -> str:
+    return re.sub(r'(["\d\]}el])(\s*\n\s*[\]}])', r'\1,\2', text)
+
+
+def _raw_newlines(text: str) -> str:
+    # Escaped newlines inside string values become literal ones
+    return text.replace("\\n", "\n")
+
+
+def _multiline(value):
+    """value with sentences inside strings split onto separate lines."""
+    if isinstance(value, dict):
+        return {k: _multiline(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_multiline(v) for v in value]
+    if isinstance(value, str):
+        return re.sub(r"(?<=\w)\. (?=[A-Z])", ".\n", value)
+    return value
+
+
+DEFECTS = {
+    "clean": lambda t: t,
+    "fenced": lambda t: f"```json\n{t}\n```",
+    "prose": lambda t: f"Here is the JSON you asked for:\n\n{t}\n\nLet me know if you need any changes!",
+    "trailing_commas": _trailing_commas,
+    "raw_newlines": _raw_newlines,
+    "truncated_60": lambda t: t[:int(len(t) * 0.6)],
+    "truncated_90": lambda t: t[:int(len(t) * 0.9)],
+    "fenced_commas_newlines": lambda t: f"```json\n{_raw_newlines(_trailing_commas(t))}\n```",
+    "fenced_truncated": lambda t: f"```json\n{t}"[:int(len(t) * 0.8)],
+}
+
+
+def build_corpus(cassette: str | None) -> list[dict]:
+    corpus = []
+    for name, value in CANNED.items():
+        # Multi-line strings, as real answers have; escaped unless a defect says otherwise
+        value = _multiline(value)
+        pretty = json.dumps(value, indent=2)
+        for defect, render in DEFECTS.items():
+            corpus.append({"name": f"{name}/{defect}", "defect": defect, "text": render(pretty), "expected": value})
+    if cassette:
+        from cassettes import Cassette
+        for entry in Cassette(cassette).load().entries():
+            for choice in (entry.get("response") or {}).get("choices", []):
+                content = (choice.get("message") or {}).get("content") or ""
+                if "{" in content or "[" in content:
+                    corpus.append({"name": "cassette", "defect": "recorded", "text": content, "expected": None})
+    return corpus
+
+
+def _is_prefix(parsed, expected) -> bool:
+    """parsed is a non-empty truncation of expected."""
+    if isinstance(expected, dict):
+        return isinstance(parsed, dict) and all(
+            k in expected and (parsed[k] == expected[k] or _is_prefix(parsed[k], expected[k]))
+            for k in parsed
+        )
+    if isinstance(expected, list):
+        return isinstance(parsed, list) and len(parsed) <= len(expected) and all(
+            p == e or _is_prefix(p, e) for p, e in zip(parsed, expected)
+        )
+    if isinstance(expected, str):
+        return isinstance(parsed, str) and expected.startswith(parsed)
+    return parsed == expected
+
+
+def classify(parse, item) -> str:
+    try:
+        parsed = parse(item["text"])
+    except ValueError:
+        return "failed"
+    expected = item["expected"]
+    if expected is None or parsed == expected or parsed == json.loads(json.dumps(expected)):
+        return "exact"
+    if parsed and _is_prefix(parsed, expected):
+        return "partial"
+    return "wrong"
+
+
+def time_per_call(parse, corpus: list[dict], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in corpus:
+            try:
+                parse(item["text"])
+            except ValueError:
+                pass
+    return (time.perf_counter() - start) / (repeat * len(corpus))
+
+
+def main(args) -> int:
+    corpus = build_corpus(args.cassette)
+    implementations = {"legacy Clean_JSON": legacy_parse, "extract_json": new_parse}
+
+    print(f"corpus: {len(corpus)} responses\n")
+    defects = list(dict.fromkeys(item["defect"] for item in corpus))
+    print(f"{'defect':<26}" + "".join(f"{name:>24}" for name in implementations))
+    totals = {name: {"exact": 0, "partial": 0, "failed": 0, "wrong": 0} for name in implementations}
+    for defect in defects:
+        items = [item for item in corpus if item["defect"] == defect]
+        row = f"{defect:<26}"
+        for name, parse in implementations.items():
+            outcomes = [classify(parse, item) for item in items]
+            for outcome in outcomes:
+                totals[name][outcome] += 1
+            recovered = sum(o in ("exact", "partial") for o in outcomes)
+            row += f"{recovered:>18}/{len(items):<5}"
+        print(row)
+
+    print()
+    timings = {name: time_per_call(parse, corpus, args.repeat) for name, parse in implementations.items()}
+    for name, counts in totals.items():
+        recovered = counts["exact"] + counts["partial"]
+        print(f"{name:<20} {timings[name] * 1e6:8.1f} us/call   recovered {recovered}/{len(corpus)} "
+              f"({recovered / len(corpus):.0%}; exact {counts['exact']}, partial {counts['partial']}, "
+              f"wrong {counts['wrong']}, failed {counts['failed']})")
+    legacy, new = timings.values()
+    print(f"\nspeedup, whole corpus: {legacy / new:.2f}x")
+
+    # Like for like: only responses the old implementation also recovered
+    both = [item for item in corpus if classify(legacy_parse, item) in ("exact", "partial")]
+    if both:
+        legacy, new = (time_per_call(parse, both, args.repeat) for parse in implementations.values())
+        print(f"speedup on the {len(both)} responses both recover: {legacy / new:.2f}x "
+              f"({legacy * 1e6:.1f} -> {new * 1e6:.1f} us/call)")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JSON extraction from malformed LLM output")
+    parser.add_argument("--cassette", help="Also include message contents from this recorded cassette")
+    parser.add_argument("--repeat", type=int, default=100, help="Passes over the corpus for timing")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
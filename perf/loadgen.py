@@ -0,0 +1,198 @@
+"""
+Async load generator for the API, run fully in-process against the fake backends.
+
+Drives /profile_analyst/score_profile, /profileBuilder, /profileAnalysis,
+/AIcomments and /profile_analyst/scrape (with a stubbed scraper) through
+httpx's ASGI transport, then reports throughput and p50/p95/p99 per
+scenario against the budgets in perf/budgets.json. Exits non-zero when a
+budget is exceeded.
+
+Usage (from the repo root):
+    python -m perf.loadgen
+    python -m perf.loadgen --requests 400 --concurrency 40 --scenario score_profile
+    python -m perf.loadgen --cache warm --llm-error-rate 0.05
+
+--cache cold (default) disables the Firestore and LLM response caches so
+every request reaches the model; --cache warm leaves them on.
+
+Record a cassette once, then replay it so LLM output (and therefore parsing
+and post-processing cost) is identical across runs:
+    python -m perf.loadgen --cassette perf/cassettes/base.jsonl.gz --cassette-mode record
+    python -m perf.loadgen --cassette perf/cassettes/base.jsonl.gz --replay-speed 0
+"""
+import os
+
+# Must be set before config is imported (it wires clients at import time)
+os.environ["LIPIN_BACKEND"] = "fake"
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from perf.stats import percentile
+
+BUDGETS_PATH = Path(__file__).with_name("budgets.json")
+SCENARIOS = ["score_profile", "profileBuilder", "profileAnalysis", "AIcomments", "scrape"]
+
+
+def build_request(scenario: str, i: int, urls: list[str]) -> tuple[str, str, dict]:
+    """(method, path, httpx kwargs) for request number i of a scenario."""
+    url = urls[i % len(urls)]
+    if scenario == "score_profile":
+        return "GET", "/profile_analyst/score_profile", {"params": {"profile_url": url}}
+    if scenario == "profileBuilder":
+        return "GET", "/profileBuilder", {"params": {"profile_url": url}}
+    if scenario == "profileAnalysis":
+        return "GET", "/profileAnalysis", {"params": {"profile_url": url}}
+    if scenario == "AIcomments":
+        return "POST", "/AIcomments", {"json": {
+            "post": f"Post #{i}: we cut our deploy time in half by shipping smaller changes more often.",
+            "tone": "Professional",
+        }}
+    if scenario == "scrape":
+        return "POST", "/profile_analyst/scrape", {"json": {"profile_url": f"{url}-scrape-{i}"}}
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, total: int, concurrency: int, urls: list[str]) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            method, path, kwargs = build_request(scenario, i, urls)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except Exception as e:
+                print(f"[loadgen] {scenario} request failed: {e}")
+                status = 0
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "statuses": statuses,
+    }
+
+
+def check_budget(result: dict, budget: dict | None) -> list[str]:
+    """Return the list of budget violations for one scenario."""
+    if not budget:
+        return []
+    violations = []
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        if key in budget and result[key] > budget[key]:
+            violations.append(f"{key} {result[key]} > {budget[key]}")
+    if "max_error_rate" in budget and result["error_rate"] > budget["max_error_rate"]:
+        violations.append(f"error_rate {result['error_rate']} > {budget['max_error_rate']}")
+    if "min_throughput_rps" in budget and result["throughput_rps"] < budget["min_throughput_rps"]:
+        violations.append(f"throughput {result['throughput_rps']} < {budget['min_throughput_rps']}")
+    return violations
+
+
+async def main(args) -> int:
+    if args.cassette:
+        os.environ["LIPIN_LLM_CASSETTE"] = args.cassette
+        os.environ["LIPIN_LLM_CASSETTE_MODE"] = args.cassette_mode
+        os.environ["LIPIN_LLM_REPLAY_SPEED"] = str(args.replay_speed)
+
+    import config
+    import cache
+    import llm_utils
+    import precompute
+    import profileAnalyst.routes as profile_routes
+    from main import app
+    from lipInDashboard.comment_batcher import comment_batcher
+    from perf import fixtures
+
+    config.fake_llm.responder = fixtures.responder
+    config.fake_llm._random.seed(args.seed)
+    if args.llm_base_latency_ms is not None:
+        config.fake_llm.base_latency_ms = args.llm_base_latency_ms
+    if args.llm_decode_tps is not None:
+        config.fake_llm.decode_tps = args.llm_decode_tps
+    config.fake_llm.error_rate = args.llm_error_rate
+    config.fake_llm.timeout_rate = args.llm_timeout_rate
+
+    if args.cache == "cold":
+        cache.CACHE_ENABLED = False
+        llm_utils.LLM_CACHE_ENABLED = False
+
+    # Background precompute after /scrape would bleed load into later scenarios
+    precompute.PRECOMPUTE_ENABLED = args.precompute
+    comment_batcher.enabled = args.comment_batching
+    profile_routes.scrape_profile = fixtures.fake_scrape_profile(args.scrape_delay)
+    urls = fixtures.seed(config.db, args.profiles)
+
+    budgets = json.loads(Path(args.budgets).read_text()).get("scenarios", {}) if args.budgets else {}
+    scenarios = args.scenario or SCENARIOS
+
+    results = {}
+    failed = False
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://lipin.local", timeout=300) as client:
+        for scenario in scenarios:
+            calls_before = config.fake_llm.calls
+            result = await run_scenario(client, scenario, args.requests, args.concurrency, urls)
+            result["llm_calls"] = config.fake_llm.calls - calls_before
+            violations = check_budget(result, budgets.get(scenario))
+            result["budget_ok"] = not violations
+            result["violations"] = violations
+            results[scenario] = result
+            failed = failed or bool(violations)
+
+    print(f"\n{'scenario':<16}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'llm calls':>11}  budget")
+    for scenario, r in results.items():
+        status = "ok" if r["budget_ok"] else "FAIL: " + "; ".join(r["violations"])
+        print(f"{scenario:<16}{r['throughput_rps']:>8}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['error_rate']:>8.1%}{r['llm_calls']:>11}  {status}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 1 if failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="In-process load test against fake backends")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Repeat to run several; default all")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--profiles", type=int, default=50, help="Distinct seeded profiles")
+    parser.add_argument("--cache", choices=["cold", "warm"], default="cold")
+    parser.add_argument("--precompute", action="store_true", help="Run the post-scrape precompute pipeline")
+    parser.add_argument("--comment-batching", action="store_true", help="Micro-batch concurrent /AIcomments calls")
+    parser.add_argument("--scrape-delay", type=float, default=2.0, help="Seconds the stubbed scraper sleeps")
+    parser.add_argument("--llm-base-latency-ms", type=float, default=None)
+    parser.add_argument("--llm-decode-tps", type=float, default=None)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-timeout-rate", type=float, default=0.0)
+    parser.add_argument("--cassette", help="LLM cassette file (gzip JSONL)")
+    parser.add_argument("--cassette-mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Replay speed multiplier; 0 = no LLM delay")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for fake LLM jitter and error injection")
+    parser.add_argument("--budgets", default=str(BUDGETS_PATH), help="Budgets JSON; pass '' to skip checks")
+    parser.add_argument("--output", help="Write full results as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
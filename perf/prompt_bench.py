@@ -0,0 +1,198 @@
+"""
+Offline prompt-variant benchmark.
+
+Runs every variant in perf/prompt_variants.py (or --variants module) over a
+fixture set of profiles and reports, per variant: input/output tokens,
+latency p50/p95, JSON validity rate and schema completeness.
+
+By default it runs against the fake backends, so it's fully offline and
+measures prompt size only. Use --cassette to replay recorded real outputs,
+or --live to hit OpenAI (needs OPENAI_API_KEY) when output quality matters.
+
+Usage (from the repo root):
+    python -m perf.prompt_bench
+    python -m perf.prompt_bench --target Comments --runs 3 --profiles 10
+    python -m perf.prompt_bench --live --fixtures my_profiles.json --output bench.json
+"""
+import os
+import sys
+
+# Firestore is never needed here; the LLM side is fake unless --live
+os.environ["LIPIN_BACKEND"] = "fake"
+os.environ["LIPIN_LLM_BACKEND"] = "live" if "--live" in sys.argv else "fake"
+
+import argparse
+import asyncio
+import importlib
+import json
+import time
+from pathlib import Path
+
+from perf.stats import percentile
+
+
+def load_fixtures(path: str | None, count: int) -> list[tuple[dict, dict]]:
+    """(profile, personal_info) pairs from a JSON file or the synthetic set."""
+    if path:
+        items = json.loads(Path(path).read_text())
+        return [(item["profile"], item.get("personal_info", {})) for item in items]
+    from perf import fixtures
+    return [(fixtures.scraped_profile(i), fixtures.personal_info(i)) for i in range(count)]
+
+
+def schema_completeness(value, schema) -> tuple[int, int]:
+    """(present, required) field counts of value against a SCHEMAS entry."""
+    if schema is None:
+        return 0, 0
+    if isinstance(schema, list):
+        if not isinstance(value, list) or not value:
+            return 0, 1
+        present = required = 0
+        for item in value:
+            p, r = schema_completeness(item, schema[0])
+            present += p
+            required += r
+        return present, required
+    present = required = 0
+    for key, child in schema.items():
+        required += 1
+        if isinstance(value, dict) and value.get(key) not in (None, "", [], {}):
+            present += 1
+            p, r = schema_completeness(value[key], child)
+            present += p
+            required += r
+        elif child is not None:
+            # Count the missing subtree's own keys as absent too
+            _, r = schema_completeness(None, child)
+            required += r
+    return present, required
+
+
+def message_text(messages: list[dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(p.get("text", "") for p in content if p.get("type") == "text")
+    return "\n".join(parts)
+
+
+async def run_variant(target: str, builder, fixtures: list, runs: int, schema, concurrency: int) -> dict:
+    from context_packer import count_tokens
+    from llm_utils import single_llm_call
+
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(profile, personal):
+        params = builder(profile, personal)
+        messages = params.pop("messages")
+        params.setdefault("model", "gpt-4o-mini")
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await single_llm_call(messages=messages, endpoint=f"bench:{target}", cache=False, **params)
+            except Exception as e:
+                samples.append({"error": str(e), "latency": time.perf_counter() - start})
+                return
+            latency = time.perf_counter() - start
+
+        content = response.choices[0].message.content or ""
+        usage = response.usage
+        sample = {
+            "latency": latency,
+            "input_tokens_est": count_tokens(message_text(messages)),
+            "prompt_tokens": usage.prompt_tokens if usage else None,
+            "completion_tokens": usage.completion_tokens if usage else None,
+            "finish_reason": response.choices[0].finish_reason,
+        }
+        if schema is not None:
+            try:
+                parsed = json.loads(content)
+                sample["json_valid"] = True
+                present, required = schema_completeness(parsed, schema)
+                sample["completeness"] = present / required if required else 1.0
+            except json.JSONDecodeError:
+                sample["json_valid"] = False
+                sample["completeness"] = 0.0
+        samples.append(sample)
+
+    await asyncio.gather(*[one(p, pi) for p, pi in fixtures for _ in range(runs)])
+
+    ok = [s for s in samples if "error" not in s]
+    latencies = [s["latency"] for s in ok]
+
+    def mean(key):
+        values = [s[key] for s in ok if s.get(key) is not None]
+        return round(sum(values) / len(values), 1) if values else None
+
+    result = {
+        "calls": len(samples),
+        "errors": len(samples) - len(ok),
+        "input_tokens_est": mean("input_tokens_est"),
+        "prompt_tokens": mean("prompt_tokens"),
+        "completion_tokens": mean("completion_tokens"),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "truncated_rate": round(sum(s["finish_reason"] == "length" for s in ok) / len(ok), 3) if ok else None,
+    }
+    if schema is not None and ok:
+        result["json_valid_rate"] = round(sum(s["json_valid"] for s in ok) / len(ok), 3)
+        result["schema_completeness"] = round(sum(s["completeness"] for s in ok) / len(ok), 3)
+    return result
+
+
+async def main(args) -> int:
+    if args.cassette:
+        os.environ["LIPIN_LLM_CASSETTE"] = args.cassette
+        os.environ["LIPIN_LLM_CASSETTE_MODE"] = args.cassette_mode
+
+    import config
+    variants_module = importlib.import_module(args.variants)
+    if config.LLM_BACKEND == "fake":
+        from perf import fixtures as fixture_module
+        config.fake_llm.responder = fixture_module.responder
+
+    fixtures = load_fixtures(args.fixtures, args.profiles)
+    targets = args.target or list(variants_module.VARIANTS)
+
+    results = {}
+    for target in targets:
+        schema = variants_module.SCHEMAS.get(target)
+        for name, builder in variants_module.VARIANTS[target].items():
+            if args.variant and name not in args.variant:
+                continue
+            results[f"{target}/{name}"] = await run_variant(target, builder, fixtures, args.runs, schema, args.concurrency)
+
+    print(f"\n{'variant':<46}{'in tok':>8}{'out tok':>9}{'p50 ms':>9}{'p95 ms':>9}{'json ok':>9}{'complete':>10}{'errors':>8}")
+    for name, r in results.items():
+        json_ok = f"{r['json_valid_rate']:.0%}" if "json_valid_rate" in r else "-"
+        complete = f"{r['schema_completeness']:.0%}" if "schema_completeness" in r else "-"
+        in_tokens = r["prompt_tokens"] or r["input_tokens_est"]
+        print(f"{name:<46}{in_tokens!s:>8}{r['completion_tokens']!s:>9}{r['latency_p50_ms']:>9}{r['latency_p95_ms']:>9}{json_ok:>9}{complete:>10}{r['errors']:>8}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark prompt variants over fixture profiles")
+    parser.add_argument("--variants", default="perf.prompt_variants", help="Module exposing VARIANTS and SCHEMAS")
+    parser.add_argument("--target", action="append", help="Prompt target(s) to run; default all")
+    parser.add_argument("--variant", action="append", help="Variant name(s) to run; default all")
+    parser.add_argument("--fixtures", help="JSON list of {profile, personal_info}; default synthetic profiles")
+    parser.add_argument("--profiles", type=int, default=8, help="Synthetic profiles when --fixtures is not given")
+    parser.add_argument("--runs", type=int, default=1, help="Calls per fixture per variant")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--live", action="store_true", help="Use the real OpenAI client")
+    parser.add_argument("--cassette", help="LLM cassette file to record to / replay from")
+    parser.add_argument("--cassette-mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--output", help="Write full results as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
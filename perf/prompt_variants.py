@@ -0,0 +1,176 @@
+"""
+Prompt variants for perf.prompt_bench.
+
+VARIANTS maps a prompt target to {variant name: builder}. A builder takes a
+scraped profile doc and a personalInfo doc and returns the chat completion
+parameters (messages, max_tokens, ...) the route would send. "baseline"
+mirrors what the route does today; add a sibling entry to try a change:
+
+    VARIANTS["Comments"]["short_rules"] = lambda profile, personal: {...}
+
+SCHEMAS gives the expected output shape per target for completeness
+scoring: dicts list required keys, a one-item list means "array whose items
+match", None is a leaf. Targets without a schema are plain text.
+"""
+import json
+from context_packer import pack_fields, CONTEXT_BUDGETS
+from profileAnalyst.prompts import ProfileScoringPrompt
+from profileAnalyst.scoring import LLM_SECTIONS
+from lipInDashboard.prompts import (
+    Comments,
+    NicheRecommendation,
+    NicheSpecificRecommendation,
+    PostGenPrompt,
+    ProfileBuilderPrompt,
+)
+
+DEFAULT_TONE = "Professional, positive, conversational tone"
+DEFAULT_LANGUAGE = "Use American English with plain, conversational language."
+
+_SUGGESTIONS = [{"id": None, "recommendation": None, "confidenceScore": None, "bestFor": None}]
+_OBSERVATIONS = {"analysis": None, "improvements": None}
+
+SCHEMAS = {
+    "ProfileBuilderPrompt": {"data": {
+        "headline": {"suggestions": _SUGGESTIONS},
+        "about": {"suggestions": _SUGGESTIONS},
+        "experience": {"positions": [{"role": None, "company": None, "keywords": None, "suggestions": None}]},
+        "skills": {"skillsToPrioritize": None},
+        "education": None,
+        "recommendation_request_template": {"suggestions": None},
+    }},
+    "ProfileScoringPrompt": {
+        "section_scores": [{"section_name": None, "score": None, "max_score": None, "observations": _OBSERVATIONS}],
+        "quick_wins": None,
+    },
+    "NicheRecommendation": {"niches": [{
+        "nicheTitle": None, "confidenceScore": None, "oneLinePitch": None, "targetAudience": None,
+        "timelineMonths": None, "evolutionPath": None, "justification": None,
+    }]},
+    "NicheSpecificRecommendation": {"components": [{"component": None, "niche_focus": None, "recommendations": None}]},
+    "NicheSpecificRecommendation.niches": {"recommendedNiches": [{
+        "rank": None, "niche": None, "confidenceScore": None, "oneLinePitch": None,
+        "targetAudience": None, "keyStrengths": None, "priorityGap": None, "timelineMonths": None,
+    }]},
+}
+
+
+def _scoring_prompt(profile: dict, sections):
+    basic_info = profile.get("basic_info", {}) or {}
+    packed = pack_fields([
+        ("headline", basic_info.get("headline", "") or "", 80),
+        ("about", profile.get("about", "") or "", 400),
+        ("experience", profile.get("experience", []) or []),
+        ("skills", profile.get("skills", []) or [], 120),
+        ("recent_posts", profile.get("recent_posts", []) or [], 200),
+    ], CONTEXT_BUDGETS["score_profile"])
+    return ProfileScoringPrompt(
+        packed["about"], packed["headline"], profile.get("certifications", []), packed["experience"],
+        packed["skills"], profile.get("education", []), basic_info.get("profile_picture_url", ""),
+        basic_info.get("connections", ""), packed["recent_posts"],
+        sections=sections, recommendations_count=len(profile.get("recommendations", []) or []),
+    )
+
+
+def scoring_baseline(profile: dict, personal: dict) -> dict:
+    return {
+        "messages": _scoring_prompt(profile, LLM_SECTIONS).generate_prompt(),
+        "max_tokens": 1500, "temperature": 0.05, "response_format": ProfileScoringPrompt.RESPONSE_FORMAT,
+    }
+
+
+def scoring_all_sections(profile: dict, personal: dict) -> dict:
+    """The original single prompt scoring all eight sections."""
+    return {
+        "messages": _scoring_prompt(profile, None).generate_prompt(),
+        "max_tokens": 3000, "temperature": 0.05, "response_format": {"type": "json_object"},
+    }
+
+
+def builder_baseline(profile: dict, personal: dict) -> dict:
+    packed = pack_fields([
+        ("headline", personal.get("headline") or "", 80),
+        ("about", personal.get("userDescription") or "", 500),
+        ("experience", profile.get("experience", []) or []),
+        ("skills", profile.get("skills", []) or [], 150),
+    ], CONTEXT_BUDGETS["profileBuilder"])
+    user_prompt = f"""Generate optimized LinkedIn profile content based on this data:
+
+PURPOSE: {personal.get('purpose') or 'N/A'}
+CAREER GOALS: {personal.get('careerVision') or 'N/A'}
+CURRENT HEADLINE: {packed['headline'] or 'N/A'}
+CURRENT ABOUT: {packed['about'] or 'N/A'}
+SKILLS: {', '.join(packed['skills']) if packed['skills'] else 'None'}
+TOPICS OF INTEREST: {', '.join(personal.get('topicsFiles') or []) or 'None'}
+CURRENT EXPERIENCE: {json.dumps(packed['experience']) if packed['experience'] else 'None'}
+TARGET NICHE: {personal.get('niche') or 'General'}
+
+Generate the complete profile builder JSON with all sections: headline, about, experience, skills, education, and recommendation_request_template.
+Include a "suggestions" array with improvements for each section."""
+    return {
+        "messages": [ProfileBuilderPrompt().generate_prompt(), {"role": "user", "content": user_prompt}],
+        "max_tokens": 6000, "temperature": 0.2, "response_format": ProfileBuilderPrompt.RESPONSE_FORMAT,
+    }
+
+
+def niche_analysis_baseline(profile: dict, personal: dict) -> dict:
+    prompt = NicheRecommendation(
+        personal.get("careerVision"), personal.get("headline"), personal.get("userDescription"),
+        personal.get("currentExp"), personal.get("skillsFiles") or [], personal.get("topicsFiles") or [],
+        personal.get("pastExperience"), personal.get("resumeFiles") or [],
+    )
+    return {
+        "messages": prompt.generate_niche_prompt(),
+        "max_tokens": 1000, "temperature": 0.2, "response_format": NicheRecommendation.RESPONSE_FORMAT,
+    }
+
+
+def _niche_specific(personal: dict) -> NicheSpecificRecommendation:
+    return NicheSpecificRecommendation(
+        personal.get("careerVision", ""), personal.get("headline", ""), personal.get("userDescription", ""),
+        personal.get("currentExp", ""), personal.get("skillsFiles") or [], personal.get("topicsFiles") or [],
+        personal.get("pastExperience", ""), personal.get("niche") or "Data Engineering",
+    )
+
+
+def niche_specific_baseline(profile: dict, personal: dict) -> dict:
+    return {
+        "messages": _niche_specific(personal).generate_ssi_recommendations(), "max_tokens": 800,
+        "response_format": NicheSpecificRecommendation.SSI_RESPONSE_FORMAT,
+    }
+
+
+def niche_specific_niches_baseline(profile: dict, personal: dict) -> dict:
+    return {"messages": _niche_specific(personal).generate_niche_prompt(), "max_tokens": 1500}
+
+
+def comments_baseline(profile: dict, personal: dict) -> dict:
+    posts = profile.get("recent_posts") or [{"text": "We cut our deploy time in half by shipping smaller changes."}]
+    prompt = Comments(
+        "Professional, positive, conversational comment",
+        f"{personal.get('headline', '')}. {personal.get('careerVision', '')}",
+        DEFAULT_TONE, posts[0]["text"], DEFAULT_LANGUAGE,
+    )
+    return {"model": "gpt-3.5-turbo", "messages": prompt.generate_messages(), "max_tokens": 80, "temperature": 0.3}
+
+
+def post_gen_baseline(profile: dict, personal: dict) -> dict:
+    system = PostGenPrompt([], DEFAULT_TONE, DEFAULT_LANGUAGE).generate_prompt()
+    return {
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": f"Write a post about what I learned as a {personal.get('currentExp', 'professional')}."},
+        ],
+        "max_tokens": 1000, "temperature": 0.7,
+    }
+
+
+VARIANTS = {
+    "ProfileBuilderPrompt": {"baseline": builder_baseline},
+    "ProfileScoringPrompt": {"baseline": scoring_baseline, "all_sections": scoring_all_sections},
+    "NicheRecommendation": {"baseline": niche_analysis_baseline},
+    "NicheSpecificRecommendation": {"baseline": niche_specific_baseline},
+    "NicheSpecificRecommendation.niches": {"baseline": niche_specific_niches_baseline},
+    "Comments": {"baseline": comments_baseline},
+    "PostGenPrompt": {"baseline": post_gen_baseline},
+}
@@ -0,0 +1,10 @@
+"""Small statistics helpers shared by the perf tools."""
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
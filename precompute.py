@@ -0,0 +1,284 @@
+"""
+Post-write precompute pipeline.
+
+After /profile_analyst/scrape or /personalInfo stores new data, the
+dashboard's expensive views are computed in the background and written to
+the same cache keys the routes read, so the first dashboard view is a
+cache hit instead of several cold LLM calls.
+
+Stages form a small DAG:
+
+    normalize ──> score           (needs profileInfo)
+              ├─> build           (needs profileInfo + personalInfo)
+              ├─> niche_analysis  (needs personalInfo)
+              └─> ssi             (needs SSI screenshots in personalInfo)
+
+normalize loads the stored documents once and decides which downstream
+stages have their inputs. Downstream stages start in the order above and
+share PRECOMPUTE_CONCURRENCY slots across all profiles, so a burst of
+sign-ups can't starve interactive requests.
+
+One pipeline runs per profile: a new write for the same profile cancels
+the in-flight run and starts over with fresh data. Routes that miss the
+cache while a stage is running call join_inflight() to wait for its result
+instead of paying for the same LLM call twice.
+
+Sign-in warm-up (opt-in, LIPIN_SIGNIN_PREFETCH=1): when /signin sees an
+existing user, warm_up() pins their Firestore docs in process memory and
+reruns only the stages whose cache entries have expired. Warm-up runs are
+speculative, so they get their own single slot, a per-minute budget, and
+are skipped while interactive load is high.
+"""
+import asyncio
+import contextvars
+import os
+import time
+from collections import OrderedDict
+from config import db
+from cache import get_cached_profile, invalidate_cache, set_cached_profile
+from telemetry import gauge_value
+
+PRECOMPUTE_ENABLED = os.getenv("LIPIN_PRECOMPUTE", "1") == "1"
+PRECOMPUTE_CONCURRENCY = 2  # background LLM stages running at once, process-wide
+STAGE_TIMEOUT_SECONDS = 180
+JOIN_TIMEOUT_SECONDS = 60
+
+STAGES = {
+    "normalize": [],
+    "score": ["normalize"],
+    "build": ["normalize"],
+    "niche_analysis": ["normalize"],
+    "ssi": ["normalize"],
+}
+
+# Cache keys each stage fills (must match the routes)
+STAGE_CACHE_KEYS = {
+    "score": lambda profile_id: f"score:{profile_id}",
+    "build": lambda profile_id: f"profile_builder:{profile_id}:general",
+    "niche_analysis": lambda profile_id: f"analysis:{profile_id}",
+    "ssi": lambda profile_id: f"ssi:{profile_id}",
+}
+
+SIGNIN_PREFETCH_ENABLED = os.getenv("LIPIN_SIGNIN_PREFETCH", "0") == "1"
+PREFETCH_STAGES_PER_MINUTE = 20  # global cap on speculative LLM stage runs
+PREFETCH_MAX_HTTP_IN_FLIGHT = 25  # skip warm-up while this many requests are being served
+PIN_TTL_SECONDS = 15 * 60
+PIN_MAX_PROFILES = 500
+
+_semaphore = asyncio.Semaphore(PRECOMPUTE_CONCURRENCY)
+_prefetch_semaphore = asyncio.Semaphore(1)
+_prefetch_window = [0.0, 0]  # [window start, stage runs in window]
+_pipelines: dict[str, asyncio.Task] = {}
+_stage_tasks: dict[tuple[str, str], asyncio.Task] = {}
+
+# (profile id, stage) being computed in the current context; wait_for runs the
+# stage in a child task, so current_task() can't identify it
+_current_stage: contextvars.ContextVar = contextvars.ContextVar("precompute_stage", default=None)
+
+# Pinned Firestore docs: profile id -> (expires at, {collection: [docs]})
+_pinned: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+
+def _fetch_collection(profile_id: str, collection: str) -> list[dict]:
+    docs = db.collection("users").document(profile_id).collection(collection).stream()
+    return [d.to_dict() for d in docs]
+
+
+def pin_docs(profile_id: str, docs: dict) -> None:
+    """Keep a user's docs in memory for PIN_TTL_SECONDS (LRU-bounded)."""
+    _pinned[profile_id] = (time.time() + PIN_TTL_SECONDS, docs)
+    _pinned.move_to_end(profile_id)
+    while len(_pinned) > PIN_MAX_PROFILES:
+        _pinned.popitem(last=False)
+
+
+def unpin_docs(profile_id: str) -> None:
+    """Forget pinned docs after the user's data changed."""
+    _pinned.pop(profile_id.strip(), None)
+
+
+async def load_user_docs(profile_id: str, collection: str) -> list[dict]:
+    """A user's docs from one subcollection, served from the pin if present."""
+    profile_id = profile_id.strip()
+    pinned = _pinned.get(profile_id)
+    if pinned and pinned[0] > time.time() and collection in pinned[1]:
+        return pinned[1][collection]
+    return await asyncio.to_thread(_fetch_collection, profile_id, collection)
+
+
+async def _normalize(profile_id: str, pin: bool = False) -> dict:
+    """Load the stored inputs once; downstream stages check what's present."""
+    profile_docs, personal_docs = await asyncio.gather(
+        asyncio.to_thread(_fetch_collection, profile_id, "profileInfo"),
+        asyncio.to_thread(_fetch_collection, profile_id, "personalInfo"),
+    )
+    if pin:
+        pin_docs(profile_id, {"profileInfo": profile_docs, "personalInfo": personal_docs})
+    return {
+        "profile": profile_docs[0] if profile_docs else None,
+        "personal": personal_docs[0] if personal_docs else None,
+    }
+
+
+async def _score(profile_id: str, inputs: dict) -> None:
+    from profileAnalyst.routes import _score_and_cache
+    await _score_and_cache(STAGE_CACHE_KEYS["score"](profile_id), inputs["profile"])
+
+
+async def _build(profile_id: str, inputs: dict) -> None:
+    from lipInDashboard.routes import get_profile_builder
+    await get_profile_builder(profile_url=profile_id, niche=None, sections=None, fields=None)
+
+
+async def _niche_analysis(profile_id: str, inputs: dict) -> None:
+    from lipInDashboard.routes import get_personal_info
+    await get_personal_info(profile_url=profile_id)
+
+
+async def _ssi(profile_id: str, inputs: dict) -> None:
+    from lipInDashboard.ssi import profile_ssi
+    reading = await profile_ssi(inputs["personal"].get("ssiScoreFiles"))
+    if reading:
+        await set_cached_profile(STAGE_CACHE_KEYS["ssi"](profile_id), reading)
+
+
+_STAGE_RUNNERS = {
+    "score": (_score, lambda inputs: inputs["profile"] is not None),
+    "build": (_build, lambda inputs: inputs["profile"] is not None and inputs["personal"] is not None),
+    "niche_analysis": (_niche_analysis, lambda inputs: inputs["personal"] is not None),
+    "ssi": (_ssi, lambda inputs: bool((inputs["personal"] or {}).get("ssiScoreFiles"))),
+}
+
+
+def _take_prefetch_budget() -> bool:
+    """Consume one speculative stage run from the per-minute budget."""
+    now = time.time()
+    if now - _prefetch_window[0] >= 60:
+        _prefetch_window[0], _prefetch_window[1] = now, 0
+    if _prefetch_window[1] >= PREFETCH_STAGES_PER_MINUTE:
+        return False
+    _prefetch_window[1] += 1
+    return True
+
+
+async def _run_stage(profile_id: str, stage: str, inputs: dict, speculative: bool = False) -> None:
+    runner, ready = _STAGE_RUNNERS[stage]
+    if not ready(inputs):
+        print(f"[precompute] {profile_id}: skipping {stage}, inputs not stored yet")
+        return
+    if speculative:
+        semaphore = _prefetch_semaphore
+        if not _take_prefetch_budget():
+            print(f"[precompute] {profile_id}: prefetch budget spent, skipping {stage}")
+            return
+    else:
+        semaphore = _semaphore
+        # Drop the stale entry first so readers wait on us instead of serving old data
+        await invalidate_cache(STAGE_CACHE_KEYS[stage](profile_id))
+    _current_stage.set((profile_id, stage))
+    async with semaphore:
+        try:
+            await asyncio.wait_for(runner(profile_id, inputs), STAGE_TIMEOUT_SECONDS)
+            print(f"[precompute] {profile_id}: {stage} done")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[precompute] {profile_id}: {stage} failed: {e}")
+
+
+async def _run_pipeline(profile_id: str, speculative: bool = False) -> None:
+    try:
+        inputs = await _normalize(profile_id, pin=speculative)
+        tasks = []
+        for stage, deps in STAGES.items():
+            if not deps:
+                continue  # normalize already ran
+            if speculative and await get_cached_profile(STAGE_CACHE_KEYS[stage](profile_id)):
+                continue  # still fresh
+            task = asyncio.create_task(_run_stage(profile_id, stage, inputs, speculative))
+            _stage_tasks[(profile_id, stage)] = task
+            tasks.append(task)
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+    except asyncio.CancelledError:
+        print(f"[precompute] {profile_id}: cancelled")
+        raise
+    except Exception as e:
+        print(f"[precompute] {profile_id}: pipeline failed: {e}")
+    finally:
+        for stage in STAGES:
+            task = _stage_tasks.get((profile_id, stage))
+            if task is not None and task.done():
+                _stage_tasks.pop((profile_id, stage), None)
+        if _pipelines.get(profile_id) is asyncio.current_task():
+            _pipelines.pop(profile_id, None)
+
+
+def schedule_precompute(profile_id: str, reason: str = "") -> asyncio.Task | None:
+    """Start (or restart) the pipeline for a profile after new data was written."""
+    if not profile_id:
+        return None
+    # Even with precompute off: sign-in warm-up may have pinned the old docs
+    unpin_docs(profile_id)
+    if not PRECOMPUTE_ENABLED:
+        return None
+    profile_id = profile_id.strip()
+    cancel_precompute(profile_id)
+    print(f"[precompute] {profile_id}: scheduled ({reason or 'write'})")
+    task = asyncio.create_task(_run_pipeline(profile_id))
+    _pipelines[profile_id] = task
+    return task
+
+
+def warm_up(profile_id: str) -> asyncio.Task | None:
+    """
+    Speculative prefetch for a returning user: pin their docs and refresh
+    expired dashboard cache entries. No-op unless LIPIN_SIGNIN_PREFETCH=1,
+    while a pipeline for the user is already running, or under load.
+    """
+    if not SIGNIN_PREFETCH_ENABLED or not profile_id:
+        return None
+    profile_id = profile_id.strip()
+    if profile_id in _pipelines:
+        return None
+    if gauge_value("lipin_http_requests_in_flight") > PREFETCH_MAX_HTTP_IN_FLIGHT:
+        print(f"[precompute] {profile_id}: skipping sign-in warm-up under load")
+        return None
+    task = asyncio.create_task(_run_pipeline(profile_id, speculative=True))
+    _pipelines[profile_id] = task
+    return task
+
+
+def cancel_precompute(profile_id: str) -> bool:
+    """Cancel the in-flight pipeline for a profile, if any."""
+    task = _pipelines.pop(profile_id.strip(), None)
+    if task is None or task.done():
+        return False
+    task.cancel()
+    return True
+
+
+async def join_inflight(profile_id: str, stage: str) -> bool:
+    """
+    Wait for a running stage that will fill this profile's cache key.
+
+    Returns True if a stage was awaited (the caller should re-check the
+    cache), False if nothing was running or we are that stage ourselves.
+    """
+    key = (profile_id.strip(), stage)
+    task = _stage_tasks.get(key)
+    if task is None or task.done() or _current_stage.get() == key:
+        return False
+    try:
+        await asyncio.wait_for(asyncio.shield(task), JOIN_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return False
+    except asyncio.CancelledError:
+        if task.cancelled():
+            return False  # stage was superseded by a newer write; compute inline
+        raise
+    return True
@@ -0,0 +1,118 @@
+"""
+Managed process pool for CPU-bound work (PDF text extraction, OCR, image
+re-encoding) so it runs on other cores instead of stalling the event loop.
+
+run_cpu(kind, fn, *args) runs a function from cpu_tasks.py in a worker:
+
+- at most CPU_WORKERS tasks run at once; up to CPU_MAX_QUEUED more wait for a
+  slot, and anything beyond that is rejected with CPUPoolBusy right away
+- the timeout covers run time only (not the wait for a slot); a task that
+  overruns gets its pool torn down and restarted, since a running task in a
+  ProcessPoolExecutor can't be cancelled any other way
+- wait time, run time, outcome, tasks waiting and in flight are exported per kind
+  (see telemetry.record_cpu_task)
+
+Workers use the "spawn" start method: forking a process that already holds
+gRPC (Firestore) threads can deadlock the child. LIPIN_CPU_WORKERS=0 runs
+tasks in a thread instead, for local debugging.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from telemetry import gauge_add, record_cpu_task
+
+CPU_WORKERS = int(os.getenv("LIPIN_CPU_WORKERS", str(min(os.cpu_count() or 1, 4))))
+CPU_MAX_QUEUED = int(os.getenv("LIPIN_CPU_MAX_QUEUED", "32"))
+DEFAULT_TIMEOUT_SECONDS = 30
+
+_executor: ProcessPoolExecutor | None = None
+_slots = asyncio.Semaphore(max(CPU_WORKERS, 1))
+_waiting = 0
+
+
+class CPUTaskError(RuntimeError):
+    """A CPU task could not complete: pool saturated, timed out or crashed."""
+
+
+class CPUPoolBusy(CPUTaskError):
+    """CPU_MAX_QUEUED tasks are already waiting for a worker."""
+
+
+class CPUTaskTimeout(CPUTaskError):
+    """The task ran longer than its timeout."""
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _reset_executor(executor: ProcessPoolExecutor, reason: str) -> None:
+    """
+    Drop a pool with hung or dead workers; the next task starts a fresh one.
+    Only if it is still the current pool: tasks that fail because an earlier
+    reset killed their workers must not tear down its replacement.
+    """
+    global _executor
+    if _executor is not executor:
+        return
+    _executor = None
+    print(f"[process_pool] Restarting worker pool: {reason}")
+    # No public API stops a task that is already running
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu(kind: str, fn, *args, timeout: float = DEFAULT_TIMEOUT_SECONDS):
+    """
+    Run fn(*args) in a worker process and return its result.
+
+    fn must be a module-level function from cpu_tasks.py. Exceptions raised
+    by fn propagate unchanged; pool problems raise CPUTaskError subclasses.
+    """
+    global _waiting
+    if _waiting >= CPU_MAX_QUEUED:
+        record_cpu_task(kind, "rejected")
+        raise CPUPoolBusy(f"{kind}: {_waiting} CPU tasks already queued")
+
+    queued_at = time.time()
+    _waiting += 1
+    gauge_add("lipin_cpu_tasks_waiting", (("kind", kind),), 1)
+    try:
+        await _slots.acquire()
+    finally:
+        _waiting -= 1
+        gauge_add("lipin_cpu_tasks_waiting", (("kind", kind),), -1)
+
+    started = time.time()
+    outcome = "error"
+    gauge_add("lipin_cpu_tasks_in_flight", (("kind", kind),), 1)
+    executor = None
+    try:
+        if CPU_WORKERS <= 0:
+            result = await asyncio.wait_for(asyncio.to_thread(fn, *args), timeout)
+        else:
+            executor = _get_executor()
+            future = executor.submit(fn, *args)
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        outcome = "ok"
+        return result
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        if executor is not None:
+            _reset_executor(executor, f"{kind} task exceeded {timeout}s")
+        raise CPUTaskTimeout(f"{kind}: timed out after {timeout}s") from None
+    except BrokenProcessPool as e:
+        _reset_executor(executor, f"{kind}: worker process died")
+        raise CPUTaskError(f"{kind}: worker process died") from e
+    finally:
+        gauge_add("lipin_cpu_tasks_in_flight", (("kind", kind),), -1)
+        _slots.release()
+        record_cpu_task(kind, outcome, started - queued_at, time.time() - started)
@@ -1,5 +1,45 @@
+from structured_output import INTEGER, STRING, json_schema_format, schema_array, schema_object
+
+# Section name -> max points. Order matches the single-call scorer output.
+SCORING_SECTIONS = {
+    "Visual Branding": 10,
+    "Headline": 15,
+    "About": 20,
+    "Experience": 25,
+    "Skills": 10,
+    "Recommendations": 5,
+    "Network": 5,
+    "Activity": 10,
+}
+
+SECTION_RUBRICS = {
+    "Visual Branding": "Photo5+Banner5. Professional, clear, well-lit headshot; custom banner present.",
+    "Headline": "Keywords5+Value5+Length5. Niche keywords, clear value proposition, uses the 220-char space well.",
+    "About": "Story7+Value7+CTA6. Hook and narrative, concrete value and achievements, clear call to action.",
+    "Experience": "Bullets10+Metrics10+Complete5. Achievement bullets, quantified results, complete roles and dates.",
+    "Skills": "Listed5+Endorsed5. Enough relevant, specific skills listed; endorsements on top skills.",
+    "Recommendations": "5 pts. Number of recommendations and diversity of sources (managers, peers, clients).",
+    "Network": "500+=5, 300-499=4, 200-299=3, 100-199=2, <100=1.",
+    "Activity": "Posts5+Engage5. Posting frequency and engagement on recent posts.",
+}
+
+
+_OBSERVATIONS = schema_object(analysis=schema_array(STRING), improvements=schema_array(STRING))
+
+
 class ProfileScoringPrompt:
-    def __init__(self, about, headline, certifications, experiences, skills, education, profile_picture, network_size, recent_posts):
+    # Output of the partial (LLM_SECTIONS) prompt the routes send
+    RESPONSE_FORMAT = json_schema_format("section_scores", schema_object(
+        section_scores=schema_array(schema_object(
+            section_name={"type": "string", "enum": list(SCORING_SECTIONS)},
+            score=INTEGER,
+            max_score=INTEGER,
+            observations=_OBSERVATIONS,
+        )),
+        quick_wins=schema_array(STRING),
+    ))
+
+    def __init__(self, about, headline, certifications, experiences, skills, education, profile_picture, network_size, recent_posts, sections=None, recommendations_count=0):
         self.about = about
         self.headline = headline
         self.certifications = certifications
@@ -9,8 +49,42 @@ class ProfileScoringPrompt:
         self.profile_picture = profile_picture
         self.network_size = network_size
         self.recent_posts = recent_posts
+        self.recommendations_count = recommendations_count
+        # Sections to send to the LLM; the rest are scored locally
+        self.sections = sections or list(SCORING_SECTIONS)
 
     def generate_prompt(self):
+        if len(self.sections) == len(SCORING_SECTIONS):
+            return self._generate_full_prompt()
+
+        section_list = ", ".join(f'"{name}"({SCORING_SECTIONS[name]})' for name in self.sections)
+        rubric = " | ".join(f"{name}={SECTION_RUBRICS[name]}" for name in self.sections)
+        inputs = {
+            "Headline": f"HEADLINE: {self.headline}",
+            "About": f"ABOUT: {self.about or ''}",
+            "Experience": f"EXPERIENCE: {self.experiences}",
+            "Recommendations": f"RECOMMENDATIONS: {self.recommendations_count}",
+        }
+        profile_text = "\n".join(inputs[name] for name in self.sections if name in inputs)
+        return [
+            {
+                'role': 'system',
+                'content': f"""LinkedIn profile scorer. Score ONLY these {len(self.sections)} sections with analysis + improvements.
+
+SECTIONS (use exact names): {section_list}
+
+SCORING: {rubric}
+
+OUTPUT JSON: {{section_scores:[{{section_name, score, max_score, observations:{{analysis[], improvements[]}}}}], quick_wins[]}}"""
+            },
+            {
+                'role': 'user',
+                'content': f"""Score this profile:
+{profile_text}"""
+            }
+        ]
+
+    def _generate_full_prompt(self):
         messages = [
             {
                 'role': 'system',
@@ -27,7 +101,7 @@ OUTPUT JSON: {total_score, section_scores:[{section_name, score, max_score, curr
                 'content': [
                     {"type": "text", "text": f"""Score this profile:
 HEADLINE: {self.headline}
-ABOUT: {self.about[:400] if self.about else ''}
+ABOUT: {self.about or ''}
 EXPERIENCE: {self.experiences}
 SKILLS: {self.skills}
 CONNECTIONS: {self.network_size}
@@ -50,3 +124,46 @@ POSTS: {self.recent_posts}"""}
             messages[1]['content'][0]['text'] += "\n\nNote: No profile picture. Score Profile Picture subsection as 0."
 
         return messages
+
+
+class SectionScoringPrompt:
+    """Focused prompt that scores a single profile section."""
+    RESPONSE_FORMAT = json_schema_format("section_score", schema_object(score=INTEGER, observations=_OBSERVATIONS))
+
+    def __init__(self, section_name, section_data, profile_picture=None):
+        self.section_name = section_name
+        self.section_data = section_data
+        self.profile_picture = profile_picture
+
+    def generate_prompt(self):
+        max_score = SCORING_SECTIONS[self.section_name]
+        messages = [
+            {
+                'role': 'system',
+                'content': f"""LinkedIn profile scorer. Score ONLY the "{self.section_name}" section out of {max_score} pts.
+
+SCORING: {SECTION_RUBRICS[self.section_name]}
+
+OUTPUT JSON: {{score, observations:{{analysis[], improvements[]}}}}
+Keep 2-3 short items per list."""
+            },
+            {
+                'role': 'user',
+                'content': [
+                    {"type": "text", "text": f"""{self.section_name.upper()}: {self.section_data}"""}
+                ]
+            }
+        ]
+
+        # Only the Visual Branding scorer needs to look at the picture
+        if self.section_name == "Visual Branding":
+            pic = self.profile_picture or ""
+            if pic.startswith("http") or pic.startswith("data:image"):
+                messages[1]['content'].append({
+                    "type": "image_url",
+                    "image_url": {"url": pic}
+                })
+            else:
+                messages[1]['content'][0]['text'] += "\n\nNote: No profile picture. Score Photo as 0."
+
+        return messages
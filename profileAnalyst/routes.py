@@ -3,15 +3,35 @@ from pydantic import BaseModel
 from .scraper import scrape_profile, setup_session
 import threading
 import asyncio
-from lipInDashboard.helper import Clean_JSON
-import json
+from structured_output import StructuredOutputError, parse_json_response
 import time
-from config import db, async_client
-from cache import get_cached_profile, set_cached_profile
-from .prompts import ProfileScoringPrompt
+from config import db
+from cache import bump_cache_generation, cache_generation, get_cached_entry, set_cached_profile
+from fieldsets import parse_fields, parse_sections, select_fields, selection_etag, selection_key
+from http_responses import cached_json_response
+from llm_utils import single_llm_call
+from context_packer import pack_fields, CONTEXT_BUDGETS
+from .prompts import SCORING_SECTIONS, ProfileScoringPrompt, SectionScoringPrompt
+from precompute import schedule_precompute, join_inflight, load_user_docs
+from .scoring import (
+    LLM_SECTIONS,
+    section_inputs,
+    apply_current_fields,
+    build_section,
+    placeholder_section,
+    assemble_score,
+    local_section_scores,
+    merge_sections,
+    preview_score,
+)
 
 router = APIRouter(prefix="/profile_analyst", tags=["Profile Analyst"])
 
+SECTION_TIMEOUT_SECONDS = 20
+
+# Background LLM scoring jobs started by mode=preview, keyed by cache key
+_background_scores: dict[str, asyncio.Task] = {}
+
 
 class ScrapeRequest(BaseModel):
     profile_url: str
@@ -19,15 +39,21 @@ class ScrapeRequest(BaseModel):
 
 
 @router.post("/scrape")
-def scrape(req: ScrapeRequest):
+async def scrape(req: ScrapeRequest):
     """Scrape a LinkedIn profile and return structured data."""
     try:
-        data = scrape_profile(req.profile_url, headless=req.headless)
+        # Playwright's sync API and Firestore block, so keep them off the event loop
+        data = await asyncio.to_thread(scrape_profile, req.profile_url, headless=req.headless)
+        doc_ref = None
         if data:
             doc_id = req.profile_url.rstrip("/").split("/")[-1]
-            _, doc_ref = db.collection("users").document(doc_id).collection('profileInfo').add(data)
+            collection = db.collection("users").document(doc_id).collection('profileInfo')
+            _, doc_ref = await asyncio.to_thread(collection.add, data)
+            # Warm score/builder/analysis caches before the dashboard asks for them
+            await bump_cache_generation(doc_id)
+            schedule_precompute(doc_id, "scrape")
         return {"success": True, "data": data,
-                "document_id": doc_ref.id, "message": "Profile scraped and added to database successfully."
+                "document_id": doc_ref.id if doc_ref else None, "message": "Profile scraped and added to database successfully."
                 }
     except RuntimeError as e:
         raise HTTPException(status_code=401, detail=str(e))
@@ -52,32 +78,201 @@ def run_setup():
     }
 
 
+async def _score_section(section_name: str, section_data, profile_picture: str) -> dict:
+    """Score one section with a small focused call; degrade to a placeholder on failure."""
+    prompt = SectionScoringPrompt(section_name, section_data, profile_picture)
+    try:
+        response = await asyncio.wait_for(
+            single_llm_call(
+                messages=prompt.generate_prompt(),
+                max_tokens=400,
+                temperature=0.05,
+                response_format=SectionScoringPrompt.RESPONSE_FORMAT,
+                endpoint="score_profile"
+            ),
+            timeout=SECTION_TIMEOUT_SECONDS
+        )
+        parsed = parse_json_response(response, f"score_profile:{section_name}")
+        if not isinstance(parsed, dict) or "score" not in parsed:
+            return placeholder_section(section_name, "Scorer returned no score")
+        return build_section(section_name, parsed)
+    except asyncio.TimeoutError:
+        print(f"[score_profile] Section '{section_name}' timed out after {SECTION_TIMEOUT_SECONDS}s")
+        return placeholder_section(section_name, "Scoring timed out")
+    except Exception as e:
+        print(f"[score_profile] Section '{section_name}' failed: {e}")
+        return placeholder_section(section_name, "Scoring failed")
+
+
+async def _score_sections_parallel(doc: dict, sections: list) -> list:
+    """Score the given sections concurrently, one small call each."""
+    basic_info = doc.get('basic_info', {}) or {}
+    profile_picture = basic_info.get('profile_picture_url', '') or ''
+    inputs = section_inputs(doc)
+    section_scores = await asyncio.gather(*[
+        _score_section(name, inputs[name], profile_picture) for name in sections
+    ])
+    return list(section_scores)
+
+
+async def _score_sections_combined(doc: dict, sections: list) -> tuple[list, list]:
+    """Score the given sections with one combined call. Returns (sections, quick_wins)."""
+    basic_info = doc.get('basic_info', {}) or {}
+    about = doc.get('about', '')
+    experience = doc.get('experience', [])
+    skills = doc.get('skills', [])
+    recent_posts = doc.get('recent_posts', [])
+
+    # Fit inputs to the endpoint token budget: headline > about > recent experience
+    packed = pack_fields([
+        ("headline", basic_info.get('headline', '') or '', 80),
+        ("about", about or '', 400),
+        ("experience", experience or []),
+        ("skills", skills or [], 120),
+        ("recent_posts", recent_posts or [], 200),
+    ], CONTEXT_BUDGETS["score_profile"])
+
+    score_prompt = ProfileScoringPrompt(
+        packed["about"], packed["headline"], doc.get('certifications', []), packed["experience"],
+        packed["skills"], doc.get('education', []), basic_info.get('profile_picture_url', ''),
+        basic_info.get('connections', ''), packed["recent_posts"],
+        sections=sections, recommendations_count=len(doc.get("recommendations", []) or [])
+    )
+
+    # Use async LLM call with optimized params
+    response = await single_llm_call(
+        messages=score_prompt.generate_prompt(),
+        max_tokens=1500,  # Only the narrative sections are scored by the LLM
+        temperature=0.05,  # Lower temp = faster, more deterministic
+        response_format=ProfileScoringPrompt.RESPONSE_FORMAT,
+        endpoint="score_profile"
+    )
+
+    try:
+        parsed = parse_json_response(response, "score_profile")
+    except StructuredOutputError as e:
+        print(f"Score profile JSON parse error: {e}")
+        print(f"Raw response: {(response.choices[0].message.content or '')[:500]}")
+        raise HTTPException(500, f"Failed to parse score profile response: {str(e)}")
+
+    return parsed.get("section_scores", []) or [], parsed.get("quick_wins", []) or []
+
+
+async def _compute_score(doc: dict, mode: str, sections: list | None = None) -> dict:
+    """
+    Score rule-based sections locally and the narrative sections with the LLM.
+
+    sections limits scoring to a subset; the result then has no total_score
+    or benchmarking, which are only meaningful over every section.
+    """
+    wanted = sections or list(SCORING_SECTIONS)
+    llm_names = [name for name in LLM_SECTIONS if name in wanted]
+    local_sections = local_section_scores(doc, wanted)
+    llm_quick_wins = []
+    if not llm_names:
+        llm_sections = []
+    elif mode == "parallel":
+        llm_sections = await _score_sections_parallel(doc, llm_names)
+    else:
+        llm_sections, llm_quick_wins = await _score_sections_combined(doc, llm_names)
+
+    section_scores = [s for s in merge_sections(llm_sections, local_sections) if s["section_name"] in wanted]
+    scored_names = {section["section_name"] for section in section_scores}
+    for name in llm_names:
+        if name not in scored_names:
+            section_scores.append(placeholder_section(name, "Scorer returned no score"))
+
+    result = assemble_score(section_scores)
+    if llm_quick_wins:
+        result["quick_wins"] = (llm_quick_wins + [w for w in result["quick_wins"] if w not in llm_quick_wins])[:5]
+    result["section_scores"] = apply_current_fields(result["section_scores"], doc)
+    if sections:
+        del result["total_score"], result["benchmarking"]
+        result["sections"] = sections
+    return result
+
+
+def _sparse_score(data: dict, sections: list | None, fields: list | None) -> dict:
+    """A score result narrowed to the requested sections and per-section fields."""
+    if not sections and not fields:
+        return data
+    section_scores = data.get("section_scores", []) or []
+    if sections:
+        section_scores = [s for s in section_scores if s.get("section_name") in sections]
+    return {**data, "section_scores": [select_fields(s, fields, keep=("section_name",)) for s in section_scores]}
+
+
+async def _score_and_cache(cache_key: str, doc: dict) -> None:
+    """Background job behind mode=preview: full LLM score, then cache it."""
+    try:
+        result = await _compute_score(doc, "full")
+        if result.get("section_scores") and not result.get("partial"):
+            await set_cached_profile(cache_key, result)
+            print(f"[score_profile] Background score cached for {cache_key}")
+    except Exception as e:
+        print(f"[score_profile] Background scoring failed for {cache_key}: {e}")
+    finally:
+        if _background_scores.get(cache_key) is asyncio.current_task():
+            _background_scores.pop(cache_key, None)
+
+
 # Profile Scoring Endpoint
 @router.get("/score_profile")
-async def score_profile(profile_url: str = Query(...)):
+async def score_profile(
+    profile_url: str = Query(...),
+    mode: str = Query("full"),
+    sections: str = Query(None),
+    fields: str = Query(None),
+):
+    """
+    Score a scraped profile. Visual Branding, Skills, Network and Activity are
+    always scored by local rules; the LLM only handles the narrative sections.
+
+    mode=full      one combined LLM call for the narrative sections (default)
+    mode=parallel  one small call per section, run concurrently; a failed or
+                   slow section degrades to a placeholder instead of failing
+    mode=preview   fully local score returned immediately; the LLM score is
+                   produced in the background and served from cache next time
+
+    sections=Headline,About returns only those sections (and on a cache miss
+    scores only those); fields=score,observations keeps only those keys in
+    each section entry, dropping e.g. the raw "current" profile data.
+    """
     start_time = time.time()
-    print(f"[score_profile] Request started for: {profile_url}")
+    print(f"[score_profile] Request started for: {profile_url} (mode={mode})")
+    if mode not in ("full", "parallel", "preview"):
+        raise HTTPException(400, "mode must be 'full', 'parallel' or 'preview'")
+    selected_sections = parse_sections(sections, list(SCORING_SECTIONS))
+    selected_fields = parse_fields(fields)
 
     # Check cache first
     cache_start = time.time()
     cache_key = f"score:{profile_url.strip()}"
-    cached_data = await get_cached_profile(cache_key)
+    cached_data, etag = await get_cached_entry(cache_key)
     cache_time = time.time() - cache_start
     print(f"[score_profile] Cache check took: {cache_time:.3f}s")
 
+    # A post-scrape precompute may already be producing this score
+    if not cached_data and mode != "preview" and await join_inflight(profile_url, "score"):
+        cached_data, etag = await get_cached_entry(cache_key)
+
+    # Without the full score, a previous request may have scored just these sections
+    # (keyed on the data generation: a new scrape orphans every earlier subset)
+    subset_key = None
+    if selected_sections and not cached_data and mode != "preview":
+        generation = await cache_generation(profile_url)
+        subset_key = f"{cache_key}:g{generation}:{selection_key(selected_sections)}"
+    if not cached_data and subset_key:
+        cached_data, etag = await get_cached_entry(subset_key)
+
     if cached_data:
         total_time = time.time() - start_time
         print(f"[score_profile] Cache HIT - Total time: {total_time:.3f}s")
-        return {"success": True, "data": cached_data}
+        data = _sparse_score(cached_data, selected_sections, selected_fields)
+        return cached_json_response({"success": True, "data": data}, selection_etag(etag, selected_sections, selected_fields))
 
-    # Run Firestore call in thread pool to avoid blocking event loop
-    def fetch_profile_data():
-        data_ref = (db.collection("users").document(profile_url.strip())
-                .collection("profileInfo")
-                .stream())
-        return [doc.to_dict() for doc in data_ref]
-
-    profile_data = await asyncio.to_thread(fetch_profile_data)
+    # Firestore read runs in a thread (or comes from the sign-in pin)
+    profile_data = await load_user_docs(profile_url, "profileInfo")
     if not profile_data:
         raise HTTPException(status_code=404, detail="Profile data not found. Please scrape the profile first.")
     doc = profile_data[0]
@@ -87,12 +282,8 @@ async def score_profile(profile_url: str = Query(...)):
     about = doc.get('about', '')
     experience = doc.get('experience', [])
     skills = doc.get('skills', [])
-    profile_picture = basic_info.get('profile_picture_url', '')
-    education = doc.get('education', [])
-    certification = doc.get('certifications', [])
     headline = basic_info.get('headline', '')
     network_size = basic_info.get('connections', '')
-    recent_posts = doc.get('recent_posts', [])
 
     print(f"[score_profile] Data: headline='{headline[:50] if headline else 'None'}', about={len(about) if about else 0} chars, exp={len(experience)}, skills={len(skills)}, connections={network_size}")
 
@@ -101,90 +292,31 @@ async def score_profile(profile_url: str = Query(...)):
         print(f"[score_profile] WARNING: No meaningful data found in profile")
         return {"success": True, "data": {"section_scores": [], "error": "No profile data found - profile may need to be scraped first"}}
 
-    # Truncate data for faster processing
-    about_short = about[:500] if about else ''
-    experience_short = experience[:3] if experience else []
-    skills_short = skills[:10] if skills else []
-    recent_posts_short = recent_posts[:2] if recent_posts else []
+    if mode == "preview":
+        preview = preview_score(doc)
+        preview["section_scores"] = apply_current_fields(preview["section_scores"], doc)
+        if cache_key not in _background_scores:
+            _background_scores[cache_key] = asyncio.create_task(_score_and_cache(cache_key, doc))
+        print(f"[score_profile] Preview served in {time.time() - start_time:.3f}s")
+        return {"success": True, "data": _sparse_score(preview, selected_sections, selected_fields)}
 
-    score_prompt = ProfileScoringPrompt(about_short, headline, certification, experience_short, skills_short, education, profile_picture, network_size, recent_posts_short)
-
-    # Use async LLM call with optimized params
     llm_start = time.time()
-    response = await async_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=score_prompt.generate_prompt(),
-        timeout=60,
-        max_tokens=2500,  # Reduced - condensed prompt needs fewer output tokens
-        temperature=0.05,  # Lower temp = faster, more deterministic
-        response_format={"type": "json_object"}
-    )
+    parsed_profile_builder = await _compute_score(doc, mode, selected_sections)
     llm_time = time.time() - llm_start
-    print(f"[score_profile] LLM call took: {llm_time:.3f}s")
-
-    formatted_response = response.choices[0].message.content
-    print(f"Score profile raw response length: {len(formatted_response)}")
-
-    final_response = Clean_JSON(formatted_response)
-    cleaned_response = final_response.clean_json_response()
+    print(f"[score_profile] LLM scoring ({mode}) took: {llm_time:.3f}s")
+    section_scores = parsed_profile_builder["section_scores"]
 
-    try:
-        parsed_profile_builder = json.loads(cleaned_response)
-        print(f"Score profile parsed keys: {list(parsed_profile_builder.keys())}")
-    except json.JSONDecodeError as e:
-        print(f"Score profile JSON parse error: {e}")
-        print(f"Cleaned response: {cleaned_response[:500]}")
-        raise HTTPException(500, f"Failed to parse score profile response: {str(e)}")
-    # Override current fields with exact scraped data
-    section_scores = parsed_profile_builder.get("section_scores", [])
-    for section in section_scores:
-        section_name = (section.get("section_name") or "").lower()
-        if "visual branding" in section_name:
-            section["current"] = {
-                "profile_picture": profile_picture,
-                "has_custom_banner": bool(basic_info.get("banner_url"))
-            }
-        elif "headline" in section_name:
-            section["current"] = headline
-        elif "about" in section_name:
-            section["current"] = about
-        elif "experience" in section_name:
-            section["current"] = experience
-        elif "skills" in section_name:
-            skills_list = skills if isinstance(skills, list) else []
-            section["current"] = {
-                "skills_count": len(skills_list),
-                "skills": skills_list,
-                "top_endorsed": []
-            }
-        elif "recommendations" in section_name:
-            section["current"] = {
-                "count": len(doc.get("recommendations", []) or []),
-                "most_recent": doc.get("recommendations_meta", {}).get("most_recent", ""),
-                "sources": doc.get("recommendations_meta", {}).get("sources", [])
-            }
-        elif "network" in section_name:
-            section["current"] = {
-                "connections": network_size,
-                "visible_count": network_size if isinstance(network_size, int) else None
-            }
-        elif "activity" in section_name or "engagement" in section_name:
-            section["current"] = {
-                "post_count": len(recent_posts) if recent_posts else 0
-            }
-    parsed_profile_builder["section_scores"] = section_scores
-
-    # Only cache if data is valid (has section_scores with content)
-    if section_scores and len(section_scores) > 0:
-        await set_cached_profile(cache_key, parsed_profile_builder)
+    # Only cache if data is valid (has section_scores with content) and complete
+    if section_scores and len(section_scores) > 0 and not parsed_profile_builder.get("partial"):
+        await set_cached_profile(subset_key or cache_key, parsed_profile_builder)
         print(f"[score_profile] Data cached successfully")
     else:
-        print(f"[score_profile] WARNING: Not caching - empty or invalid data")
+        print(f"[score_profile] WARNING: Not caching - empty, invalid or partial data")
 
     total_time = time.time() - start_time
     print(f"[score_profile] Total request time: {total_time:.3f}s (LLM: {llm_time:.3f}s)")
 
-    return {"success": True, "data": parsed_profile_builder}
+    return {"success": True, "data": _sparse_score(parsed_profile_builder, None, selected_fields)}
 
 # Standalone mode for testing without main app
 if __name__ == "__main__":
@@ -0,0 +1,397 @@
+"""
+Helpers for /score_profile: per-section inputs, "current" field injection,
+the local rule engine and Python-side assembly of totals, quick wins and
+benchmarking.
+"""
+import re
+from context_packer import pack_fields, CONTEXT_BUDGETS
+from .prompts import SCORING_SECTIONS
+
+# Sections that are pure rules over the scraped doc and never need the LLM
+LOCAL_SECTIONS = ["Visual Branding", "Skills", "Network", "Activity"]
+LLM_SECTIONS = [name for name in SCORING_SECTIONS if name not in LOCAL_SECTIONS]
+
+INDUSTRY_AVERAGE = 65
+
+# (min score, tier, approximate percentile)
+SCORE_TIERS = [
+    (90, "All-Star", 95),
+    (75, "Advanced", 80),
+    (60, "Intermediate", 55),
+    (40, "Beginner", 30),
+    (0, "Needs Work", 10),
+]
+
+
+def section_inputs(doc: dict) -> dict:
+    """Map each scoring section to the scraped data its scorer needs."""
+    basic_info = doc.get('basic_info', {}) or {}
+    recommendations = doc.get("recommendations", []) or []
+    budget = CONTEXT_BUDGETS["score_profile_section"]
+
+    def fit(value):
+        return pack_fields([("value", value)], budget)["value"]
+
+    return {
+        "Visual Branding": {
+            "has_profile_picture": bool(basic_info.get('profile_picture_url')),
+            "has_custom_banner": bool(basic_info.get("banner_url")),
+        },
+        "Headline": fit(basic_info.get('headline', '') or ''),
+        "About": fit(doc.get('about', '') or ''),
+        "Experience": fit(doc.get('experience', []) or []),
+        "Skills": fit(doc.get('skills', []) or []),
+        "Recommendations": {"count": len(recommendations)},
+        "Network": {"connections": basic_info.get('connections', '')},
+        "Activity": fit(doc.get('recent_posts', []) or []),
+    }
+
+
+def apply_current_fields(section_scores: list, doc: dict) -> list:
+    """Override the "current" field of each section with exact scraped data."""
+    basic_info = doc.get('basic_info', {}) or {}
+    about = doc.get('about', '')
+    experience = doc.get('experience', [])
+    skills = doc.get('skills', [])
+    headline = basic_info.get('headline', '')
+    network_size = basic_info.get('connections', '')
+    recent_posts = doc.get('recent_posts', [])
+
+    for section in section_scores:
+        section_name = (section.get("section_name") or "").lower()
+        if "visual branding" in section_name:
+            section["current"] = {
+                "profile_picture": basic_info.get('profile_picture_url', ''),
+                "has_custom_banner": bool(basic_info.get("banner_url"))
+            }
+        elif "headline" in section_name:
+            section["current"] = headline
+        elif "about" in section_name:
+            section["current"] = about
+        elif "experience" in section_name:
+            section["current"] = experience
+        elif "skills" in section_name:
+            skills_list = skills if isinstance(skills, list) else []
+            section["current"] = {
+                "skills_count": len(skills_list),
+                "skills": skills_list,
+                "top_endorsed": []
+            }
+        elif "recommendations" in section_name:
+            section["current"] = {
+                "count": len(doc.get("recommendations", []) or []),
+                "most_recent": doc.get("recommendations_meta", {}).get("most_recent", ""),
+                "sources": doc.get("recommendations_meta", {}).get("sources", [])
+            }
+        elif "network" in section_name:
+            section["current"] = {
+                "connections": network_size,
+                "visible_count": network_size if isinstance(network_size, int) else None
+            }
+        elif "activity" in section_name or "engagement" in section_name:
+            section["current"] = {
+                "post_count": len(recent_posts) if recent_posts else 0
+            }
+    return section_scores
+
+
+def build_section(section_name: str, parsed: dict) -> dict:
+    """Normalize a single-section scorer response into a section_scores entry."""
+    max_score = SCORING_SECTIONS[section_name]
+    try:
+        score = float(parsed.get("score", 0))
+    except (TypeError, ValueError):
+        score = 0
+    score = max(0, min(score, max_score))
+    observations = parsed.get("observations") or {}
+    return {
+        "section_name": section_name,
+        "score": int(score) if score == int(score) else score,
+        "max_score": max_score,
+        "current": None,
+        "observations": {
+            "analysis": observations.get("analysis", []) or [],
+            "improvements": observations.get("improvements", []) or [],
+        },
+    }
+
+
+def placeholder_section(section_name: str, reason: str) -> dict:
+    """Stand-in for a section whose scorer timed out or failed."""
+    return {
+        "section_name": section_name,
+        "score": None,
+        "max_score": SCORING_SECTIONS[section_name],
+        "current": None,
+        "observations": {"analysis": [], "improvements": []},
+        "unavailable": True,
+        "error": reason,
+    }
+
+
+def assemble_score(section_scores: list) -> dict:
+    """Compute total score, quick wins and benchmarking from section results."""
+    scored = [s for s in section_scores if isinstance(s.get("score"), (int, float))]
+    total_score = round(sum(s["score"] for s in scored))
+
+    # Quick wins: first improvement from the sections losing the most points
+    by_gap = sorted(scored, key=lambda s: s["max_score"] - s["score"], reverse=True)
+    quick_wins = []
+    for section in by_gap:
+        improvements = section.get("observations", {}).get("improvements", [])
+        if improvements and section["max_score"] > section["score"]:
+            quick_wins.append(improvements[0])
+        if len(quick_wins) == 5:
+            break
+
+    tier, percentile = SCORE_TIERS[-1][1], SCORE_TIERS[-1][2]
+    for min_score, tier_name, tier_percentile in SCORE_TIERS:
+        if total_score >= min_score:
+            tier, percentile = tier_name, tier_percentile
+            break
+
+    if total_score >= INDUSTRY_AVERAGE:
+        description = f"Your profile scores {total_score - INDUSTRY_AVERAGE} points above the industry average."
+    else:
+        description = f"Your profile scores {INDUSTRY_AVERAGE - total_score} points below the industry average."
+
+    result = {
+        "total_score": total_score,
+        "section_scores": section_scores,
+        "quick_wins": quick_wins,
+        "benchmarking": {
+            "your_score": total_score,
+            "max_possible": 100,
+            "tier": tier,
+            "percentile": percentile,
+            "industry_average": INDUSTRY_AVERAGE,
+            "description": description,
+        },
+    }
+    unavailable = [s["section_name"] for s in section_scores if s.get("unavailable")]
+    if unavailable:
+        result["partial"] = True
+        result["unavailable_sections"] = unavailable
+    return result
+
+
+# ──────────────────────────────────────────────
+# Local rule engine
+# ──────────────────────────────────────────────
+
+def _to_int(value) -> int:
+    """Parse scraped counts like 500, "500+", "1,234" or None."""
+    if isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    digits = re.sub(r"[^\d]", "", str(value or ""))
+    return int(digits) if digits else 0
+
+
+def _local_section(section_name: str, score, analysis: list, improvements: list, estimated=False) -> dict:
+    return {
+        "section_name": section_name,
+        "score": score,
+        "max_score": SCORING_SECTIONS[section_name],
+        "current": None,
+        "observations": {"analysis": analysis, "improvements": improvements},
+        "source": "estimate" if estimated else "rules",
+    }
+
+
+def score_visual_branding(doc: dict) -> dict:
+    basic_info = doc.get('basic_info', {}) or {}
+    has_photo = bool(basic_info.get('profile_picture_url'))
+    has_banner = bool(basic_info.get("banner_url"))
+    analysis, improvements = [], []
+    if has_photo:
+        analysis.append("Profile photo is present.")
+    else:
+        improvements.append("Add a clear, professional headshot as your profile photo.")
+    if has_banner:
+        analysis.append("Custom banner is present.")
+    else:
+        improvements.append("Add a custom banner that reflects your niche and value proposition.")
+    return _local_section("Visual Branding", 5 * has_photo + 5 * has_banner, analysis, improvements)
+
+
+def score_skills(doc: dict) -> dict:
+    skills = doc.get('skills', []) or []
+    count = len(skills) if isinstance(skills, list) else 0
+    # Listed count is the only skills signal the scraper captures
+    if count >= 20:
+        score = 10
+    elif count >= 15:
+        score = 8
+    elif count >= 10:
+        score = 6
+    elif count >= 5:
+        score = 4
+    elif count >= 1:
+        score = 2
+    else:
+        score = 0
+    analysis = [f"{count} skills listed."]
+    improvements = []
+    if count < 20:
+        improvements.append(f"List {20 - count} more specific, niche-relevant skills (tools and platforms, not soft skills).")
+    improvements.append("Ask colleagues to endorse your top 3 skills.")
+    return _local_section("Skills", score, analysis, improvements)
+
+
+def score_network(doc: dict) -> dict:
+    basic_info = doc.get('basic_info', {}) or {}
+    connections = _to_int(basic_info.get('connections'))
+    if connections >= 500:
+        score = 5
+    elif connections >= 300:
+        score = 4
+    elif connections >= 200:
+        score = 3
+    elif connections >= 100:
+        score = 2
+    else:
+        score = 1
+    analysis = [f"{'500+' if connections >= 500 else connections} connections."]
+    improvements = []
+    if connections < 500:
+        improvements.append(f"Grow your network by about {500 - connections} targeted connections to reach 500+.")
+    return _local_section("Network", score, analysis, improvements)
+
+
+def score_activity(doc: dict) -> dict:
+    posts = doc.get('recent_posts', []) or []
+    count = len(posts)
+    if count >= 5:
+        posts_score = 5
+    elif count >= 3:
+        posts_score = 4
+    elif count == 2:
+        posts_score = 3
+    elif count == 1:
+        posts_score = 2
+    else:
+        posts_score = 0
+
+    engagement = [
+        _to_int(p.get("reactions")) + _to_int(p.get("comments"))
+        for p in posts if isinstance(p, dict)
+    ]
+    avg_engagement = sum(engagement) / len(engagement) if engagement else 0
+    if avg_engagement >= 50:
+        engage_score = 5
+    elif avg_engagement >= 20:
+        engage_score = 4
+    elif avg_engagement >= 10:
+        engage_score = 3
+    elif avg_engagement >= 3:
+        engage_score = 2
+    elif avg_engagement > 0:
+        engage_score = 1
+    else:
+        engage_score = 0
+
+    analysis = [f"{count} recent posts, averaging {avg_engagement:.0f} reactions and comments."]
+    improvements = []
+    if count < 5:
+        improvements.append("Post at least once a week on topics in your niche.")
+    if engage_score < 4:
+        improvements.append("End posts with a question and reply to every comment to lift engagement.")
+    return _local_section("Activity", posts_score + engage_score, analysis, improvements)
+
+
+def _estimate_headline(doc: dict) -> dict:
+    headline = ((doc.get('basic_info', {}) or {}).get('headline') or "").strip()
+    length = len(headline)
+    segments = [seg for seg in re.split(r"[|•·,/]", headline) if seg.strip()]
+    keywords = min(5, len(segments) * 2) if headline else 0
+    value = 5 if re.search(r"\b(help|helping|driving|building|scaling|\d+)", headline, re.I) else (2 if headline else 0)
+    length_score = 5 if length >= 100 else 3 if length >= 50 else 1 if headline else 0
+    improvements = []
+    if length < 100:
+        improvements.append("Use more of the headline space: Role | Value proposition | Key skills.")
+    if value < 5:
+        improvements.append("State who you help and the result you deliver.")
+    return _local_section("Headline", keywords + value + length_score,
+                          [f"Headline is {length} characters."], improvements, estimated=True)
+
+
+def _estimate_about(doc: dict) -> dict:
+    about = (doc.get('about') or "").strip()
+    words = len(about.split())
+    story = 7 if words >= 150 else 4 if words >= 60 else 1 if about else 0
+    value = 7 if re.search(r"\d", about) else (3 if about else 0)
+    cta = 6 if re.search(r"\b(reach out|contact|connect|message me|dm me|email)\b", about, re.I) else 0
+    improvements = []
+    if words < 150:
+        improvements.append("Expand the About section to 150-250 words: hook, mission, expertise, proof, CTA.")
+    if not cta:
+        improvements.append("End with a clear call to action.")
+    return _local_section("About", story + value + cta, [f"About section is {words} words."], improvements, estimated=True)
+
+
+def _estimate_experience(doc: dict) -> dict:
+    experience = doc.get('experience', []) or []
+    text = str(experience)
+    bullets = 10 if text.count("•") + text.count("\\n-") >= 3 else 5 if experience else 0
+    metrics = 10 if re.search(r"\d+\s*%|\$\s*\d|\d+x\b", text) else 3 if experience else 0
+    complete = 5 if len(experience) >= 2 else 3 if experience else 0
+    improvements = []
+    if metrics < 10:
+        improvements.append("Quantify results in each role (%, $, time saved, team size).")
+    if not experience:
+        improvements.append("Add your current and past roles with descriptions.")
+    return _local_section("Experience", bullets + metrics + complete,
+                          [f"{len(experience)} positions listed."], improvements, estimated=True)
+
+
+def _estimate_recommendations(doc: dict) -> dict:
+    count = len(doc.get("recommendations", []) or [])
+    score = min(5, count * 2)
+    improvements = [] if count >= 3 else ["Request recommendations from a manager, a peer and a client."]
+    return _local_section("Recommendations", score, [f"{count} recommendations received."], improvements, estimated=True)
+
+
+LOCAL_SCORERS = {
+    "Visual Branding": score_visual_branding,
+    "Skills": score_skills,
+    "Network": score_network,
+    "Activity": score_activity,
+}
+
+ESTIMATORS = {
+    "Headline": _estimate_headline,
+    "About": _estimate_about,
+    "Experience": _estimate_experience,
+    "Recommendations": _estimate_recommendations,
+}
+
+
+def local_section_scores(doc: dict, sections: list = LOCAL_SECTIONS) -> list:
+    """Rule-based scores for the sections that never need the LLM."""
+    return [LOCAL_SCORERS[name](doc) for name in sections if name in LOCAL_SCORERS]
+
+
+def preview_score(doc: dict) -> dict:
+    """Fully local score: exact rules plus heuristic estimates for LLM sections."""
+    sections = [
+        LOCAL_SCORERS[name](doc) if name in LOCAL_SCORERS else ESTIMATORS[name](doc)
+        for name in SCORING_SECTIONS
+    ]
+    result = assemble_score(sections)
+    result["preview"] = True
+    return result
+
+
+def merge_sections(llm_sections: list, local_sections: list) -> list:
+    """Combine LLM-scored and locally scored sections in canonical order."""
+    by_name = {}
+    for section in llm_sections:
+        name = (section.get("section_name") or "").strip()
+        for canonical in LLM_SECTIONS:
+            if canonical.lower() in name.lower():
+                by_name[canonical] = section if section.get("unavailable") else build_section(canonical, section)
+    for section in local_sections:
+        by_name[section["section_name"]] = section
+    return [by_name[name] for name in SCORING_SECTIONS if name in by_name]
@@ -0,0 +1,69 @@
+"""
+Schema-constrained JSON output for the LLM endpoints.
+
+Prompts that return JSON declare a RESPONSE_FORMAT built with
+json_schema_format(); with strict json_schema the model can only emit
+output that matches the schema, so the route parses the content exactly
+once with parse_json_response() and gets Python objects back.
+
+helper.Clean_JSON (the tolerant extractor) is kept as the fallback for
+content that still fails to parse (a model without structured-output
+support, an old cached or recorded response, a truncated answer). If that
+also fails, a StructuredOutputError is raised instead of silently
+returning {}.
+
+Strict schemas must be objects at the top level, list every property in
+"required" and set additionalProperties to false; schema_object() does that.
+"""
+import json
+
+STRING = {"type": "string"}
+INTEGER = {"type": "integer"}
+NUMBER = {"type": "number"}
+
+
+class StructuredOutputError(ValueError):
+    """Model output could not be parsed as the expected JSON."""
+
+
+def schema_object(**properties) -> dict:
+    """Strict object schema: every property required, nothing else allowed."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def schema_array(items: dict) -> dict:
+    return {"type": "array", "items": items}
+
+
+def json_schema_format(name: str, schema: dict) -> dict:
+    """response_format value for a strict JSON schema."""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+def parse_json_response(response, label: str = "llm"):
+    """
+    Parse the first choice of a chat completion as JSON, once.
+
+    Falls back to Clean_JSON repair for non-conforming content and raises
+    StructuredOutputError when nothing usable can be recovered.
+    """
+    message = response.choices[0].message
+    if getattr(message, "refusal", None):
+        raise StructuredOutputError(f"{label}: model refused: {message.refusal}")
+    content = message.content or ""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as e:
+        print(f"[structured_output] {label}: invalid JSON ({e}), trying repair")
+
+    from lipInDashboard.helper import Clean_JSON
+    try:
+        return Clean_JSON(content).parse()
+    except ValueError as e:
+        finish_reason = response.choices[0].finish_reason
+        raise StructuredOutputError(f"{label}: unparseable JSON (finish_reason={finish_reason}): {e}") from e
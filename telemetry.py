@@ -0,0 +1,242 @@
+"""
+In-process LLM and HTTP telemetry with a Prometheus text exposition.
+
+Every LLM call made through llm_utils records model, prompt/completion/cached
+tokens, time to first token (streaming calls), total latency and outcome.
+HTTP latency is recorded per route template by the middleware in main.py.
+Everything aggregates into fixed-bucket histograms served on GET /metrics.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+CPU_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LATENCY_WINDOW_SECONDS = 300  # llm_latency_quantile only looks this far back
+LATENCY_WINDOW_MAX_SAMPLES = 500  # per endpoint/model
+
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Cumulative-bucket histogram compatible with the Prometheus format."""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate a quantile by linear interpolation inside the bucket."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            if seen + self.counts[i] >= target:
+                if not self.counts[i]:
+                    return bound
+                return lower + (bound - lower) * (target - seen) / self.counts[i]
+            seen += self.counts[i]
+            lower = bound
+        return self.buckets[-1]
+
+
+# metric name -> {label tuple -> Histogram | float}
+_histograms: dict[str, dict[tuple, Histogram]] = defaultdict(dict)
+_counters: dict[str, dict[tuple, float]] = defaultdict(lambda: defaultdict(float))
+_gauges: dict[str, dict[tuple, float]] = defaultdict(lambda: defaultdict(float))
+# (endpoint, model) -> recent (time, latency) of successful LLM calls, for routing decisions
+_recent_latency: dict[tuple, deque] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW_MAX_SAMPLES))
+
+_HELP = {
+    "lipin_llm_request_seconds": "Total LLM call latency",
+    "lipin_llm_ttft_seconds": "Time to first token for streaming LLM calls",
+    "lipin_llm_prompt_tokens": "Prompt tokens per LLM call",
+    "lipin_llm_completion_tokens": "Completion tokens per LLM call",
+    "lipin_llm_calls_total": "LLM calls by outcome",
+    "lipin_llm_tokens_total": "LLM tokens by kind (prompt, completion, cached)",
+    "lipin_http_request_seconds": "HTTP request latency by route",
+    "lipin_http_requests_in_flight": "HTTP requests currently being served",
+    "lipin_llm_calls_in_flight": "LLM calls currently awaiting a response",
+    "lipin_llm_routing_events_total": "Model routing decisions (hedge, hedge_won, fallback, degraded_*)",
+    "lipin_cpu_task_seconds": "Run time of CPU-bound tasks in the process pool",
+    "lipin_cpu_queue_wait_seconds": "Time CPU-bound tasks waited for a free worker",
+    "lipin_cpu_tasks_total": "CPU-bound tasks by outcome (ok, error, timeout, rejected)",
+    "lipin_cpu_tasks_in_flight": "CPU-bound tasks currently running in the process pool",
+    "lipin_cpu_tasks_waiting": "CPU-bound tasks waiting for a free worker",
+}
+
+
+def _observe(name: str, labels: tuple, value: float, buckets) -> None:
+    with _lock:
+        hist = _histograms[name].get(labels)
+        if hist is None:
+            hist = _histograms[name][labels] = Histogram(buckets)
+        hist.observe(value)
+
+
+def _inc(name: str, labels: tuple, amount: float = 1) -> None:
+    with _lock:
+        _counters[name][labels] += amount
+
+
+def gauge_add(name: str, labels: tuple, amount: float) -> None:
+    with _lock:
+        _gauges[name][labels] += amount
+
+
+def gauge_value(name: str, labels: tuple = ()) -> float:
+    return _gauges[name].get(labels, 0.0)
+
+
+def record_llm_call(
+    endpoint: str | None,
+    model: str,
+    latency: float,
+    outcome: str = "ok",
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cached_tokens: int = 0,
+    ttft: float | None = None,
+) -> None:
+    """Record one LLM call. outcome is ok, error, timeout or cache_hit."""
+    endpoint = endpoint or "default"
+    _inc("lipin_llm_calls_total", (("endpoint", endpoint), ("model", model), ("outcome", outcome)))
+    if outcome == "cache_hit":
+        return
+    prompt_cache = "hit" if cached_tokens else "miss"
+    _observe("lipin_llm_request_seconds",
+             (("endpoint", endpoint), ("model", model), ("outcome", outcome), ("prompt_cache", prompt_cache)),
+             latency, LATENCY_BUCKETS)
+    if outcome != "ok":
+        return
+    with _lock:
+        _recent_latency[(endpoint, model)].append((time.time(), latency))
+    labels = (("endpoint", endpoint), ("model", model))
+    if ttft is not None:
+        _observe("lipin_llm_ttft_seconds", labels, ttft, LATENCY_BUCKETS)
+    _observe("lipin_llm_prompt_tokens", labels, prompt_tokens, TOKEN_BUCKETS)
+    _observe("lipin_llm_completion_tokens", labels, completion_tokens, TOKEN_BUCKETS)
+    _inc("lipin_llm_tokens_total", labels + (("kind", "prompt"),), prompt_tokens)
+    _inc("lipin_llm_tokens_total", labels + (("kind", "completion"),), completion_tokens)
+    _inc("lipin_llm_tokens_total", labels + (("kind", "cached"),), cached_tokens)
+
+
+def usage_tokens(usage) -> tuple[int, int, int]:
+    """(prompt, completion, cached) token counts from an OpenAI usage object."""
+    if usage is None:
+        return 0, 0, 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0, cached
+
+
+def record_routing_event(endpoint: str | None, event: str) -> None:
+    _inc("lipin_llm_routing_events_total", (("endpoint", endpoint or "default"), ("event", event)))
+
+
+def record_http_request(route: str, method: str, status: int, latency: float) -> None:
+    _observe("lipin_http_request_seconds",
+             (("route", route), ("method", method), ("status", str(status))),
+             latency, LATENCY_BUCKETS)
+
+
+def record_cpu_task(kind: str, outcome: str, wait: float = 0.0, run: float | None = None) -> None:
+    """Record one process-pool task. outcome is ok, error, timeout or rejected."""
+    _inc("lipin_cpu_tasks_total", (("kind", kind), ("outcome", outcome)))
+    if run is None:
+        return
+    _observe("lipin_cpu_queue_wait_seconds", (("kind", kind),), wait, CPU_BUCKETS)
+    _observe("lipin_cpu_task_seconds", (("kind", kind), ("outcome", outcome)), run, CPU_BUCKETS)
+
+
+def llm_latency_quantile(
+    endpoint: str, model: str, q: float, min_count: int = 1, window_seconds: float = LATENCY_WINDOW_SECONDS,
+) -> float | None:
+    """
+    Quantile of successful LLM call latency for an endpoint/model pair over
+    the last window_seconds (None below min_count calls in the window).
+    Windowed rather than lifetime, so a model that stops getting traffic
+    (e.g. after routing degraded away from it) ages out of a bad p95.
+    """
+    cutoff = time.time() - window_seconds
+    with _lock:
+        samples = [latency for at, latency in _recent_latency.get((endpoint, model), ()) if at >= cutoff]
+    if len(samples) < min_count:
+        return None
+    window = Histogram(LATENCY_BUCKETS)
+    for latency in samples:
+        window.observe(latency)
+    return window.quantile(q)
+
+
+def prompt_cache_summary() -> dict:
+    """Per-endpoint provider prompt-cache ratio and mean latency for hits vs misses."""
+    summary = {}
+    with _lock:
+        for labels, amount in _counters["lipin_llm_tokens_total"].items():
+            label_map = dict(labels)
+            entry = summary.setdefault(label_map["endpoint"], {"prompt_tokens": 0, "cached_tokens": 0})
+            if label_map["kind"] in ("prompt", "cached"):
+                entry[f"{label_map['kind']}_tokens"] += int(amount)
+        for labels, hist in _histograms["lipin_llm_request_seconds"].items():
+            label_map = dict(labels)
+            if label_map["outcome"] != "ok":
+                continue
+            entry = summary.setdefault(label_map["endpoint"], {"prompt_tokens": 0, "cached_tokens": 0})
+            key = label_map["prompt_cache"]
+            entry[f"{key}_calls"] = entry.get(f"{key}_calls", 0) + hist.count
+            entry[f"{key}_latency_total"] = entry.get(f"{key}_latency_total", 0.0) + hist.sum
+    for entry in summary.values():
+        entry["cached_token_ratio"] = round(entry["cached_tokens"] / entry["prompt_tokens"], 3) if entry["prompt_tokens"] else 0.0
+        for key in ("hit", "miss"):
+            calls = entry.pop(f"{key}_calls", 0)
+            total = entry.pop(f"{key}_latency_total", 0.0)
+            entry[f"{key}_calls"] = calls
+            entry[f"avg_{key}_latency"] = round(total / calls, 3) if calls else None
+    return summary
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format (v0.0.4)."""
+    lines = []
+    with _lock:
+        for name, series in sorted(_histograms.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in series.items():
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+        for kind, metrics in (("counter", _counters), ("gauge", _gauges)):
+            for name, series in sorted(metrics.items()):
+                lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"